@@ -2,7 +2,7 @@ import streamlit as st
 from front_pages.prediction_page import prediction_page
 from front_pages.documents_page import documents_page
 from front_pages.chat_page import chat_page
-from utils.token_manager import TokenManager
+from utils.token_manager import get_token_manager
 import time
 
 def main():
@@ -96,11 +96,9 @@ def main():
     </style>
 """, unsafe_allow_html=True)
     
-    # Initialize token manager
+    # Share one token manager per API key across sessions; the token is fetched on first use
     if 'token_manager' not in st.session_state:
-        st.session_state.token_manager = TokenManager()
-        if not st.session_state.token_manager.get_token():
-            st.error("Can't init token manager")
+        st.session_state.token_manager = get_token_manager()
     
     # Initialize session state for navigation if not exists
     if 'current_page' not in st.session_state:
@@ -125,6 +123,17 @@ def main():
                 st.session_state.current_page = 'chat_page'
                 st.rerun()
         
+        # Token status
+        token_status = st.session_state.token_manager.get_token_status()
+        token_metrics = st.session_state.token_manager.get_metrics()
+        if token_status["is_valid"]:
+            st.markdown(
+                f'<div class="token-status token-valid">Token 剩餘 {token_status["remaining_time"]} 分鐘<br>'
+                f'已更新 {token_metrics["refresh_count"]} 次</div>',
+                unsafe_allow_html=True
+            )
+        else:
+            st.markdown('<div class="token-status token-invalid">Token 尚未取得</div>', unsafe_allow_html=True)
         
     
     # Page routing
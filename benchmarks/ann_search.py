@@ -0,0 +1,64 @@
+"""Recall@k and latency of IVF search against exact search.
+
+Run from the repository root:
+    python -m benchmarks.ann_search --rows 100000 --dim 384
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.ann_index import IVFIndex, exact_search
+
+
+def make_corpus(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Clustered unit vectors, closer to real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile_ms(latencies, q):
+    return np.percentile(latencies, q) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.rows + args.queries, args.dim, clusters=max(1, args.rows // 200))
+    vectors, queries = corpus[:args.rows], corpus[args.rows:]
+
+    exact_ids, exact_latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = exact_search(vectors, query, args.top_k)
+        exact_latencies.append(time.perf_counter() - start)
+        exact_ids.append(set(ids.tolist()))
+    print(f"{'mode':<14}{'recall@' + str(args.top_k):>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{percentile_ms(exact_latencies, 50):>10.2f}{percentile_ms(exact_latencies, 99):>10.2f}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex()
+    ivf.build(vectors)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s, nlist={len(ivf.centroids)}")
+
+    for nprobe in args.nprobe:
+        hits, latencies = 0, []
+        for query, expected in zip(queries, exact_ids):
+            start = time.perf_counter()
+            _, ids = ivf.search(vectors, query, args.top_k, nprobe=nprobe)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected & set(ids.tolist()))
+        recall = hits / (len(queries) * args.top_k)
+        print(f"{'ivf/' + str(nprobe):<14}{recall:>10.3f}{percentile_ms(latencies, 50):>10.2f}{percentile_ms(latencies, 99):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
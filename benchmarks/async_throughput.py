@@ -0,0 +1,123 @@
+"""Prediction throughput of the sync client against the asyncio client on one event loop,
+and chat answers (retrieval + generation) one after another against Agent.aanswer overlapped
+on the shared loop and under asyncio.run.
+
+    python -m benchmarks.async_throughput --requests 200 --latency 0.05 --questions 20
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_watsonx import start_server
+from utils.agent_setting import Agent
+from utils.async_client import AsyncWatsonxClient, run_sync
+from utils.http_client import HttpClient
+from utils.prediction import REQUIRED_FIELDS, dumps_payload
+
+HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer local-token"}
+QUESTIONS = ["房貸1000萬一個月要繳多少？", "提前還款有違約金嗎？", "寬限期可以申請多久？", "首購有什麼優惠利率？"]
+
+
+class StaticToken:
+    def get_token(self):
+        return "local-token"
+
+    def refresh_token(self):
+        return "local-token"
+
+
+class NoCache:
+    # Every question goes to the server
+    def lookup(self, question, context, history=""):
+        return None
+
+    def store(self, *args, **kwargs):
+        pass
+
+
+def make_body():
+    row = [None] * len(REQUIRED_FIELDS)
+    row[REQUIRED_FIELDS.index("Loan Amount Request (USD)")] = 100000.0
+    return dumps_payload({"input_data": [{"fields": REQUIRED_FIELDS, "values": [row] * 50}]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--generation-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server, base_url = start_server(prediction_delay=args.latency, token_delay=args.generation_latency,
+                                    token_delay_per_chunk=0.0)
+    url = f"{base_url}/ml/v4/deployments/bench/predictions?version=2021-05-01"
+    body = make_body()
+    results = {}
+
+    http = HttpClient(pool_maxsize=args.concurrency)
+
+    def sync_call(_):
+        http.post(url, data=body, headers=HEADERS).raise_for_status()
+
+    start = time.perf_counter()
+    for i in range(args.requests):
+        sync_call(i)
+    results["sync sequential"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(sync_call, range(args.requests)))
+    results[f"sync {args.concurrency} threads"] = time.perf_counter() - start
+
+    client = AsyncWatsonxClient(max_connections=args.concurrency)
+
+    async def async_batch():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def call():
+            async with semaphore:
+                response = await client.predict(url, body, HEADERS)
+                response.raise_for_status()
+
+        await asyncio.gather(*(call() for _ in range(args.requests)))
+
+    run_sync(client.predict(url, body, HEADERS))  # warm up the pool
+    start = time.perf_counter()
+    run_sync(async_batch())
+    results[f"async {args.concurrency} in flight"] = time.perf_counter() - start
+    run_sync(client.aclose())
+
+    agent = Agent(StaticToken(), base_url=base_url, response_cache=NoCache())
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+    answers = {}
+
+    start = time.perf_counter()
+    for question in questions:
+        agent.generate_response(agent.find_relevant_context(question), question)
+    answers["sync sequential"] = time.perf_counter() - start
+
+    async def answer_all():
+        return await asyncio.gather(*(agent.aanswer(question) for question in questions))
+
+    for name, run in (("aanswer, shared loop", run_sync), ("aanswer, asyncio.run", asyncio.run)):
+        start = time.perf_counter()
+        assert all(run(answer_all())), "empty answer"
+        answers[name] = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms server latency")
+    print(f"{'client':<24}{'req/s':>10}")
+    for name, elapsed in results.items():
+        print(f"{name:<24}{args.requests / elapsed:>10.0f}")
+
+    print(f"\n{args.questions} questions, {args.generation_latency * 1000:.0f} ms generation latency")
+    print(f"{'agent':<24}{'answers/s':>10}")
+    for name, elapsed in answers.items():
+        print(f"{name:<24}{args.questions / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Bulk QA upload: inline embedding against the background indexing pipeline.
+
+Builds a QA document of N rows from the stored QA pairs, then reports how long the upload
+call blocks and how long until the document is searchable:
+
+    python -m benchmarks.bulk_indexing --rows 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.indexing_pipeline import IndexingPipeline
+from utils.vector_index import VectorIndex, chunk_qa_text
+
+
+def make_document(rows: int) -> str:
+    pairs = []
+    for path in sorted(Path("QA_files").glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        pairs.extend(f"{c['metadata']['question']},{c['text'].split(',', 1)[1]}" for c in chunk_qa_text(text))
+    lines = ["問題,答案"]
+    for i in range(rows):
+        lines.append(f"Q{i}.{pairs[i % len(pairs)]}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    text = make_document(args.rows)
+    print(f"{args.rows} QA rows, {len(text) / 1024:.0f} KB")
+    print(f"{'mode':<20}{'blocks s':>10}{'ready s':>10}")
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = VectorIndex(index_dir, search_mode="exact")
+        start = time.perf_counter()
+        index.add_document("bulk", text, "bulk.csv")
+        elapsed = time.perf_counter() - start
+        reference = np.array(index.vectors)
+        print(f"{'inline':<20}{elapsed:>10.2f}{elapsed:>10.2f}")
+
+    for workers in sorted(set(args.workers)):
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = VectorIndex(index_dir, search_mode="exact")
+            pipeline = IndexingPipeline(index, max_workers=workers)
+            pipeline._get_processes().submit(int).result()  # start the workers before timing
+
+            start = time.perf_counter()
+            pipeline.submit("bulk", text, "bulk.csv")
+            blocked = time.perf_counter() - start
+            pipeline.wait()
+            ready = time.perf_counter() - start
+            pipeline.shutdown()
+
+            assert pipeline.get_status("bulk")["state"] == "ready"
+            assert np.allclose(np.array(index.vectors), reference), "pipeline vectors differ from inline"
+            print(f"{f'pipeline {workers} workers':<20}{blocked:>10.3f}{ready:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
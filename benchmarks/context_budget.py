@@ -0,0 +1,40 @@
+"""Prompt context size per question: plain top-k join against the context builder.
+
+    python -m benchmarks.context_budget --top-k 5 --max-tokens 600
+"""
+import argparse
+import tempfile
+
+from benchmarks.retrieval_recall import HELD_OUT, load_qa
+from utils.agent_setting import Agent
+from utils.context_builder import estimate_tokens
+from utils.vector_index import VectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="+", default=["QA1.csv", "QA2.csv"])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=None)
+    args = parser.parse_args()
+
+    texts, _ = load_qa(args.files)
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = VectorIndex(index_dir, search_mode="exact")
+        for name, text in texts:
+            index.add_document(name, text, name)
+        agent = Agent(vector_index=index)
+        plain, built = [], []
+        for query, _ in HELD_OUT:
+            documents = agent.search_documents(query, top_k=args.top_k)
+            plain.append(estimate_tokens("\n\n".join(doc.content for doc in documents)))
+            built.append(estimate_tokens(agent.find_relevant_context(query, top_k=args.top_k, max_tokens=args.max_tokens)))
+
+    print(f"{len(HELD_OUT)} questions, top {args.top_k} chunks")
+    print(f"{'context':<10}{'mean tokens':>13}{'max tokens':>12}")
+    print(f"{'plain':<10}{sum(plain) / len(plain):>13.0f}{max(plain):>12}")
+    print(f"{'builder':<10}{sum(built) / len(built):>13.0f}{max(built):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Local stand-in for the watsonx endpoints used by the app.
+
+Start it from another script with ``start_server()``, or on its own with:
+    python -m benchmarks.fake_watsonx --port 8099
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+ANSWER = "以房貸利率2.19%、貸款1000萬元、期限30年本息平均攤還計算，每月約需繳款37,900元。實際金額仍以銀行核貸條件為準。"
+
+
+class FakeWatsonxHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls on keep-alive connections
+    disable_nagle_algorithm = True
+
+    # Overridden per server through start_server()
+    token_delay = 0.0
+    token_delay_per_chunk = 0.02
+    prediction_delay = 0.0
+    prediction_fail_rate = 0.0
+    iam_delay = 0.0
+    iam_expires_in = 3600
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split("?")[0]
+        if path == "/identity/token":
+            self._issue_token()
+        elif path.startswith("/ml/v4/deployments/") and path.endswith("/predictions"):
+            self._predict(json.loads(body))
+        elif path == "/ml/v1/text/generation":
+            time.sleep(self.token_delay + self.token_delay_per_chunk * len(ANSWER))
+            self._send_json(200, {"results": [{"generated_text": ANSWER, "stop_reason": "eos_token"}]})
+        elif path == "/ml/v1/text/generation_stream":
+            self._stream_generation()
+        else:
+            self._send_json(404, {"errors": [{"message": f"Unknown path {path}"}]})
+
+    def _issue_token(self):
+        time.sleep(self.iam_delay)
+        with self.server.lock:
+            self.server.tokens_issued += 1
+            token = f"fake-token-{self.server.tokens_issued}"
+        self._send_json(200, {
+            "access_token": token,
+            "expires_in": self.iam_expires_in,
+            "expiration": int(time.time()) + self.iam_expires_in,
+            "token_type": "Bearer",
+        })
+
+    def _predict(self, payload):
+        # Sanction 70% of the requested amount, so results can be checked against the input rows
+        time.sleep(self.prediction_delay)
+        if random.random() < self.prediction_fail_rate:
+            self._send_json(503, {"errors": [{"message": "Service temporarily unavailable"}]})
+            return
+        data = payload["input_data"][0]
+        amount = data["fields"].index("Loan Amount Request (USD)")
+        values = [[round((row[amount] or 0) * 0.7, 2)] for row in data["values"]]
+        self._send_json(200, {"predictions": [{"fields": ["prediction"], "values": values}]})
+
+    def _stream_generation(self):
+        # Server-sent events, one event per generated character, like the real endpoint
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(self.token_delay)
+        for i, char in enumerate(ANSWER):
+            event = {"results": [{"generated_text": char, "generated_token_count": i + 1}]}
+            data = f"id: {i + 1}\nevent: message\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.token_delay_per_chunk)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeWatsonxServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of new connections into 1 s SYN retries
+    request_queue_size = 128
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        # Accepted TCP connections, i.e. handshakes a client had to pay for
+        self.connections = 0
+        self.tokens_issued = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+def start_server(port: int = 0, **handler_options) -> Tuple[FakeWatsonxServer, str]:
+    handler = type("ConfiguredHandler", (FakeWatsonxHandler,), handler_options)
+    server = FakeWatsonxServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    server, url = start_server(args.port)
+    print(f"Fake watsonx listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
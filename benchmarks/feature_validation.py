@@ -0,0 +1,69 @@
+"""FeatureSchema validation speed and what it catches on corrupted copies of loan_test.csv.
+
+Compiles the schema from loan_train.csv, corrupts ``--bad-rate`` of the rows (text in
+numbers, out-of-range values, fractional counts, unknown categories) and times the
+column-wise validation at several sizes. Text and fractional counts reject the row;
+out-of-range values and unknown categories are warnings and the row is still scored.
+
+    python -m benchmarks.feature_validation --rows 1000 10000 100000 --bad-rate 0.01
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.prediction import FeatureSchema
+
+CORRUPTIONS = [
+    ("Age", "abc", "error"),
+    ("Income (USD)", 1e9, "warning"),
+    ("Dependents", 2.5, "error"),
+    ("Location", "Mars", "warning"),
+]
+
+
+def corrupt(df: pd.DataFrame, bad_rate: float, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = df.astype(object)
+    rows = rng.choice(len(df), int(len(df) * bad_rate), replace=False)
+    for i, row in enumerate(rows):
+        column, value, _ = CORRUPTIONS[i % len(CORRUPTIONS)]
+        df.iat[row, df.columns.get_loc(column)] = value
+    # Case and spacing differences are normalized, not rejected
+    df["Profession"] = df["Profession"].str.upper().str.pad(20, side="both")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--train", default="loan_train.csv")
+    parser.add_argument("--test", default="loan_test.csv")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--bad-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    schema = FeatureSchema.compile(pd.read_csv(args.train))
+    print(f"compiled {len(schema.fields)} fields in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    test = pd.read_csv(args.test)
+    print(f"{'rows':>8}{'corrupted':>11}{'rejected':>10}{'warned':>8}{'ms':>9}{'us/row':>8}")
+    for rows in args.rows:
+        frame = pd.concat([test] * (rows // len(test) + 1), ignore_index=True).iloc[:rows]
+        frame = corrupt(frame, args.bad_rate)
+        start = time.perf_counter()
+        clean_df, valid, issues = schema.validate(frame)
+        elapsed = time.perf_counter() - start
+        corrupted = int(len(frame) * args.bad_rate)
+        warned = issues.loc[issues["level"] == "warning", "row"].nunique()
+        print(f"{rows:>8}{corrupted:>11}{int((~valid).sum()):>10}{warned:>8}"
+              f"{elapsed * 1000:>9.1f}{elapsed / rows * 1e6:>8.2f}")
+
+    print("\nissues by reason (last run):")
+    print(issues.groupby(["level", issues["reason"].str.split(" ").str[0]]).size().to_string())
+    print(f"Profession normalized: {sorted(clean_df['Profession'].dropna().unique())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Requests/sec and TCP handshakes: bare requests.post against the pooled HttpClient.
+
+    python -m benchmarks.http_pool --requests 500 --threads 4
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_watsonx import start_server
+from utils.http_client import HttpClient
+
+PAYLOAD = {"input_data": [{"fields": ["Loan Amount Request (USD)"], "values": [[100000.0]]}]}
+
+
+def run(post, url, total, threads):
+    def call(_):
+        response = post(url, json=PAYLOAD, timeout=10)
+        response.raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'client':<16}{'req/s':>10}{'handshakes':>12}")
+    for name in ("requests.post", "HttpClient"):
+        server, base_url = start_server()
+        url = f"{base_url}/ml/v4/deployments/bench/predictions?version=2021-05-01"
+        client = HttpClient(pool_maxsize=args.threads)
+        post = requests.post if name == "requests.post" else client.post
+        rate = run(post, url, args.requests, args.threads)
+        client.close()
+        server.shutdown()
+        print(f"{name:<16}{rate:>10.0f}{server.connections:>12}")
+
+
+if __name__ == "__main__":
+    main()
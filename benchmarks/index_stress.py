@@ -0,0 +1,113 @@
+"""Several processes adding and deleting documents in one storage directory at once.
+
+Checks that the final document list holds exactly the surviving entries, and compares with
+the old whole-file rewrite of document_index.json. "vectors" runs the same changes against
+one shared VectorIndex, compacting often, and also checks that every document's rows are its own:
+
+    python -m benchmarks.index_stress --processes 8 --documents 200
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from utils.document_index import DocumentIndex
+from utils.vector_index import VectorIndex
+
+
+def journal_worker(storage_dir: str, worker: int, documents: int, compact_every: int):
+    index = DocumentIndex(storage_dir, compact_every=compact_every)
+    for i in range(documents):
+        index.add({"id": f"{worker}-{i}", "name": f"{worker}-{i}.csv"})
+        index.documents()
+        if i % 3 == 0:
+            index.remove(f"{worker}-{i}")
+
+
+def vector_worker(storage_dir: str, worker: int, documents: int, compact_every: int):
+    index = VectorIndex(Path(storage_dir) / "vector_index", search_mode="exact", compact_ratio=0.1)
+    for i in range(documents):
+        doc_id = f"{worker}-{i}"
+        index.add_document(doc_id, f"{doc_id} 的問題？\n{doc_id} 的答案。", doc_id)
+        index.search("問題")
+        if i % 3 == 0:
+            index.remove_document(doc_id)
+
+
+def stored_vectors(storage_dir: str):
+    index = VectorIndex(Path(storage_dir) / "vector_index", search_mode="exact")
+    misplaced = [doc_id for doc_id, (start, end) in index.documents.items()
+                 if any(chunk is None or chunk["doc_id"] != doc_id for chunk in index.chunks[start:end])]
+    assert not misplaced, f"rows of {len(misplaced)} documents belong to other documents"
+    return list(index.documents)
+
+
+def stored_documents(storage_dir: str):
+    try:
+        return [doc["id"] for doc in DocumentIndex(storage_dir).documents()]
+    except ValueError:
+        return []
+
+
+def rewrite_worker(storage_dir: str, worker: int, documents: int, compact_every: int):
+    # The previous DocumentStore behaviour: read, modify and rewrite the whole file, unlocked
+    index_file = Path(storage_dir) / "document_index.json"
+    for i in range(documents):
+        for change in ("add", "delete") if i % 3 == 0 else ("add",):
+            try:
+                with open(index_file, "r", encoding="utf-8") as f:
+                    docs = json.load(f)
+            except ValueError:
+                docs = []
+            if change == "add":
+                docs.append({"id": f"{worker}-{i}", "name": f"{worker}-{i}.csv"})
+            else:
+                docs = [doc for doc in docs if doc["id"] != f"{worker}-{i}"]
+            with open(index_file, "w", encoding="utf-8") as f:
+                json.dump(docs, f, ensure_ascii=False)
+
+
+def run(worker, stored_ids, args):
+    with tempfile.TemporaryDirectory() as storage_dir:
+        (Path(storage_dir) / "document_index.json").write_text("[]", encoding="utf-8")
+        processes = [
+            multiprocessing.Process(target=worker, args=(storage_dir, w, args.documents, args.compact_every))
+            for w in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        expected = {f"{w}-{i}" for w in range(args.processes) for i in range(args.documents) if i % 3}
+        return elapsed, expected, stored_ids(storage_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--compact-every", type=int, default=50)
+    args = parser.parse_args()
+
+    operations = args.processes * (args.documents + (args.documents + 2) // 3)
+    print(f"{args.processes} processes, {operations} adds/deletes in total")
+    print(f"{'backend':<10}{'seconds':>9}{'missing':>9}{'stale':>7}{'dupes':>7}")
+    for name, worker, stored_ids in (("journal", journal_worker, stored_documents),
+                                     ("vectors", vector_worker, stored_vectors),
+                                     ("rewrite", rewrite_worker, stored_documents)):
+        elapsed, expected, stored = run(worker, stored_ids, args)
+        missing = len(expected - set(stored))
+        stale = len(set(stored) - expected)
+        dupes = len(stored) - len(set(stored))
+        print(f"{name:<10}{elapsed:>9.2f}{missing:>9}{stale:>7}{dupes:>7}")
+        if name != "rewrite":
+            assert not (missing or stale or dupes), f"{name} lost or kept the wrong documents"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Local surrogate model against remote scoring: accuracy on loan_test.csv and latency.
+
+Trains on loan_train.csv, scores loan_test.csv and compares with the test labels. Remote
+latency is measured through LoanPredictor against the fake deployment with a configurable
+round trip; the real deployment's accuracy cannot be measured offline.
+
+    python -m benchmarks.local_scoring --latency 0.15
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_watsonx import start_server
+from utils.prediction import LoanPredictor
+from utils.token_manager import TokenManager
+
+TARGET = "Loan Sanction Amount (USD)"
+
+
+def errors(predicted: np.ndarray, actual: np.ndarray):
+    mae = np.abs(predicted - actual).mean()
+    rmse = np.sqrt(((predicted - actual) ** 2).mean())
+    r2 = 1 - ((predicted - actual) ** 2).sum() / ((actual - actual.mean()) ** 2).sum()
+    return mae, rmse, r2
+
+
+def timed(call, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--train", default="loan_train.csv")
+    parser.add_argument("--test", default="loan_test.csv")
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.15, help="fake deployment round trip in seconds")
+    args = parser.parse_args()
+
+    train = pd.read_csv(args.train)
+    test = pd.read_csv(args.test)
+    actual = test[TARGET].to_numpy(dtype=np.float64)
+    features = test.drop(columns=[TARGET])
+
+    server, base_url = start_server(prediction_delay=args.latency)
+    with tempfile.TemporaryDirectory() as model_dir:
+        predictor = LoanPredictor(
+            token_manager=TokenManager(api_key="bench", iam_url=f"{base_url}/identity/token"),
+            use_cache=False, model_path=str(Path(model_dir) / "model.npz"),
+        )
+        predictor.base_url = f"{base_url}/ml/v4/deployments/bench/predictions?version=2021-05-01"
+
+        start = time.perf_counter()
+        model = predictor.train_local_model(train, TARGET, n_trees=args.trees, depth=args.depth)
+        print(f"trained {args.trees} trees of depth {args.depth} on {len(train)} rows "
+              f"in {time.perf_counter() - start:.2f} s")
+
+        local = predictor.predict_local(features, TARGET)[f"Predicted_{TARGET}"].to_numpy()
+        print(f"\n{'model':<22}{'MAE':>10}{'RMSE':>10}{'R2':>7}")
+        for name, predicted in (("surrogate (local)", local),
+                                ("training mean", np.full(len(actual), train[TARGET].mean()))):
+            mae, rmse, r2 = errors(predicted, actual)
+            print(f"{name:<22}{mae:>10,.0f}{rmse:>10,.0f}{r2:>7.3f}")
+
+        one = features.iloc[:1]
+        bins = model.encode(features)
+        print(f"\n{'latency':<34}{'total ms':>10}{'per row us':>12}")
+        rows = [
+            ("local, 1 row", timed(lambda: model.predict(one), 200), 1),
+            (f"local, {len(features)} rows", timed(lambda: model.predict(features), 20), len(features)),
+            (f"local trees only, {len(features)} rows", timed(lambda: model.predict_bins(bins), 20), len(features)),
+        ]
+        predictor.mode = "remote"
+        rows.append(("remote, 1 row", timed(lambda: predictor.predict(one, TARGET), 5), 1))
+        rows.append((f"remote, {len(features)} rows", timed(lambda: predictor.predict(features, TARGET)), len(features)))
+        for name, seconds, count in rows:
+            print(f"{name:<34}{seconds * 1000:>10.2f}{seconds / count * 1e6:>12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Chunk count, embedded characters and embedding time: fixed-size chunks against QA rows.
+
+Runs over the stored QA documents (or any text files given):
+
+    python -m benchmarks.qa_chunking
+"""
+import argparse
+import time
+from pathlib import Path
+
+from utils.vector_index import HashingEmbedder, chunk_qa_text, chunk_text
+
+
+def split_answers(chunks, texts):
+    # Answers whose text is spread over more than one fixed-size chunk
+    split = 0
+    for text in texts:
+        for row in chunk_qa_text(text):
+            start, end = row["metadata"]["start"], row["metadata"]["end"]
+            covering = [c for c in chunks if c["metadata"]["start"] < end and c["metadata"]["end"] > start
+                        and c["source"] is text]
+            split += len(covering) > 1
+    return split
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = [Path(f) for f in args.files] or sorted(Path("QA_files").glob("*.txt"))
+    texts = [path.read_text(encoding="utf-8") for path in paths]
+    embedder = HashingEmbedder()
+
+    chunkers = {"fixed 500/50": chunk_text, "qa rows": chunk_qa_text}
+    print(f"{'chunker':<14}{'chunks':>8}{'chars':>8}{'embed ms':>10}{'split answers':>15}")
+    for name, chunker in chunkers.items():
+        chunks = []
+        for text in texts:
+            for chunk in chunker(text):
+                chunk["source"] = text
+                chunks.append(chunk)
+        chunk_texts = [chunk["text"] for chunk in chunks]
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            embedder.embed(chunk_texts)
+        embed_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        chars = sum(len(t) for t in chunk_texts)
+        print(f"{name:<14}{len(chunks):>8}{chars:>8}{embed_ms:>10.2f}{split_answers(chunks, texts):>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Memory, recall@k and latency of int8 and PQ codes against float32 vectors, over every row
+and over the candidates of an IVF index (as VectorIndex searches above ann_threshold).
+
+    python -m benchmarks.quantization --rows 100000 --dim 768
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.ann_search import make_corpus, percentile_ms
+from utils.ann_index import IVFIndex, exact_search
+from utils.quantization import ProductQuantizer, ScalarQuantizer
+
+
+def run(search, queries, exact_ids, top_k):
+    hits, latencies = 0, []
+    for query, expected in zip(queries, exact_ids):
+        start = time.perf_counter()
+        _, ids = search(query)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & set(ids[:top_k].tolist()))
+    recall = hits / (len(queries) * top_k)
+    return recall, percentile_ms(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--subspaces", type=int, default=96)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4, 40])
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.rows + args.queries, args.dim, clusters=max(1, args.rows // 200))
+    vectors, queries = corpus[:args.rows], corpus[args.rows:]
+    exact_ids = [set(exact_search(vectors, query, args.top_k)[1].tolist()) for query in queries]
+
+    rows = [("float32", vectors.nbytes,
+             *run(lambda q: exact_search(vectors, q, args.top_k), queries, exact_ids, args.top_k))]
+    ann = IVFIndex(nprobe=args.nprobe)
+    ann.build(vectors)
+
+    def ivf(query):
+        candidates = ann.candidates(query)
+        _, top = exact_search(vectors[candidates], query, args.top_k)
+        return None, candidates[top]
+
+    ivf_rows = [("ivf float32", vectors.nbytes, *run(ivf, queries, exact_ids, args.top_k))]
+    for quantizer in (ScalarQuantizer(), ProductQuantizer(subspaces=args.subspaces)):
+        start = time.perf_counter()
+        quantizer.train(vectors)
+        codes = quantizer.encode(vectors)
+        print(f"{quantizer.kind} train + encode: {time.perf_counter() - start:.1f}s")
+
+        def adc(query, quantizer=quantizer, codes=codes):
+            return quantizer.search(codes, query, args.top_k)
+
+        rows.append((quantizer.kind, codes.nbytes, *run(adc, queries, exact_ids, args.top_k)))
+
+        for rescore in args.rescore:
+            def rescored(query, quantizer=quantizer, codes=codes, rescore=rescore):
+                # As VectorIndex does: exact scores for the best ADC candidates only
+                _, ids = quantizer.search(codes, query, args.top_k * rescore)
+                order = np.sort(ids)
+                _, top = exact_search(vectors[order], query, args.top_k)
+                return None, order[top]
+
+            rows.append((f"{quantizer.kind}+rescore{rescore}", codes.nbytes,
+                         *run(rescored, queries, exact_ids, args.top_k)))
+
+        def ivf_rescored(query, quantizer=quantizer, codes=codes):
+            # As VectorIndex does above ann_threshold: codes score the IVF candidates
+            candidates = ann.candidates(query)
+            _, top = quantizer.search(codes[candidates], query, args.top_k * quantizer.default_rescore)
+            order = candidates[np.sort(top)]
+            _, top = exact_search(vectors[order], query, args.top_k)
+            return None, order[top]
+
+        ivf_rows.append((f"ivf {quantizer.kind}+rescore{quantizer.default_rescore}", codes.nbytes,
+                         *run(ivf_rescored, queries, exact_ids, args.top_k)))
+
+    print(f"{args.rows} x {args.dim} vectors, IVF nprobe {args.nprobe} of {len(ann.centroids)}")
+    print(f"{'storage':<22}{'MB':>8}{'ratio':>8}{'recall@' + str(args.top_k):>10}{'p50 ms':>10}")
+    for name, nbytes, recall, p50 in rows + ivf_rows:
+        print(f"{name:<22}{nbytes / 2 ** 20:>8.1f}{vectors.nbytes / nbytes:>7.0f}x{recall:>10.3f}{p50:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
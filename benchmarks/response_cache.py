@@ -0,0 +1,53 @@
+"""Hit rate and latency saved by the semantic answer cache on a replayed chat log.
+
+The held-out rewordings from the recall benchmark are asked once, then again with the
+punctuation and politeness prefixes customers add, against the local fake server:
+
+    python -m benchmarks.response_cache
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.fake_watsonx import start_server
+from benchmarks.retrieval_recall import HELD_OUT, load_qa
+from benchmarks.stream_latency import StaticToken
+from utils.agent_setting import Agent
+from utils.response_cache import ResponseCache
+from utils.vector_index import VectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="+", default=["QA1.csv", "QA2.csv"])
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    texts, _ = load_qa(args.files)
+    server, base_url = start_server(token_delay=args.latency)
+    cache = ResponseCache(threshold=args.threshold)
+    questions = [query for query, _ in HELD_OUT]
+    # Repeats as customers type them: extra punctuation and spacing
+    log = questions + [f"{q}？" for q in questions] + [f"請問 {q}" for q in questions]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = VectorIndex(index_dir, search_mode="exact")
+        for name, text in texts:
+            index.add_document(name, text, name)
+        agent = Agent(StaticToken(), vector_index=index, base_url=base_url, response_cache=cache)
+
+        start = time.perf_counter()
+        for question in log:
+            agent.generate_response(agent.find_relevant_context(question), question)
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    metrics = cache.get_metrics()
+    print(f"{len(log)} questions in {elapsed:.2f} s")
+    print(f"hits {metrics['hits']}, misses {metrics['misses']}, hit rate {metrics['hit_rate']:.0%}")
+    print(f"generation time saved {metrics['latency_saved']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Retrieval recall of dense, BM25 and hybrid search on held-out questions.
+
+The index is built from QA1.csv/QA2.csv exactly as an upload would store them. Queries are
+rewordings of the stored questions (never the stored text itself); a query counts as a hit
+when a retrieved chunk contains the start of its source answer.
+
+    python -m benchmarks.retrieval_recall
+"""
+import argparse
+import re
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from utils.document_store import csv_bytes_to_text
+from utils.hybrid_retriever import HybridRetriever
+from utils.vector_index import VectorIndex, chunk_qa_text, chunk_text
+
+# (query, index of the source question in QA1.csv + QA2.csv)
+HELD_OUT = [
+    ("辦房貸的手續麻煩嗎", 0),
+    ("房貸申請步驟有哪些", 0),
+    ("申辦房貸需要帶什麼文件", 1),
+    ("房屋貸款要附哪些證明", 1),
+    ("估價房子要收錢嗎", 2),
+    ("鑑價費用要自己付嗎", 2),
+    ("辦房貸要花哪些費用", 3),
+    ("房貸的規費跟代書費多少", 3),
+    ("定儲利率指數是怎麼算的", 4),
+    ("定儲指數參考哪些銀行", 4),
+    ("理財型房貸是什麼", 5),
+    ("理財型跟一般房貸差在哪", 5),
+    ("理財型房貸的錢怎麼領出來", 6),
+    ("理財型房貸可以用金融卡提領嗎", 6),
+    ("二胎房貸是什麼意思", 7),
+    ("同一間房子可以再設定抵押嗎", 7),
+    ("現在最低房貸利率多少", 8),
+    ("新青安利率是多少", 8),
+    ("哪家銀行房貸利率最低", 9),
+    ("2.19%是哪家銀行", 9),
+    ("房貸利率怎樣才算合理", 10),
+    ("合理的房貸利率區間", 10),
+    ("房貸1000萬一個月要繳多少", 11),
+    ("貸1000萬30年月付多少", 11),
+    ("央行升息房貸會變貴嗎", 12),
+    ("升息3碼每月多繳多少", 12),
+]
+
+
+def load_qa(paths):
+    texts, answers = [], []
+    for path in paths:
+        data = Path(path).read_bytes()
+        texts.append((Path(path).name, csv_bytes_to_text(data)))
+        for answer in pd.read_csv(path).iloc[:, 1]:
+            answers.append(re.sub(r"\s+", "", str(answer))[:12])
+    return texts, answers
+
+
+def recall(search, answers, top_k):
+    hits = 0
+    for query, target in HELD_OUT:
+        results = search(query, top_k)
+        if any(answers[target] in re.sub(r"\s+", "", chunk["text"]) for _, chunk in results):
+            hits += 1
+    return hits / len(HELD_OUT)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="+", default=["QA1.csv", "QA2.csv"])
+    parser.add_argument("--chunker", choices=["qa", "fixed"], default="qa")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    texts, answers = load_qa(args.files)
+    with tempfile.TemporaryDirectory() as index_dir:
+        if args.chunker == "qa":
+            chunker = lambda text: chunk_qa_text(text, args.chunk_size)
+        else:
+            chunker = lambda text: chunk_text(text, args.chunk_size, args.chunk_size // 10)
+        index = VectorIndex(index_dir, search_mode="exact", chunker=chunker)
+        for name, text in texts:
+            index.add_document(name, text, name)
+        retriever = HybridRetriever(index)
+
+        methods = {
+            "dense": retriever.dense_search,
+            "bm25": retriever.lexical_search,
+            "hybrid": retriever.search,
+        }
+        print(f"{len(HELD_OUT)} held-out questions, {len(index.chunks)} chunks")
+        print(f"{'method':<10}" + "".join(f"{f'recall@{k}':>11}" for k in args.top_k))
+        for name, search in methods.items():
+            print(f"{name:<10}" + "".join(f"{recall(search, answers, k):>11.2f}" for k in args.top_k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Keyword search: the old per-document substring scan against the inverted index.
+
+Builds 1k/10k/100k-row corpora by repeating the rows of the stored QA files.
+
+    python -m benchmarks.search_latency
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from utils.search_index import SearchIndex
+
+QUERIES = ["貸款", "利率", "信用卡", "還款期限", "loan"]
+
+
+def load_rows(storage_dir: str):
+    rows = []
+    for path in Path(storage_dir).glob("*.txt"):
+        rows.extend(line for line in path.read_text(encoding="utf-8").split("\n")[1:] if line)
+    return rows
+
+
+def scan(contents, query):
+    # The original documents page: lower() every document and test each line
+    query = query.lower()
+    hits = []
+    for doc_id, content in contents.items():
+        if query in content.lower():
+            hits.extend((doc_id, row) for row, line in enumerate(content.split("\n")) if query in line.lower())
+    return hits
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="QA_files")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = load_rows(args.source)
+    print(f"{'rows':>8}{'scan ms':>10}{'index ms':>10}{'build s':>10}")
+    for total in args.rows:
+        rows = (source * (total // len(source) + 1))[:total]
+        per_doc = total // args.documents + 1
+        documents = {f"doc{i}": rows[i * per_doc:(i + 1) * per_doc] for i in range(args.documents)}
+        contents = {doc_id: "\n".join(lines) for doc_id, lines in documents.items()}
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = SearchIndex(index_dir)
+            start = time.perf_counter()
+            for doc_id, lines in documents.items():
+                index.add_document(doc_id, lines)
+            build_time = time.perf_counter() - start
+
+            scan_ms = timed(lambda: [scan(contents, q) for q in QUERIES], args.repeat) / len(QUERIES)
+            index_ms = timed(lambda: [index.search(q) for q in QUERIES], args.repeat) / len(QUERIES)
+        print(f"{total:>8}{scan_ms:>10.2f}{index_ms:>10.2f}{build_time:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Memory and read cost of many sessions over one storage directory, and how long a document
+added by another process takes to reach this one:
+
+    python -m benchmarks.shared_catalog --sessions 200 --documents 50 --rows 2000
+
+"per-session" is the old behaviour: every session keeps its own copy of the document list and
+reads a document's file on every download or preview. "shared" sessions hold references to
+the process-wide DocumentIndex and DocumentCache.
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from utils.document_cache import DocumentCache
+from utils.document_index import DocumentIndex
+
+
+def make_storage(storage_dir: str, documents: int, rows: int):
+    index = DocumentIndex(storage_dir)
+    for d in range(documents):
+        doc_id = str(uuid.uuid4())
+        lines = ["問題,答案"] + [f"第{d}份文件第{r}題？,這是第{r}題的答案，內容略長一些以接近真實資料。" for r in range(rows)]
+        (Path(storage_dir) / f"{doc_id}.txt").write_text("\n".join(lines), encoding="utf-8")
+        index.add({"id": doc_id, "name": f"{d}.csv", "type": "csv", "added_date": "", "size_kb": 0})
+    index.compact()
+
+
+class PerSessionStore:
+    def __init__(self, storage_dir: str):
+        self.storage_dir = Path(storage_dir)
+        with open(self.storage_dir / "document_index.json", "r", encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+    def get_document_content(self, doc_id: str) -> str:
+        with open(self.storage_dir / f"{doc_id}.txt", "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class SharedStore:
+    def __init__(self, index: DocumentIndex, cache: DocumentCache):
+        self.index = index
+        self.cache = cache
+
+    @property
+    def documents(self):
+        return self.index.documents()
+
+    def get_document_content(self, doc_id: str) -> str:
+        return self.cache.get_content(doc_id)
+
+
+def run(make_session, sessions: int, reads: int):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    stores = [make_session() for _ in range(sessions)]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for store in stores:
+        documents = store.documents
+        for doc in documents[:reads]:
+            store.get_document_content(doc["id"])
+    elapsed = time.perf_counter() - start
+    return retained, elapsed
+
+
+def add_from_other_process(storage_dir: str):
+    doc_id = str(uuid.uuid4())
+    (Path(storage_dir) / f"{doc_id}.txt").write_text("問題,答案\n新問題？,新答案", encoding="utf-8")
+    DocumentIndex(storage_dir).add({"id": doc_id, "name": "new.csv", "type": "csv", "added_date": "", "size_kb": 0})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=5, help="documents each session downloads")
+    parser.add_argument("--interval", type=float, default=0.5, help="watcher poll interval")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        make_storage(storage_dir, args.documents, args.rows)
+        index = DocumentIndex(storage_dir)
+        cache = DocumentCache(storage_dir)
+        index.subscribe("document_cache", cache.on_document_change)
+
+        print(f"{args.sessions} sessions, {args.documents} documents of {args.rows} rows, "
+              f"{args.reads} downloads per session")
+        print(f"{'store':<13}{'retained KB':>12}{'read s':>9}")
+        for name, make_session in (("per-session", lambda: PerSessionStore(storage_dir)),
+                                   ("shared", lambda: SharedStore(index, cache))):
+            retained, elapsed = run(make_session, args.sessions, args.reads)
+            print(f"{name:<13}{retained / 1024:>12.0f}{elapsed:>9.3f}")
+        print(f"shared cache: {cache.get_metrics()}")
+
+        # Change notification from another process, picked up by the watcher
+        seen = threading.Event()
+        index.subscribe("benchmark", lambda event, doc_id, doc: seen.set())
+        index.start_watching(args.interval)
+        start = time.perf_counter()
+        process = multiprocessing.Process(target=add_from_other_process, args=(storage_dir,))
+        process.start()
+        process.join()
+        seen.wait(10)
+        index.stop_watching()
+        print(f"add in another process seen after {time.perf_counter() - start:.2f} s "
+              f"(watcher every {args.interval} s): {seen.is_set()}")
+
+
+if __name__ == "__main__":
+    main()
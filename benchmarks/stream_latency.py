@@ -0,0 +1,49 @@
+"""Time-to-first-token of Agent.generate_response_stream against the blocking call.
+
+Runs entirely against the local fake server:
+    python -m benchmarks.stream_latency
+"""
+import argparse
+
+from benchmarks.fake_watsonx import ANSWER, start_server
+from utils.agent_setting import Agent
+from utils.response_cache import ResponseCache
+from utils.vector_index import VectorIndex
+
+
+class StaticToken:
+    def get_token(self):
+        return "local-token"
+
+    def refresh_token(self):
+        return "local-token"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--per-token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, base_url = start_server(token_delay=args.first_token_delay,
+                                    token_delay_per_chunk=args.per_token_delay)
+    agent = Agent(StaticToken(), vector_index=VectorIndex("QA_files/vector_index"), base_url=base_url,
+                  response_cache=ResponseCache())
+
+    text = agent.generate_response("", "房貸1000萬一個月要繳多少？")
+    blocking = agent.last_metrics
+    # Same question again: make sure it goes to the server rather than the answer cache
+    agent.response_cache.clear()
+
+    streamed = "".join(agent.generate_response_stream("", "房貸1000萬一個月要繳多少？"))
+    streaming = agent.last_metrics
+    server.shutdown()
+
+    assert text == ANSWER and streamed == ANSWER, "fake server answer was not reassembled intact"
+    print(f"{'mode':<12}{'first token s':>15}{'total s':>10}")
+    print(f"{'blocking':<12}{blocking['time_to_first_token']:>15.3f}{blocking['total_latency']:>10.3f}")
+    print(f"{'streaming':<12}{streaming['time_to_first_token']:>15.3f}{streaming['total_latency']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
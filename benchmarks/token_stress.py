@@ -0,0 +1,77 @@
+"""Concurrency stress run of TokenManager against the fake IAM endpoint.
+
+Many threads call get_token (and refresh_token, as after a 401) while short-lived tokens
+expire underneath them. Fails if any call hangs or returns no token, or if IAM is hit far
+more often than the token lifetime requires.
+
+    python -m benchmarks.token_stress --threads 64 --seconds 10
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.fake_watsonx import start_server
+from utils.token_manager import TokenManager
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--expires-in", type=int, default=3)
+    parser.add_argument("--iam-delay", type=float, default=0.2)
+    parser.add_argument("--forced-refresh-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server, base_url = start_server(iam_delay=args.iam_delay, iam_expires_in=args.expires_in)
+    manager = TokenManager(api_key="stress", iam_url=f"{base_url}/identity/token", min_refresh_interval=0.5)
+
+    calls, failures, worst = [0], [0], [0.0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+    start_barrier = threading.Barrier(args.threads)
+
+    def worker():
+        start_barrier.wait()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if random.random() < args.forced_refresh_rate:
+                token = manager.refresh_token()
+            else:
+                token = manager.get_token()
+            elapsed = time.perf_counter() - start
+            with lock:
+                calls[0] += 1
+                worst[0] = max(worst[0], elapsed)
+                if not token:
+                    failures[0] += 1
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=args.seconds + 30)
+    hung = sum(thread.is_alive() for thread in threads)
+    manager.stop()
+    server.shutdown()
+
+    metrics = manager.get_metrics()
+    # one proactive refresh per ~4/5 lifetime, plus bursts of forced refreshes collapsed by min_refresh_interval
+    budget = args.seconds / (args.expires_in * 0.8) + args.seconds / manager.min_refresh_interval + 2
+    print(f"calls:            {calls[0]}")
+    print(f"failed calls:     {failures[0]}")
+    print(f"hung threads:     {hung}")
+    print(f"worst call:       {worst[0] * 1000:.1f} ms")
+    print(f"IAM token calls:  {server.tokens_issued} (budget {budget:.0f})")
+    print(f"avg refresh:      {metrics['avg_refresh_latency'] * 1000:.1f} ms")
+
+    assert hung == 0, "threads hung waiting for a token"
+    assert failures[0] == 0, "get_token returned no token"
+    assert server.tokens_issued <= budget, "refresh was not single-flight"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Peak Python memory of ingesting one uploaded CSV, measured with tracemalloc:
+
+    python -m benchmarks.upload_memory --sizes 10 50 100
+
+"in-memory" is the previous upload path: getvalue() for the size check, read(), conversion
+with csv_bytes_to_text, writing the text, parsing it again for the columnar copy and
+keyword-indexing every token of the whole text. "streaming" spools the upload to a temp
+file, converts it and writes the columns in chunks, and keyword-indexes the words (not the
+numbers) streamed back from the stored file. The upload buffer itself (held by Streamlit
+either way) is not counted.
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from utils.columnar_store import write_columns, write_columns_from_csv
+from utils.document_store import csv_bytes_to_text, csv_file_to_text_file
+from utils.search_index import SearchIndex
+
+
+def make_upload(source: pd.DataFrame, size_mb: int) -> io.BytesIO:
+    data = source.to_csv(index=False).encode("utf-8")
+    repeat = max(size_mb * (1 << 20) // len(data), 1)
+    header, body = data.split(b"\n", 1)
+    return io.BytesIO(header + b"\n" + body * repeat)
+
+
+def in_memory(upload: io.BytesIO, storage_dir: Path):
+    len(upload.getvalue())
+    upload.seek(0)
+    text = csv_bytes_to_text(upload.read())
+    content_path = storage_dir / "doc.txt"
+    with open(content_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    write_columns(pd.read_csv(io.StringIO(text)), storage_dir / "doc_columns")
+    SearchIndex(storage_dir / "search_index").add_document("doc", text.split("\n")[1:])
+
+
+def streaming(upload: io.BytesIO, storage_dir: Path, chunksize: int):
+    upload.seek(0)
+    upload_path = storage_dir / "doc.upload.tmp"
+    with open(upload_path, "wb") as f:
+        shutil.copyfileobj(upload, f, 1 << 20)
+    content_path = storage_dir / "doc.txt"
+    csv_file_to_text_file(upload_path, content_path, chunksize)
+    os.remove(upload_path)
+    write_columns_from_csv(content_path, storage_dir / "doc_columns", chunksize)
+    SearchIndex(storage_dir / "search_index", numbers=False, chunk_rows=chunksize).add_document_file("doc", content_path)
+
+
+def measure(ingest, upload, *args):
+    # Timed in a separate untraced run; tracemalloc slows the chunked path far more
+    with tempfile.TemporaryDirectory() as storage_dir:
+        start = time.perf_counter()
+        ingest(upload, Path(storage_dir), *args)
+        elapsed = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as storage_dir:
+        tracemalloc.start()
+        ingest(upload, Path(storage_dir), *args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default="loan_train.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100], help="upload sizes in MB")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    args = parser.parse_args()
+
+    source = pd.read_csv(args.csv)
+    # Empty cells send both paths through pandas rather than the clean copy-through
+    print(f"{'MB':>5}{'in-memory peak MB':>19}{'s':>7}{'streaming peak MB':>19}{'s':>7}")
+    for size_mb in args.sizes:
+        upload = make_upload(source, size_mb)
+        results = []
+        for ingest, extra in ((in_memory, ()), (streaming, (args.chunksize,))):
+            results.append(measure(ingest, upload, *extra))
+        (old_peak, old_s), (new_peak, new_s) = results
+        print(f"{size_mb:>5}{old_peak / (1 << 20):>19.1f}{old_s:>7.2f}{new_peak / (1 << 20):>19.1f}{new_s:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
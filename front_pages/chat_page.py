@@ -34,23 +34,41 @@ def chat_page():
             st.markdown(prompt)
         
         with st.chat_message("assistant"):
-            with st.spinner("思考中..."):
-                try:
-                    # Get relevant context
+            try:
+                # Get relevant context
+                with st.spinner("思考中..."):
                     context = st.session_state.watsonx.find_relevant_context(prompt)
+                
+                # Stream the response as it is generated; earlier turns are trimmed to the history budget
+                response = st.write_stream(
+                    st.session_state.watsonx.generate_response_stream(
+                        context, prompt, history=st.session_state.messages[:-1]
+                    )
+                )
+                
+                if response:
+                    st.session_state.messages.append({"role": "assistant", "content": response})
                     
-                    # Generate response
-                    response = st.session_state.watsonx.generate_response(context, prompt)
+                    metrics = st.session_state.watsonx.last_metrics
+                    if metrics.get("cached"):
+                        cache_metrics = st.session_state.watsonx.response_cache.get_metrics()
+                        st.caption(
+                            f"快取回覆，耗時 {metrics['total_latency']:.2f} 秒"
+                            f"（命中率 {cache_metrics['hit_rate']:.0%}，"
+                            f"累計節省 {cache_metrics['latency_saved']:.1f} 秒）"
+                        )
+                    elif metrics.get("time_to_first_token") is not None:
+                        st.caption(
+                            f"首字延遲 {metrics['time_to_first_token']:.2f} 秒，"
+                            f"總耗時 {metrics['total_latency']:.2f} 秒，"
+                            f"輸入 {metrics['input_tokens']} / 輸出 {metrics['output_tokens']} tokens"
+                        )
+                else:
+                    default_response = "抱歉，我暫時無法處理您的請求。請稍後再試。"
+                    st.markdown(default_response)
+                    st.session_state.messages.append({"role": "assistant", "content": default_response})
                     
-                    if response:
-                        st.markdown(response)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
-                    else:
-                        default_response = "抱歉，我暫時無法處理您的請求。請稍後再試。"
-                        st.markdown(default_response)
-                        st.session_state.messages.append({"role": "assistant", "content": default_response})
-                        
-                except Exception as e:
-                    error_msg = f"處理請求時出錯: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
+            except Exception as e:
+                error_msg = f"處理請求時出錯: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
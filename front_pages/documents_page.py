@@ -1,7 +1,119 @@
 import streamlit as st
 import pandas as pd
+import time
 from utils.document_store import DocumentStore
 
+# 預覽每頁列數
+PAGE_SIZE = 50
+
+# 上傳大小上限 (MB)，與 Streamlit 預設的 server.maxUploadSize 相同；上傳以串流方式分塊處理
+MAX_UPLOAD_MB = 200
+
+def page_selector(doc_store, doc, key_prefix):
+    # 分頁控制，回傳從 0 開始的頁碼
+    total_rows = doc_store.get_row_count(doc['id'])
+    total_pages = max((total_rows - 1) // PAGE_SIZE + 1, 1)
+    page = st.number_input(
+        f"頁數 (共 {total_pages} 頁，{total_rows} 列)",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        key=f"{key_prefix}_page_{doc['id']}"
+    )
+    return page - 1
+
+def render_page_preview(doc_store, doc, page, key_prefix):
+    # 只讀取目前頁面的內容
+    page_data = doc_store.get_document_page(doc['id'], page, PAGE_SIZE)
+    if page_data is None:
+        return
+    
+    header = page_data['header'].split(',')
+    rows = [line.split(',') for line in page_data['lines']]
+    
+    # 檢查所有行的長度是否與標題一致
+    if all(len(row) == len(header) for row in rows):
+        df = pd.DataFrame(rows, columns=header, index=range(page * PAGE_SIZE, page * PAGE_SIZE + len(rows)))
+        st.dataframe(df, height=250)
+    else:
+        st.text_area(
+            "文件內容", 
+            '\n'.join([page_data['header']] + page_data['lines']), 
+            height=250,
+            disabled=True,
+            key=f"{key_prefix}_content_{doc['id']}_{page}"
+        )
+
+def render_index_status(doc_store, doc):
+    # 顯示 QA 文件的向量索引進度
+    status = doc_store.get_index_status(doc['id'])
+    if status is None:
+        return
+    
+    if status['state'] == "ready":
+        st.caption("✅ 已建立索引，可供聊天檢索")
+    elif status['state'] == "failed":
+        st.caption(f"❌ 索引失敗: {status['error']}")
+    elif status['state'] == "indexing":
+        total = status['total'] or 1
+        st.progress(status['done'] / total, text=f"索引中... {status['done']}/{status['total']} 段")
+    else:
+        st.caption("⏳ 等待建立索引")
+
+def render_search_results(doc_store, search_query):
+    # 從倒排索引取得排序後的符合列，不需掃描文件
+    results = doc_store.search(search_query)
+    
+    if not results:
+        st.info(f"沒有找到包含 '{search_query}' 的內容")
+        return
+    
+    st.success(f"找到 {len(results)} 筆符合的資料列")
+    
+    # 依文件分組，保留排名順序
+    grouped = {}
+    for result in results:
+        grouped.setdefault(result['id'], []).append(result)
+    
+    for doc_id, doc_results in grouped.items():
+        # 文件可能已被其他工作階段刪除
+        first_page = doc_store.get_document_page(doc_id, 0, 1)
+        if first_page is None:
+            continue
+        with st.expander(f"{doc_results[0]['name']} ({len(doc_results)} 列)", expanded=True):
+            header = first_page['header'].split(',')
+            rows = [result['line'].split(',') for result in doc_results]
+            
+            if all(len(row) == len(header) for row in rows):
+                df = pd.DataFrame(rows, columns=header, index=[result['row'] for result in doc_results])
+                
+                # 應用樣式以高亮匹配項
+                def highlight_cells(val):
+                    if search_query.lower() in str(val).lower():
+                        return 'background-color: yellow'
+                    return ''
+                
+                st.dataframe(df.style.applymap(highlight_cells))
+            else:
+                # 在文本中高亮結果
+                for result in doc_results:
+                    st.markdown(f"**第 {result['row']} 列**: " + result['line'].replace(search_query, f"**{search_query}**"))
+
+def render_download(doc_store, doc, key_prefix):
+    # 按下後才讀取完整內容供下載
+    prepared_key = f"{key_prefix}_prepared_{doc['id']}"
+    if st.session_state.get(prepared_key):
+        st.download_button(
+            "下載CSV",
+            doc_store.get_document_content(doc['id']),
+            file_name=doc['name'],
+            mime="text/csv",
+            key=f"{key_prefix}_download_{doc['id']}"
+        )
+    elif st.button("準備下載", key=f"{key_prefix}_prepare_{doc['id']}"):
+        st.session_state[prepared_key] = True
+        st.rerun()
+
 def documents_page():
     st.title("文件管理")
     
@@ -25,15 +137,15 @@ def documents_page():
         uploaded_file = st.file_uploader(
             "選擇CSV檔",
             type=['csv'],
-            help="支援的文件格式：CSV (10MB)",
+            help=f"支援的文件格式：CSV ({MAX_UPLOAD_MB}MB)",
             key=f"uploader_{doc_type}"
         )
         
         if uploaded_file:
-            file_size = len(uploaded_file.getvalue()) / (1024 * 1024)
+            file_size = uploaded_file.size / (1024 * 1024)
             
-            if file_size > 10:
-                st.error(f"文件大小超過限制 (10MB)")
+            if file_size > MAX_UPLOAD_MB:
+                st.error(f"文件大小超過限制 ({MAX_UPLOAD_MB}MB)")
             else:
                 if st.button("確認上傳", use_container_width=True):
                     with st.spinner("處理文件中..."):
@@ -41,14 +153,9 @@ def documents_page():
                             # 根據選擇的文件類型使用相應的文件存儲
                             doc_store = st.session_state.qa_document_store if doc_type == "QA問答文件" else st.session_state.data_document_store
                             
-                            file_content = doc_store.read_csv(uploaded_file.read())
+                            doc_id = doc_store.add_document_file(uploaded_file.name, uploaded_file)
                             
-                            if file_content:
-                                doc_id = doc_store.add_document(
-                                    uploaded_file.name,
-                                    file_content
-                                )
-                                
+                            if doc_id:
                                 st.success(f"文件 '{uploaded_file.name}' 已成功上傳！")
                                 st.rerun()
                             else:
@@ -78,58 +185,16 @@ def documents_page():
                 search_query = st.text_input("輸入搜索關鍵詞", key="qa_search_query")
                 
                 if search_query:
-                    # 簡單文本搜索
-                    results = []
-                    
-                    for doc in qa_documents:
-                        doc_content = st.session_state.qa_document_store.get_document_content(doc['id'])
-                        if search_query.lower() in doc_content.lower():
-                            results.append({
-                                "id": doc['id'],
-                                "name": doc['name'],
-                                "content": doc_content
-                            })
-                    
-                    if not results:
-                        st.info(f"沒有找到包含 '{search_query}' 的文件")
-                    else:
-                        st.success(f"找到 {len(results)} 個結果")
-                        
-                        for result in results:
-                            with st.expander(result['name']):
-                                # 嘗試以數據框形式顯示並高亮匹配單元格
-                                try:
-                                    lines = result['content'].strip().split('\n')
-                                    header = lines[0].split(',')
-                                    rows = [line.split(',') for line in lines[1:]]
-                                    
-                                    if all(len(row) == len(header) for row in rows):
-                                        df = pd.DataFrame(rows, columns=header)
-                                        
-                                        # 應用樣式以高亮匹配項
-                                        def highlight_cells(val):
-                                            if search_query.lower() in str(val).lower():
-                                                return 'background-color: yellow'
-                                            return ''
-                                        
-                                        st.dataframe(df.style.applymap(highlight_cells))
-                                    else:
-                                        # 在文本中高亮結果
-                                        content = result['content']
-                                        highlighted_content = content.replace(
-                                            search_query, 
-                                            f"**{search_query}**"
-                                        )
-                                        st.markdown(highlighted_content)
-                                except:
-                                    # 退回到帶高亮的文本
-                                    content = result['content']
-                                    highlighted_content = content.replace(
-                                        search_query, 
-                                        f"**{search_query}**"
-                                    )
-                                    st.markdown(highlighted_content)
+                    render_search_results(st.session_state.qa_document_store, search_query)
                 else:
+                    # 有文件仍在建立索引時提供重新整理
+                    if any(
+                        st.session_state.qa_document_store.get_index_status(doc['id'])['state'] in ("queued", "indexing")
+                        for doc in qa_documents
+                    ):
+                        if st.button("重新整理索引狀態", key="qa_refresh_index_status"):
+                            st.rerun()
+                    
                     # 顯示所有 QA 問答文件
                     for doc in qa_documents:
                         # 為每個文件創建展開器
@@ -137,43 +202,12 @@ def documents_page():
                             col1, col2 = st.columns([3, 1])
                             
                             with col1:
-                                doc_content = st.session_state.qa_document_store.get_document_content(doc['id'])
-                                
-                                # 嘗試以數據框形式顯示
-                                try:
-                                    lines = doc_content.strip().split('\n')
-                                    header = lines[0].split(',')
-                                    rows = [line.split(',') for line in lines[1:]]
-                                    
-                                    # 檢查所有行的長度是否與標題一致
-                                    if all(len(row) == len(header) for row in rows):
-                                        df = pd.DataFrame(rows, columns=header)
-                                        st.dataframe(df, height=250)
-                                    else:
-                                        st.text_area(
-                                            "文件內容", 
-                                            doc_content, 
-                                            height=250,
-                                            disabled=True,
-                                            key=f"qa_content_{doc['id']}"
-                                        )
-                                except:
-                                    st.text_area(
-                                        "文件內容", 
-                                        doc_content, 
-                                        height=250,
-                                        disabled=True,
-                                        key=f"qa_content_{doc['id']}"
-                                    )
+                                render_index_status(st.session_state.qa_document_store, doc)
+                                page = page_selector(st.session_state.qa_document_store, doc, "qa")
+                                render_page_preview(st.session_state.qa_document_store, doc, page, "qa")
                             
                             with col2:
-                                st.download_button(
-                                    "下載CSV",
-                                    doc_content,
-                                    file_name=doc['name'],
-                                    mime="text/csv",
-                                    key=f"qa_download_{doc['id']}"
-                                )
+                                render_download(st.session_state.qa_document_store, doc, "qa")
                                 
                                 st.write("")
                                 
@@ -196,57 +230,7 @@ def documents_page():
                 search_query = st.text_input("輸入搜索關鍵詞")
                 
                 if search_query:
-                    # 簡單文本搜索
-                    results = []
-                    
-                    for doc in data_documents:
-                        doc_content = st.session_state.data_document_store.get_document_content(doc['id'])
-                        if search_query.lower() in doc_content.lower():
-                            results.append({
-                                "id": doc['id'],
-                                "name": doc['name'],
-                                "content": doc_content
-                            })
-                    
-                    if not results:
-                        st.info(f"沒有找到包含 '{search_query}' 的文件")
-                    else:
-                        st.success(f"找到 {len(results)} 個結果")
-                        
-                        for result in results:
-                            with st.expander(result['name']):
-                                # 嘗試以數據框形式顯示並高亮匹配單元格
-                                try:
-                                    lines = result['content'].strip().split('\n')
-                                    header = lines[0].split(',')
-                                    rows = [line.split(',') for line in lines[1:]]
-                                    
-                                    if all(len(row) == len(header) for row in rows):
-                                        df = pd.DataFrame(rows, columns=header)
-                                        
-                                        # 應用樣式以高亮匹配項
-                                        def highlight_cells(val):
-                                            if search_query.lower() in str(val).lower():
-                                                return 'background-color: yellow'
-                                            return ''
-                                        
-                                        st.dataframe(df.style.applymap(highlight_cells))
-                                    else:
-                                        # 在文本中高亮結果
-                                        content = result['content']
-                                        highlighted_content = content.replace(
-                                            search_query, 
-                                            f"**{search_query}**"
-                                        )
-                                        st.markdown(highlighted_content)
-                                except:
-                                    # 退回到帶高亮的文本
-                                    content = result['content']
-                                    highlighted_content = content.replace(
-                                        search_query, 
-                                        f"**{search_query}**"
-                                    )
-                                    st.markdown(highlighted_content)
+                    render_search_results(st.session_state.data_document_store, search_query)
                 else:
                     # 顯示所有模型資料文件
                     for doc in data_documents:
@@ -255,43 +239,26 @@ def documents_page():
                             col1, col2 = st.columns([3, 1])
                             
                             with col1:
-                                doc_content = st.session_state.data_document_store.get_document_content(doc['id'])
+                                page = page_selector(st.session_state.data_document_store, doc, "data")
                                 
-                                # 嘗試以數據框形式顯示
-                                try:
-                                    lines = doc_content.strip().split('\n')
-                                    header = lines[0].split(',')
-                                    rows = [line.split(',') for line in lines[1:]]
-                                    
-                                    # 檢查所有行的長度是否與標題一致
-                                    if all(len(row) == len(header) for row in rows):
-                                        df = pd.DataFrame(rows, columns=header)
-                                        st.dataframe(df, height=250)
-                                    else:
-                                        st.text_area(
-                                            "文件內容", 
-                                            doc_content, 
-                                            height=250,
-                                            disabled=True,
-                                            key=f"data_content_{doc['id']}"
-                                        )
-                                except:
-                                    st.text_area(
-                                        "文件內容", 
-                                        doc_content, 
-                                        height=250,
-                                        disabled=True,
-                                        key=f"data_content_{doc['id']}"
+                                # 從欄式儲存只載入目前頁面的列
+                                load_start = time.perf_counter()
+                                preview_df = st.session_state.data_document_store.load_columns(
+                                    doc['id'], start=page * PAGE_SIZE, stop=(page + 1) * PAGE_SIZE
+                                )
+                                load_ms = (time.perf_counter() - load_start) * 1000
+                                
+                                if preview_df is not None:
+                                    st.dataframe(preview_df, height=250)
+                                    st.caption(
+                                        f"欄式儲存 {st.session_state.data_document_store.get_storage_size_kb(doc['id'])} KB，"
+                                        f"文字檔 {doc['size_kb']} KB，預覽載入 {load_ms:.1f} ms"
                                     )
+                                else:
+                                    render_page_preview(st.session_state.data_document_store, doc, page, "data")
                             
                             with col2:
-                                st.download_button(
-                                    "下載CSV",
-                                    doc_content,
-                                    file_name=doc['name'],
-                                    mime="text/csv",
-                                    key=f"data_download_{doc['id']}"
-                                )
+                                render_download(st.session_state.data_document_store, doc, "data")
                                 
                                 st.write("")
                                 
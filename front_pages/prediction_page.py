@@ -1,8 +1,104 @@
 import streamlit as st
 import pandas as pd
-from utils.prediction import LoanPredictor
+from utils.prediction import LoanPredictor, REQUIRED_FIELDS
+from utils.surrogate_model import get_surrogate_model
+from utils.document_store import DocumentStore
 import io
 
+# 預測模式選項 -> LoanPredictor mode
+PREDICTION_MODES = {
+    "遠端模型": "remote",
+    "本地模型": "local",
+    "本地優先（遠端確認）": "local_first",
+}
+
+def load_stored_data():
+    # 從欄式儲存只載入預測需要的欄位
+    if 'data_document_store' not in st.session_state:
+        st.session_state.data_document_store = DocumentStore(storage_dir="Data_files")
+    data_store = st.session_state.data_document_store
+    
+    documents = data_store.get_all_documents()
+    if not documents:
+        st.info("目前沒有上傳的模型資料。請至文件頁面上傳。")
+        return None, None
+    
+    doc = st.selectbox("選擇模型資料", documents, format_func=lambda d: d['name'])
+    columns = data_store.get_columns(doc['id'])
+    if not columns:
+        st.error("無法讀取模型資料")
+        return None, None
+    
+    st.subheader("選擇要預測的欄位")
+    prediction_col = st.selectbox("選擇預測欄位", options=columns, index=len(columns) - 1)
+    needed = [column for column in columns if column in REQUIRED_FIELDS and column != prediction_col] + [prediction_col]
+    return data_store.load_columns(doc['id'], columns=needed)[needed], prediction_col
+
+def load_training_data(target_column):
+    # 合併所有含目標欄位的模型資料，只載入 API 欄位與目標欄位
+    data_store = st.session_state.data_document_store
+    frames = []
+    for doc in data_store.get_all_documents():
+        columns = data_store.get_columns(doc['id'])
+        if target_column not in columns:
+            continue
+        needed = [column for column in columns if column in REQUIRED_FIELDS] + [target_column]
+        frames.append(data_store.load_columns(doc['id'], columns=needed)[needed])
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+def ensure_feature_schema(predictor):
+    # 以已上傳的模型資料編譯欄位檢查規則；模型資料有增減時重新編譯
+    if 'data_document_store' not in st.session_state:
+        st.session_state.data_document_store = DocumentStore(storage_dir="Data_files")
+    data_store = st.session_state.data_document_store
+    documents = data_store.get_all_documents()
+    if not documents:
+        return
+    sources = sorted(doc['id'] for doc in documents)
+    schema = predictor.get_schema()
+    if schema is not None and sorted(schema.sources) == sources:
+        return
+    frames = []
+    for doc in documents:
+        needed = [column for column in data_store.get_columns(doc['id']) if column in REQUIRED_FIELDS]
+        if needed:
+            frames.append(data_store.load_columns(doc['id'], columns=needed))
+    if frames:
+        predictor.compile_schema(pd.concat(frames, ignore_index=True), sources=sources)
+
+def render_issues(predictor):
+    # 預測前檢查的問題：錯誤的資料列未送出，警告的仍有預測
+    issues = predictor.last_issues
+    if issues is not None and len(issues):
+        with st.expander(f"資料檢查結果（{issues['row'].nunique()} 筆，{len(issues)} 項問題）"):
+            st.dataframe(issues)
+
+def render_local_model(target_column):
+    # 本地模型狀態與訓練
+    with st.expander("本地模型"):
+        model = get_surrogate_model()
+        if model is None:
+            st.info("尚未訓練本地模型")
+        else:
+            st.caption(
+                f"目標欄位 {model.target_column}，訓練資料 {model.info['rows']} 筆，"
+                f"訓練時間 {model.info['trained_at']}，訓練 MAE {model.info['train_mae']:,.0f}"
+            )
+        
+        if st.button(f"以模型資料訓練本地模型（{target_column}）"):
+            if 'data_document_store' not in st.session_state:
+                st.session_state.data_document_store = DocumentStore(storage_dir="Data_files")
+            train_df = load_training_data(target_column)
+            if train_df is None:
+                st.error(f"模型資料中沒有「{target_column}」欄位")
+                return
+            with st.spinner("訓練本地模型中..."):
+                try:
+                    model = LoanPredictor().train_local_model(train_df, target_column)
+                    st.success(f"本地模型訓練完成（{model.info['rows']} 筆，{model.info['train_seconds']} 秒）")
+                except Exception as e:
+                    st.error(f"本地模型訓練失敗: {str(e)}")
+
 def prediction_page():
     # 初始化 session state 來追蹤聊天是否已加載
     if "chat_loaded" not in st.session_state:
@@ -10,29 +106,44 @@ def prediction_page():
     
     st.title("預測頁面")
     
-    if 'token_manager' not in st.session_state:
+    mode = PREDICTION_MODES[st.radio("預測模式", list(PREDICTION_MODES), horizontal=True)]
+    
+    # 本地模型不需要 API 令牌
+    if mode != "local" and 'token_manager' not in st.session_state:
         st.error("Token Manager have not been initialized")
         return
     
-    uploaded_file = st.file_uploader("上傳預測資料檔案 (CSV)", type=["csv"])
+    data_source = st.radio("資料來源", ["上傳檔案", "已上傳的模型資料"], horizontal=True)
+    
+    df = None
+    prediction_col = None
+    if data_source == "上傳檔案":
+        uploaded_file = st.file_uploader("上傳預測資料檔案 (CSV)", type=["csv"])
+        if uploaded_file is not None:
+            try:
+                df = pd.read_csv(uploaded_file)
+            except Exception as e:
+                st.error(f"Error during process file: {str(e)}")
+    else:
+        df, prediction_col = load_stored_data()
     
-    if uploaded_file is not None:
+    if df is not None:
         try:
-            # User Operations
-            df = pd.read_csv(uploaded_file)
-            
             st.subheader("資料預覽")
             st.dataframe(df.head())
             
-            st.subheader("選擇要預測的欄位")
+            if prediction_col is None:
+                st.subheader("選擇要預測的欄位")
+                
+                columns = df.columns.tolist()
+                
+                prediction_col = st.selectbox(
+                    "選擇預測欄位",
+                    options=columns,
+                    index=len(columns) - 1
+                )
             
-            columns = df.columns.tolist()
-            
-            prediction_col = st.selectbox(
-                "選擇預測欄位",
-                options=columns,
-                index=len(columns) - 1
-            )
+            render_local_model(prediction_col)
             
             st.markdown(
                 """
@@ -49,12 +160,45 @@ def prediction_page():
             
             if st.button("開始預測"):
                 with st.spinner("正在預測..."):
+                    predictor = None
                     try:
-                        token_manager = st.session_state.token_manager
+                        token_manager = st.session_state.get('token_manager')
+                        
+                        predictor = LoanPredictor(token_manager=token_manager, mode=mode)
+                        ensure_feature_schema(predictor)
+                        
+                        # Per-chunk progress of the batch scoring
+                        progress_bar = st.progress(0.0, text="預測進度")
+                        
+                        def update_progress(done, total):
+                            progress_bar.progress(done / total, text=f"預測進度: {done}/{total} 批次")
+                        
+                        # 本地優先時先顯示本地模型的初步結果，遠端確認後再替換
+                        local_preview = st.empty()
+                        
+                        def show_local(local_df):
+                            with local_preview.container():
+                                st.subheader("本地模型初步結果（等待遠端確認）")
+                                st.dataframe(local_df)
+                        
+                        result_df = predictor.predict(df, prediction_col, progress_callback=update_progress,
+                                                      local_callback=show_local)
+                        local_preview.empty()
+                        render_issues(predictor)
                         
-                        predictor = LoanPredictor(token_manager=token_manager)
+                        if mode != "local":
+                            # Rows answered from the local prediction cache
+                            cache_stats = predictor.last_cache_stats
+                            hit_col, miss_col = st.columns(2)
+                            hit_col.metric("快取命中筆數", cache_stats["hits"])
+                            miss_col.metric("快取未命中筆數", cache_stats["misses"])
                         
-                        result_df = predictor.predict(df, prediction_col)
+                        local_stats = predictor.last_local_stats
+                        if local_stats:
+                            confirmed_col, mae_col = st.columns(2)
+                            confirmed_col.metric("遠端確認筆數", f"{local_stats['confirmed']}/{local_stats['rows']}")
+                            if local_stats["mae"] is not None:
+                                mae_col.metric("本地與遠端平均差異", f"{local_stats['mae']:,.0f}")
                         
                         # display result
                         st.subheader("預測結果")
@@ -71,6 +215,8 @@ def prediction_page():
                         
                     except Exception as e:
                         st.error(f"Error during predicting: {str(e)}")
+                        if predictor is not None:
+                            render_issues(predictor)
                         st.info("Please try again")
                     
         except Exception as e:
@@ -1,10 +1,23 @@
-import requests
 import streamlit as st
-from typing import Optional, Dict, Any, List
-import numpy as np
-import re
+from typing import Optional, Dict, Any, List, Iterator
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
 from dataclasses import dataclass
 import os
+from dotenv import load_dotenv
+from utils.vector_index import get_vector_index
+from utils.hybrid_retriever import HybridRetriever
+from utils.response_cache import get_response_cache, context_fingerprint
+from utils.context_builder import ContextBuilder, estimate_tokens
+from utils.http_client import get_http_client
+from utils.async_client import get_async_client
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -12,14 +25,109 @@ class Document:
     content: str
     metadata: Dict[str, Any]
 
+def _get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    try:
+        return st.secrets[name]
+    except:
+        return os.getenv(name, default)
+
+
 class Agent:
-    def __init__(self, token_manager=None):
+    def __init__(self, token_manager=None, vector_index=None, base_url: Optional[str] = None,
+                 retriever=None, response_cache=None, context_builder=None):
         # Initialize WatsonX API and vector storage
         self.token_manager = token_manager
         
+        # Shared on-disk index of the QA documents, loaded once per process
+        self.vector_index = vector_index or get_vector_index("QA_files")
+        
+        # Lexical + dense retrieval over that index; the context builder keeps prompts within budget
+        self.retriever = retriever or HybridRetriever(self.vector_index)
+        self.top_k = int(_get_setting("RETRIEVAL_TOP_K", "3"))
+        self.context_builder = context_builder or ContextBuilder(
+            max_context_tokens=int(_get_setting("CONTEXT_MAX_TOKENS", "1200")),
+            max_history_tokens=int(_get_setting("HISTORY_MAX_TOKENS", "600"))
+        )
+        
+        # Answers to near-duplicate questions over the same context are reused across sessions;
+        # context_sources remembers which documents each recent context was built from
+        self.response_cache = response_cache or get_response_cache()
+        self.context_sources: "OrderedDict[str, List[str]]" = OrderedDict()
+        
         # API settings
-        self.url = "https://us-south.ml.cloud.ibm.com/ml/v1/text/generation?version=2023-05-29"
+        base_url = base_url or _get_setting("WATSONX_URL", "https://us-south.ml.cloud.ibm.com")
+        self.url = f"{base_url}/ml/v1/text/generation?version=2023-05-29"
+        self.stream_url = f"{base_url}/ml/v1/text/generation_stream?version=2023-05-29"
+        self.model_id = _get_setting("WATSONX_MODEL_ID", "meta-llama/llama-3-3-70b-instruct")
+        self.project_id = _get_setting("WATSONX_PROJECT_ID")
+        self.parameters = {
+            "decoding_method": "greedy",
+            "max_new_tokens": 1000,
+            "repetition_penalty": 1.05
+        }
+        
+        # Latency (seconds) and token counts of the last generation call
+        self.last_metrics: Dict[str, Any] = {}
+        
+    def search_documents(self, query: str, top_k: Optional[int] = None) -> List[Document]:
+        # Return the best QA chunks from hybrid retrieval with their fused scores
+        return [
+            Document(content=chunk["text"], metadata={**chunk["metadata"], "doc_id": chunk["doc_id"], "score": score})
+            for score, chunk in self.retriever.search(query, top_k=top_k or self.top_k)
+        ]
+    
+    def find_relevant_context(self, query: str, top_k: Optional[int] = None,
+                              max_tokens: Optional[int] = None) -> str:
+        # Deduplicated, budget-trimmed chunks in rank order
+        documents = self.search_documents(query, top_k=top_k)
+        parts = self.context_builder.build_context([doc.content for doc in documents], max_tokens)
+        context = "\n\n".join(text for _, text in parts)
+        doc_ids = [documents[i].metadata["doc_id"] for i, _ in parts]
         
+        self.context_sources[context_fingerprint(context)] = doc_ids
+        while len(self.context_sources) > 256:
+            self.context_sources.popitem(last=False)
+        return context
+    
+    def format_history(self, messages: Optional[List[Dict[str, Any]]]) -> str:
+        # Most recent turns that fit the history budget, oldest first
+        roles = {"user": "客戶", "assistant": "專員"}
+        return "\n".join(
+            f"{roles.get(message['role'], message['role'])}: {message['content']}"
+            for message in self.context_builder.trim_history(messages or [])
+        )
+    
+    def _record_metrics(self, start: float, first_token_time: Optional[float], prompt: str,
+                        answer: Optional[str], usage: Dict[str, Any], cached: bool = False):
+        total_latency = time.perf_counter() - start
+        if cached:
+            input_tokens = output_tokens = 0
+        else:
+            # Prefer the counts reported by watsonx over the local estimate
+            input_tokens = usage.get("input_token_count") or estimate_tokens(prompt)
+            output_tokens = usage.get("generated_token_count") or estimate_tokens(answer or "")
+        self.last_metrics = {
+            "time_to_first_token": first_token_time,
+            "total_latency": total_latency,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached": cached
+        }
+        logger.info("generation tokens in=%d out=%d first_token=%s total=%.2fs cached=%s",
+                    input_tokens, output_tokens,
+                    f"{first_token_time:.2f}s" if first_token_time is not None else "-",
+                    total_latency, cached)
+    
+    def _cached_answer(self, context: str, query: str, history: str, start: float) -> Optional[str]:
+        answer = self.response_cache.lookup(query, context, history)
+        if answer is not None:
+            self._record_metrics(start, time.perf_counter() - start, "", answer, {}, cached=True)
+        return answer
+    
+    def _cache_answer(self, context: str, query: str, history: str, answer: Optional[str], latency: float):
+        if answer:
+            doc_ids = self.context_sources.get(context_fingerprint(context), [])
+            self.response_cache.store(query, context, answer, history=history, doc_ids=doc_ids, latency=latency)
     
     def _get_headers(self):
         # Get headers with fresh token
@@ -34,3 +142,155 @@ class Agent:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}"
         }
+    
+    def _build_payload(self, context: str, query: str, history: str = "") -> Dict[str, Any]:
+        prompt = (
+            "你是XX銀行的房貸專員助手，請根據以下參考資料，用繁體中文回答客戶的問題。"
+            "如果參考資料中沒有相關資訊，請誠實告知並建議客戶洽詢專員。\n\n"
+            f"參考資料:\n{context}\n\n"
+            + (f"對話紀錄:\n{history}\n\n" if history else "")
+            + f"客戶問題: {query}\n\n"
+            "回答:"
+        )
+        payload = {
+            "input": prompt,
+            "parameters": self.parameters,
+            "model_id": self.model_id
+        }
+        if self.project_id:
+            payload["project_id"] = self.project_id
+        return payload
+    
+    def _refresh_headers(self, headers: Dict[str, str]):
+        # Replace a rejected token in place
+        token = self.token_manager.refresh_token()
+        if not token:
+            raise Exception("Cannot refresh token")
+        headers["Authorization"] = f"Bearer {token}"
+    
+    @staticmethod
+    def _check_response(response):
+        # Works for both requests and httpx responses
+        if response.status_code != 200:
+            raise Exception(f"Generation request fail: {response.status_code}, Response: {response.text}")
+    
+    def _finish_response(self, data: Dict[str, Any], context: str, query: str, history: str,
+                         payload: Dict[str, Any], start: float) -> Optional[str]:
+        # Answer of a non-streaming generation, with metrics and answer cache updated
+        results = data.get("results", [])
+        answer = results[0].get("generated_text", "").strip() if results else None
+        elapsed = time.perf_counter() - start
+        self._record_metrics(start, elapsed, payload["input"], answer, results[0] if results else {})
+        self._cache_answer(context, query, history, answer, elapsed)
+        return answer
+    
+    def _post(self, url: str, payload: Dict[str, Any], stream: bool = False):
+        headers = self._get_headers()
+        if not headers:
+            return None
+        if stream:
+            headers["Accept"] = "text/event-stream"
+        
+        http = get_http_client()
+        response = http.post(url, json=payload, headers=headers, stream=stream)
+        
+        # Retry once with a new token if the current one was rejected
+        if response.status_code == 401 and self.token_manager:
+            response.close()
+            self._refresh_headers(headers)
+            response = http.post(url, json=payload, headers=headers, stream=stream)
+        
+        self._check_response(response)
+        return response
+    
+    def generate_response(self, context: str, query: str,
+                          history: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        start = time.perf_counter()
+        history_text = self.format_history(history)
+        cached = self._cached_answer(context, query, history_text, start)
+        if cached is not None:
+            return cached
+        
+        payload = self._build_payload(context, query, history_text)
+        response = self._post(self.url, payload)
+        if response is None:
+            return None
+        return self._finish_response(response.json(), context, query, history_text, payload, start)
+    
+    async def agenerate_response(self, context: str, query: str,
+                                 history: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        # Async variant for running several generations on one event loop
+        start = time.perf_counter()
+        history_text = self.format_history(history)
+        cached = self._cached_answer(context, query, history_text, start)
+        if cached is not None:
+            return cached
+        
+        # TokenManager is thread based, keep its calls off the event loop
+        headers = await asyncio.to_thread(self._get_headers)
+        if not headers:
+            return None
+        
+        client = get_async_client()
+        payload = self._build_payload(context, query, history_text)
+        response = await client.generate(self.url, payload, headers)
+        if response.status_code == 401 and self.token_manager:
+            await asyncio.to_thread(self._refresh_headers, headers)
+            response = await client.generate(self.url, payload, headers)
+        
+        self._check_response(response)
+        return self._finish_response(response.json(), context, query, history_text, payload, start)
+    
+    async def aanswer(self, query: str, top_k: Optional[int] = None) -> Optional[str]:
+        # Retrieval runs in a worker thread so other answers keep generating meanwhile
+        context = await asyncio.to_thread(self.find_relevant_context, query, top_k)
+        return await self.agenerate_response(context, query)
+    
+    def generate_response_stream(self, context: str, query: str,
+                                 history: Optional[List[Dict[str, Any]]] = None) -> Iterator[str]:
+        # Yield partial text from the server-sent events of the generation_stream endpoint
+        start = time.perf_counter()
+        self.last_metrics = {}
+        first_token_time = None
+        history_text = self.format_history(history)
+        
+        cached = self._cached_answer(context, query, history_text, start)
+        if cached is not None:
+            yield cached
+            return
+        
+        payload = self._build_payload(context, query, history_text)
+        response = self._post(self.stream_url, payload, stream=True)
+        if response is None:
+            return
+        
+        parts = []
+        usage = {}
+        try:
+            for raw_line in response.iter_lines():
+                # Decode per line so multi-byte characters split across network chunks stay intact
+                line = raw_line.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if not data or data == "[DONE]":
+                    continue
+                
+                event = json.loads(data)
+                if "errors" in event:
+                    raise Exception(f"Generation stream error: {event['errors']}")
+                
+                for result in event.get("results", []):
+                    usage = result
+                    text = result.get("generated_text", "")
+                    if text:
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter() - start
+                        parts.append(text)
+                        yield text
+            
+            # Only answers streamed to the end are cached
+            self._cache_answer(context, query, history_text, "".join(parts).strip(), time.perf_counter() - start)
+        finally:
+            response.close()
+            self._record_metrics(start, first_token_time, payload["input"], "".join(parts), usage)
@@ -0,0 +1,122 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class IVFIndex:
+    """Inverted-file approximate search over L2-normalised vectors.
+
+    Vectors are clustered with spherical k-means; a query only scores the rows in
+    its ``nprobe`` closest clusters. Raising ``nprobe`` trades latency for recall.
+    Removed rows keep their position with cluster -1, so they sort before every
+    inverted list, until the caller compacts with ``keep``.
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iterations: int = 10, train_sample: int = 64, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.train_sample = train_sample
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.assignments)
+
+    def train(self, vectors: np.ndarray):
+        # Spherical k-means on a random sample of the rows
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, nlist * self.train_sample)
+        sample = np.asarray(vectors[rng.choice(n, sample_size, replace=False)], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the previous centroid for clusters that lost all their points
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = n
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            labels[start:start + batch_size] = np.argmax(batch @ self.centroids.T, axis=1)
+        return labels
+
+    def build(self, vectors: np.ndarray):
+        self.train(vectors)
+        self.assignments = self._assign(vectors)
+        self._order = None
+
+    def add(self, vectors: np.ndarray):
+        # New rows are appended to the existing clusters without retraining
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._order = None
+
+    def remove(self, start: int, end: int):
+        self.assignments[start:end] = -1
+        self._order = None
+
+    def keep(self, mask: np.ndarray):
+        # Drop rows after the vectors were compacted the same way
+        self.assignments = self.assignments[mask]
+        self._order = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind="stable")
+            self._offsets = np.searchsorted(
+                self.assignments[self._order], np.arange(len(self.centroids) + 1)
+            )
+        return self._order, self._offsets
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        # Sorted row ids in the nprobe clusters closest to the query
+        order, offsets = self._inverted_lists()
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+        candidates.sort()
+        return candidates
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        candidates = self.candidates(query, nprobe)
+        scores, top = exact_search(np.asarray(vectors[candidates]), query, top_k)
+        return scores, candidates[top]
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, top_k: int,
+                 deleted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # Brute-force inner product over every row; rows in ``deleted`` are never returned
+    scores = vectors @ query
+    top_k = min(top_k, len(scores))
+    if deleted is not None and len(deleted):
+        scores[deleted] = -np.inf
+        top_k = min(top_k, len(scores) - len(deleted))
+    if top_k == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top])]
+    return scores[top], top
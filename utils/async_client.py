@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Coroutine
+
+import httpx
+
+
+class AsyncWatsonxClient:
+    """asyncio client for the text generation and deployment prediction endpoints.
+
+    Several calls can be in flight on one event loop; the connection pool is limited to
+    ``max_connections``. httpx pools are bound to the loop they were first used on, so one
+    pool is kept per running loop (the shared loop thread, or e.g. ``asyncio.run``).
+    """
+
+    def __init__(self, max_connections: int = 20, timeout: float = 60.0):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # event loop -> httpx.AsyncClient, dropped with the loop
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Only called from coroutines, so there is always a running loop
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return client
+
+    async def generate(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        return await self.client.post(url, json=payload, headers=headers)
+
+    async def predict(self, url: str, body: bytes, headers: Dict[str, str]) -> httpx.Response:
+        return await self.client.post(url, content=body, headers=headers)
+
+    async def aclose(self):
+        # Close the pool of the running loop
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class _LoopThread:
+    # A private event loop in a daemon thread, so synchronous Streamlit code can submit coroutines
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+
+_loop_thread: Optional[_LoopThread] = None
+_async_client: Optional[AsyncWatsonxClient] = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop_thread
+    with _lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread.loop
+
+
+def submit_async(coro: Coroutine) -> Future:
+    # Schedule a coroutine on the shared loop and return a concurrent.futures.Future
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None):
+    # Sync facade: block the calling thread until the coroutine finishes on the shared loop
+    return submit_async(coro).result(timeout=timeout)
+
+
+def get_async_client() -> AsyncWatsonxClient:
+    # Process-wide client, usable from any event loop
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncWatsonxClient()
+        return _async_client
@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_FILE = "schema.json"
+
+
+def write_columns(df: pd.DataFrame, column_dir: str):
+    """Store a frame as one ``.npy`` file per column plus a ``schema.json`` sidecar.
+
+    Numeric columns keep their dtype; other columns are dictionary encoded as int32 codes
+    (-1 for missing) with the categories kept in the schema.
+    """
+    column_dir = Path(column_dir)
+    tmp_dir = column_dir.with_name(column_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df.iloc[:, i]
+        file_name = f"{i}.npy"
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            np.save(tmp_dir / file_name, series.to_numpy())
+            columns.append({"name": str(name), "file": file_name, "kind": "numeric", "dtype": str(series.dtype)})
+        else:
+            codes, categories = pd.factorize(series.astype(object), use_na_sentinel=True)
+            np.save(tmp_dir / file_name, codes.astype(np.int32))
+            columns.append({
+                "name": str(name), "file": file_name, "kind": "category",
+                "dtype": "object", "categories": [str(c) for c in categories]
+            })
+
+    with open(tmp_dir / SCHEMA_FILE, "w", encoding="utf-8") as f:
+        json.dump({"rows": len(df), "columns": columns}, f, ensure_ascii=False)
+
+    # Swap the finished directory into place so readers never see a partial write
+    shutil.rmtree(column_dir, ignore_errors=True)
+    os.replace(tmp_dir, column_dir)
+
+
+def scan_csv_dtypes(csv_path: str, chunksize: int = 50000, **read_options
+                    ) -> Tuple[List[str], Dict[str, Tuple[str, np.dtype]], int]:
+    """Column names, ``(kind, dtype)`` per column and row count that ``pd.read_csv`` would
+    infer for the whole file, found ``chunksize`` rows at a time.
+
+    kind is "numeric", "bool" or "category"; a column whose chunks disagree (numbers in one,
+    text in another) is a category, and numeric dtypes widen across chunks as pandas would.
+    """
+    names = None
+    kinds = {}
+    rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, **read_options):
+        if names is None:
+            names = list(chunk.columns)
+        rows += len(chunk)
+        for name in names:
+            series = chunk[name]
+            if pd.api.types.is_bool_dtype(series):
+                kind = "bool"
+            elif pd.api.types.is_numeric_dtype(series):
+                kind = "numeric"
+            else:
+                kind = "category"
+            previous = kinds.get(name, (kind, series.dtype))
+            if previous[0] != kind:
+                kinds[name] = ("category", np.dtype(object))
+            elif kind == "numeric":
+                kinds[name] = (kind, np.result_type(previous[1], series.dtype))
+            else:
+                kinds[name] = (kind, series.dtype)
+    if names is None:
+        names = list(pd.read_csv(csv_path, nrows=0, **read_options).columns)
+    for name in names:
+        # Header-only files
+        kinds.setdefault(name, ("category", np.dtype(object)))
+    return names, kinds, rows
+
+
+def write_columns_from_csv(csv_path: str, column_dir: str, chunksize: int = 50000):
+    """Same output as ``write_columns(pd.read_csv(csv_path), column_dir)``, reading the file
+    ``chunksize`` rows at a time.
+
+    A first pass settles each column's kind and dtype across all chunks; the second writes
+    the chunks into preallocated memory-mapped ``.npy`` files.
+    """
+    column_dir = Path(column_dir)
+    names, kinds, rows = scan_csv_dtypes(csv_path, chunksize)
+
+    tmp_dir = column_dir.with_name(column_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    outputs = {}
+    categories = {}
+    columns = []
+    for i, name in enumerate(names):
+        kind, dtype = kinds[name]
+        file_name = f"{i}.npy"
+        if kind == "category":
+            dtype = np.dtype(np.int32)
+            categories[name] = {}
+            columns.append({"name": str(name), "file": file_name, "kind": "category", "dtype": "object"})
+        else:
+            columns.append({"name": str(name), "file": file_name, "kind": "numeric", "dtype": str(dtype)})
+        outputs[name] = np.lib.format.open_memmap(tmp_dir / file_name, mode="w+", dtype=dtype, shape=(rows,))
+
+    text_columns = {name: str for name in categories}
+    start = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=text_columns):
+        stop = start + len(chunk)
+        for name in names:
+            series = chunk[name]
+            if name in categories:
+                # Local codes of this chunk mapped onto codes shared by the whole column
+                codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+                lookup = np.array([categories[name].setdefault(str(value), len(categories[name]))
+                                   for value in uniques] + [-1], dtype=np.int32)
+                outputs[name][start:stop] = lookup[codes]
+            else:
+                outputs[name][start:stop] = series.to_numpy()
+        start = stop
+
+    for name, output in outputs.items():
+        output.flush()
+    del outputs
+    for column in columns:
+        if column["kind"] == "category":
+            column["categories"] = list(categories[column["name"]])
+
+    with open(tmp_dir / SCHEMA_FILE, "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "columns": columns}, f, ensure_ascii=False)
+
+    shutil.rmtree(column_dir, ignore_errors=True)
+    os.replace(tmp_dir, column_dir)
+
+
+def read_schema(column_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(Path(column_dir) / SCHEMA_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_columns(column_dir: str, columns: Optional[List[str]] = None,
+                 start: int = 0, stop: Optional[int] = None) -> Optional[pd.DataFrame]:
+    # Memory-map only the requested columns and copy out only the requested rows
+    schema = read_schema(column_dir)
+    if schema is None:
+        return None
+
+    wanted = schema["columns"] if columns is None else [
+        column for column in schema["columns"] if column["name"] in set(columns)
+    ]
+    data = {}
+    for column in wanted:
+        values = np.load(Path(column_dir) / column["file"], mmap_mode="r")[start:stop]
+        if column["kind"] == "category":
+            categories = np.array(column["categories"] + [None], dtype=object)
+            # code -1 picks the trailing None
+            data[column["name"]] = categories[np.asarray(values)]
+        else:
+            data[column["name"]] = np.array(values)
+    stop = schema["rows"] if stop is None else min(stop, schema["rows"])
+    return pd.DataFrame(data, index=pd.RangeIndex(start, max(start, stop)))
+
+
+def columns_size(column_dir: str) -> int:
+    column_dir = Path(column_dir)
+    if not column_dir.exists():
+        return 0
+    return sum(path.stat().st_size for path in column_dir.iterdir() if path.is_file())
+
+
+def delete_columns(column_dir: str):
+    shutil.rmtree(column_dir, ignore_errors=True)
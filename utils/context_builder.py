@@ -0,0 +1,103 @@
+import re
+from typing import Optional, List, Dict, Any, Tuple
+
+from utils.text_patterns import CJK_CHAR, CJK_RANGES, SENTENCE_END
+
+_WORD = re.compile(r"[A-Za-z]+|\d+")
+_SYMBOL = re.compile(rf"[^\sA-Za-z\d{CJK_RANGES}]")
+
+
+def estimate_tokens(text: str) -> int:
+    # Llama-style BPE approximation: one token per CJK character or symbol,
+    # about one per four characters of latin words and digits
+    cjk = len(CJK_CHAR.findall(text))
+    words = sum((len(word) + 3) // 4 for word in _WORD.findall(text))
+    symbols = len(_SYMBOL.findall(text))
+    return cjk + words + symbols
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    # Keep whole sentences up to the budget; cut mid-sentence only if the first one is too long
+    kept = []
+    used = 0
+    for sentence in SENTENCE_END.split(text):
+        tokens = estimate_tokens(sentence)
+        if used + tokens > max_tokens:
+            if not kept:
+                # Shrink by characters until it fits
+                cut = len(sentence) * max_tokens // max(tokens, 1)
+                while cut > 0 and estimate_tokens(sentence[:cut]) > max_tokens:
+                    cut -= 1
+                kept.append(sentence[:cut])
+            break
+        kept.append(sentence)
+        used += tokens
+    return "".join(kept).rstrip()
+
+
+def _shingles(text: str) -> set:
+    text = re.sub(r"\s+", "", text)
+    return {text[i:i + 3] for i in range(max(len(text) - 2, 1))}
+
+
+class ContextBuilder:
+    """Assembles the retrieved chunks and chat history that go into a generation prompt.
+
+    Chunks are taken in rank order; near-duplicates are dropped, chunks over ``max_chunk_tokens``
+    are cut at a sentence boundary, and the total stays within ``max_context_tokens``. History
+    keeps the most recent turns that fit in ``max_history_tokens``.
+    """
+
+    def __init__(self, max_context_tokens: int = 1200, max_chunk_tokens: int = 400,
+                 max_history_tokens: int = 600, duplicate_threshold: float = 0.8):
+        self.max_context_tokens = max_context_tokens
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_history_tokens = max_history_tokens
+        self.duplicate_threshold = duplicate_threshold
+
+    def _is_duplicate(self, shingles: set, kept: List[set]) -> bool:
+        for other in kept:
+            overlap = len(shingles & other) / max(min(len(shingles), len(other)), 1)
+            if overlap >= self.duplicate_threshold:
+                return True
+        return False
+
+    def build_context(self, texts: List[str], max_tokens: Optional[int] = None) -> List[Tuple[int, str]]:
+        # Returns (position in texts, possibly shortened text) for the chunks to use, in order
+        budget = max_tokens or self.max_context_tokens
+        parts = []
+        kept_shingles = []
+        used = 0
+        for i, text in enumerate(texts):
+            shingles = _shingles(text)
+            if self._is_duplicate(shingles, kept_shingles):
+                continue
+
+            remaining = budget - used
+            part = text
+            if estimate_tokens(part) > min(self.max_chunk_tokens, remaining):
+                # Not worth adding a fragment shorter than a sentence or two
+                if remaining < 50 and parts:
+                    break
+                part = truncate_to_tokens(part, min(self.max_chunk_tokens, remaining))
+            if not part:
+                break
+
+            parts.append((i, part))
+            kept_shingles.append(shingles)
+            used += estimate_tokens(part) + 1
+        return parts
+
+    def trim_history(self, messages: List[Dict[str, Any]],
+                     max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Most recent messages first until the budget is used, returned in chat order
+        budget = max_tokens or self.max_history_tokens
+        kept = []
+        used = 0
+        for message in reversed(messages):
+            tokens = estimate_tokens(message["content"]) + 2
+            if used + tokens > budget:
+                break
+            kept.append(message)
+            used += tokens
+        return list(reversed(kept))
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Tuple
+
+import numpy as np
+
+from utils.document_index import get_document_index
+
+
+class DocumentCache:
+    """Document text and line offsets of one storage directory, shared by every session.
+
+    Entries are keyed by the content file's (inode, mtime, size), so a file rewritten by
+    another process is re-read on the next access, and are dropped as soon as the document
+    index reports the document added or deleted. Text is kept up to ``max_bytes`` in total,
+    least recently used first out; offsets are memory-mapped and not counted.
+    """
+
+    def __init__(self, storage_dir: str, max_bytes: int = 64 << 20):
+        self.storage_dir = Path(storage_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        # (kind, doc_id) -> (stat key, value, size)
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[Any, Any, int]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _stat_key(self, doc_id: str):
+        stat = (self.storage_dir / f"{doc_id}.txt").stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _get(self, kind: str, doc_id: str, key):
+        with self.lock:
+            entry = self.entries.get((kind, doc_id))
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((kind, doc_id))
+            self.hits += 1
+            return entry[1]
+
+    def _put(self, kind: str, doc_id: str, key, value, size: int):
+        with self.lock:
+            old = self.entries.pop((kind, doc_id), None)
+            if old is not None:
+                self.size -= old[2]
+            self.entries[(kind, doc_id)] = (key, value, size)
+            self.size += size
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, (_, _, dropped) = self.entries.popitem(last=False)
+                self.size -= dropped
+
+    def get_content(self, doc_id: str) -> str:
+        # Raises OSError when the document file is missing
+        key = self._stat_key(doc_id)
+        content = self._get("content", doc_id, key)
+        if content is None:
+            with open(self.storage_dir / f"{doc_id}.txt", "r", encoding="utf-8") as f:
+                content = f.read()
+            if len(content) <= self.max_bytes:
+                self._put("content", doc_id, key, content, key[2])
+        return content
+
+    def get_offsets(self, doc_id: str, build: Callable[[str], None]) -> np.ndarray:
+        # Line start offsets of a document; build(doc_id) rewrites a missing or stale offsets file
+        key = self._stat_key(doc_id)
+        offsets = self._get("offsets", doc_id, key)
+        if offsets is None:
+            offsets_path = self.storage_dir / f"{doc_id}.offsets.npy"
+            if not offsets_path.exists() or offsets_path.stat().st_mtime_ns < key[1]:
+                build(doc_id)
+            offsets = np.load(offsets_path, mmap_mode="r")
+            self._put("offsets", doc_id, key, offsets, 0)
+        return offsets
+
+    def invalidate(self, doc_id: str):
+        with self.lock:
+            for kind in ("content", "offsets"):
+                entry = self.entries.pop((kind, doc_id), None)
+                if entry is not None:
+                    self.size -= entry[2]
+
+    def on_document_change(self, event: str, doc_id: str, doc: Optional[Dict[str, Any]]):
+        # DocumentIndex listener
+        self.invalidate(doc_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_caches: Dict[str, DocumentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_document_cache(storage_dir: str) -> DocumentCache:
+    # One cache per storage directory per process, invalidated by its document index
+    with _caches_lock:
+        if storage_dir not in _caches:
+            cache = DocumentCache(storage_dir)
+            get_document_index(storage_dir).subscribe("document_cache", cache.on_document_change)
+            _caches[storage_dir] = cache
+        return _caches[storage_dir]
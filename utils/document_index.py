@@ -0,0 +1,281 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "document_index.json"
+JOURNAL_FILE = "document_index.journal"
+LOCK_FILE = "document_index.lock"
+
+ADDED = "add"
+DELETED = "delete"
+
+# (event, doc_id, doc) with doc None for deletions
+Listener = Callable[[str, str, Optional[Dict[str, Any]]], None]
+
+
+@contextmanager
+def file_lock(path: Path):
+    # Exclusive across processes (flock / msvcrt); not re-entrant, so callers guard with a lock
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DocumentIndex:
+    """Document list of a storage directory, safe to update from several processes.
+
+    ``document_index.json`` is a compacted snapshot (the same list format as before) and
+    ``document_index.journal`` holds one JSON line per add/delete since then. Writers append
+    under an exclusive file lock; readers replay only the journal bytes they have not seen.
+    Once the journal passes ``compact_every`` entries it is folded into a new snapshot.
+
+    Listeners registered with ``subscribe`` hear about every document added or deleted, by
+    this process or another one, the first time the change is read.
+    """
+
+    def __init__(self, storage_dir: str, compact_every: int = 200):
+        self.storage_dir = Path(storage_dir)
+        self.compact_every = compact_every
+        self.lock = threading.RLock()
+
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._snapshot_key = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+        self._listeners: Dict[str, Listener] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def _snapshot_path(self) -> Path:
+        return self.storage_dir / SNAPSHOT_FILE
+
+    @property
+    def _journal_path(self) -> Path:
+        return self.storage_dir / JOURNAL_FILE
+
+    @contextmanager
+    def _file_lock(self):
+        # Exclusive across processes and across threads (RLock)
+        with self.lock, file_lock(self.storage_dir / LOCK_FILE):
+            yield
+
+    def _stat_key(self, path: Path):
+        try:
+            stat = path.stat()
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def _apply(documents: Dict[str, Dict[str, Any]], entry: Dict[str, Any]) -> Optional[Tuple[str, str, Any]]:
+        # Entries are idempotent, so replaying one twice after a compaction is harmless;
+        # returns the change actually made, if any
+        if entry.get("op") == ADDED:
+            doc = entry["doc"]
+            if documents.get(doc["id"]) != doc:
+                documents[doc["id"]] = doc
+                return ADDED, doc["id"], doc
+        elif entry.get("op") == DELETED:
+            if documents.pop(entry["id"], None) is not None:
+                return DELETED, entry["id"], None
+        return None
+
+    @staticmethod
+    def _diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str, Any]]:
+        events = [(DELETED, doc_id, None) for doc_id in old if doc_id not in new]
+        events.extend((ADDED, doc_id, doc) for doc_id, doc in new.items() if old.get(doc_id) != doc)
+        return events
+
+    def _refresh(self, events: Optional[List[Tuple[str, str, Any]]] = None) -> List[Tuple[str, str, Any]]:
+        # Reload the snapshot if it was replaced, then replay new journal lines;
+        # returns the changes seen, for the listeners
+        events = [] if events is None else events
+        snapshot_key = self._stat_key(self._snapshot_path)
+        if snapshot_key != self._snapshot_key:
+            documents = {}
+            try:
+                with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                    for doc in json.load(f):
+                        documents[doc["id"]] = doc
+            except (OSError, ValueError):
+                pass
+            # Diff against what we had, so a compaction only reports real changes
+            events.extend(self._diff(self._documents, documents))
+            self._documents = documents
+            self._snapshot_key = snapshot_key
+            self._journal_offset = 0
+            self._journal_entries = 0
+
+        try:
+            with open(self._journal_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self._journal_offset:
+                    # Journal was truncated by a compaction we have not seen the snapshot of yet
+                    self._snapshot_key = None
+                    return self._refresh(events)
+                f.seek(self._journal_offset)
+                data = f.read()
+        except OSError:
+            return events
+        if self._stat_key(self._snapshot_path) != snapshot_key:
+            # Compacted while we were reading; offsets no longer line up with the journal
+            self._snapshot_key = None
+            return self._refresh(events)
+
+        # Only complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    event = self._apply(self._documents, json.loads(line))
+                except ValueError:
+                    continue
+                if event is not None:
+                    events.append(event)
+                self._journal_entries += 1
+        self._journal_offset += end
+        return events
+
+    def subscribe(self, key: str, listener: Listener):
+        # Subscribing again under the same key replaces the listener, so callers that are
+        # created per session do not pile up duplicates
+        with self.lock:
+            self._listeners[key] = listener
+
+    def unsubscribe(self, key: str):
+        with self.lock:
+            self._listeners.pop(key, None)
+
+    def _notify(self, events: List[Tuple[str, str, Any]]):
+        # Called after the locks are released, so listeners may read the index again
+        if not events:
+            return
+        with self.lock:
+            listeners = list(self._listeners.values())
+        for event, doc_id, doc in events:
+            for listener in listeners:
+                try:
+                    listener(event, doc_id, doc)
+                except Exception:
+                    logger.exception("Document index listener failed on %s %s", event, doc_id)
+
+    def _append(self, entry: Dict[str, Any]):
+        os.makedirs(self.storage_dir, exist_ok=True)
+        with self._file_lock():
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            fd = os.open(self._journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            events = self._refresh()
+            if self._journal_entries >= self.compact_every:
+                self._compact_locked()
+        self._notify(events)
+
+    def add(self, doc: Dict[str, Any]):
+        self._append({"op": ADDED, "doc": doc})
+
+    def remove(self, doc_id: str):
+        self._append({"op": DELETED, "id": doc_id})
+
+    def documents(self) -> List[Dict[str, Any]]:
+        # Current view shared by every session; costs a stat() when nothing changed
+        with self.lock:
+            events = self._refresh()
+            documents = list(self._documents.values())
+        self._notify(events)
+        return documents
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        # Last view read; call documents() first for an up-to-date answer
+        with self.lock:
+            return self._documents.get(doc_id)
+
+    def compact(self):
+        with self._file_lock():
+            events = self._refresh()
+            self._compact_locked()
+        self._notify(events)
+
+    def _compact_locked(self):
+        # Write the full list as a new snapshot, then start an empty journal
+        tmp_path = self._snapshot_path.with_name(SNAPSHOT_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self._documents.values()), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        with open(self._journal_path, "wb"):
+            pass
+        self._snapshot_key = self._stat_key(self._snapshot_path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def start_watching(self, interval: float = 2.0):
+        # Poll for changes made by other processes, so listeners fire even when nobody reads
+        with self.lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(
+                target=self._watch, args=(interval,), name="document-index-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def _watch(self, interval: float):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.documents()
+            except Exception:
+                logger.exception("Document index watcher failed for %s", self.storage_dir)
+
+
+def load_documents(storage_dir: str) -> List[Dict[str, Any]]:
+    return get_document_index(storage_dir).documents()
+
+
+_indexes: Dict[str, DocumentIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_document_index(storage_dir: str) -> DocumentIndex:
+    # One reader per storage directory per process, shared by all sessions
+    with _indexes_lock:
+        if storage_dir not in _indexes:
+            _indexes[storage_dir] = DocumentIndex(storage_dir)
+        return _indexes[storage_dir]
@@ -2,23 +2,309 @@ import streamlit as st
 import pandas as pd
 import os
 import io
+import shutil
+import codecs
+import itertools
+import re
 import uuid
 import json
 import datetime
+import logging
+import numpy as np
+from functools import partial
 from pathlib import Path
 from typing import Optional, List, Dict, Any
+from utils.vector_index import VectorIndex, get_vector_index
+from utils.search_index import get_search_index
+from utils.response_cache import get_response_cache
+from utils.indexing_pipeline import IndexingPipeline, get_indexing_pipeline
+from utils.document_index import get_document_index, DELETED
+from utils.document_cache import get_document_cache
+from utils.columnar_store import scan_csv_dtypes, write_columns_from_csv, read_columns, read_schema, columns_size, delete_columns
+
+logger = logging.getLogger(__name__)
+
+CSV_ENCODINGS = ['utf-8', 'big5', 'gb18030']
+
+def sniff_encoding(file_bytes: bytes, prefix_size: int = 65536, final: Optional[bool] = None) -> Optional[str]:
+    # Decode only a prefix; an incremental decoder tolerates a character cut at the boundary.
+    # final says whether file_bytes is the whole file, when the caller only read a prefix
+    prefix = file_bytes[:prefix_size]
+    if final is None:
+        final = len(file_bytes) <= prefix_size
+    else:
+        final = final and len(file_bytes) <= prefix_size
+    for encoding in CSV_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=final)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+# Cells read_csv turns into NaN (its default na_values) or booleans, so never prints back as-is
+_NA_CELLS = frozenset([b'#N/A', b'#N/A N/A', b'#NA', b'-1.#IND', b'-1.#QNAN', b'-NaN', b'-nan',
+                       b'1.#IND', b'1.#QNAN', b'<NA>', b'N/A', b'NA', b'NULL', b'NaN', b'None',
+                       b'n/a', b'nan', b'null'])
+_BOOL_CELLS = frozenset([b'True', b'TRUE', b'true', b'False', b'FALSE', b'false'])
+
+# Searched in a column whose cells are each wrapped in newlines
+_LEADING_ZERO = re.compile(rb"\n-?0[0-9]")
+_NO_DOT = re.compile(rb"\n[^.\n]*\n")
+
+def _is_int_column(column: bytes, longest: int) -> bool:
+    # int64 cells as pandas prints them: digits after an optional minus, no leading zeros
+    # or "-0", at most 18 characters
+    return (longest <= 18 and not column.translate(None, b"0123456789-\n")
+            and b"\n\n" not in column and b"-\n" not in column and b"\n-0" not in column
+            and column.count(b"-") == column.count(b"\n-") and not _LEADING_ZERO.search(column))
+
+def _is_float_column(column: bytes, count: int, longest: int) -> bool:
+    # float64 cells whose shortest repr is the cell itself: one dot with digits on both sides,
+    # no leading zeros, no trailing zeros but "x.0", at least 1e-4 and at most 15 digits
+    # (any 15-digit decimal survives a round trip through a double)
+    return (longest <= 16 and not column.translate(None, b"0123456789.-\n")
+            and column.count(b".") == count and not _NO_DOT.search(column)
+            and b"\n." not in column and b"-." not in column and b".\n" not in column
+            and column.count(b"-") == column.count(b"\n-")
+            and column.count(b"\n0") == column.count(b"\n0.")
+            and column.count(b"\n-0") == column.count(b"\n-0.")
+            and column.count(b"0\n") == column.count(b".0\n")
+            and b"\n0.0000" not in column and b"\n-0.0000" not in column)
+
+def _column_kind(cells: List[bytes]) -> Optional[str]:
+    # The dtype read_csv would give these cells, if astype(str) gives every cell back unchanged
+    column = b'\n' + b'\n'.join(cells) + b'\n'
+    if not column.translate(None, b"0123456789.-\n"):
+        longest = max(map(len, cells))
+        if _is_int_column(column, longest):
+            return "int"
+        if _is_float_column(column, len(cells), longest):
+            return "float"
+    distinct = set(cells)
+    if distinct & _NA_CELLS or distinct & _BOOL_CELLS:
+        return None
+    for cell in distinct:
+        if not cell.strip():
+            return None
+        try:
+            float(cell)
+        except ValueError:
+            continue
+        # A number pandas would reformat ("007", "1.50", " 1", "1e5"), or one that would mix
+        # this text column with numbers
+        return None
+    return "text"
+
+class _CleanColumns:
+    # Kind of every column over the rows checked so far; rows are clean while each column
+    # keeps one kind, so the pandas path would store exactly the same text
+    def __init__(self, header: bytes):
+        names = header.split(b',')
+        self.width = len(names)
+        # Empty or repeated names are renamed by pandas
+        self.kinds = [None] * len(names) if b'' not in names and len(set(names)) == len(names) else None
+
+    def accept(self, body: bytes) -> bool:
+        # body: data rows joined by newlines, without the header
+        if self.kinds is None:
+            return False
+        if not body:
+            return True
+        lines = body.split(b'\n')
+        if set(map(bytes.count, lines, itertools.repeat(b',', len(lines)))) != {self.width - 1}:
+            return False
+        cells = body.replace(b'\n', b',').split(b',')
+        for i in range(self.width):
+            kind = _column_kind(cells[i::self.width])
+            if kind is None or self.kinds[i] not in (None, kind):
+                return False
+            self.kinds[i] = kind
+        return True
+
+def _clean_utf8_text(file_bytes: bytes) -> Optional[bytes]:
+    # The CSV with normalized line ends if the pandas path would store exactly that text, or None
+    if b'"' in file_bytes or b',,' in file_bytes:
+        return None
+    text = file_bytes.replace(b'\r\n', b'\n').rstrip(b'\n')
+    if b'\r' in text:
+        return None
+    header, _, body = text.partition(b'\n')
+    return text if _CleanColumns(header).accept(body) else None
+
+def csv_bytes_to_text(file_bytes: bytes) -> str:
+    # Convert uploaded CSV bytes to the stored comma-joined text in a single pass
+    if file_bytes.startswith(codecs.BOM_UTF8):
+        file_bytes = file_bytes[len(codecs.BOM_UTF8):]
+    
+    encoding = sniff_encoding(file_bytes)
+    if encoding is None:
+        raise ValueError("Cannot identify CSV encoding")
+    
+    # Clean UTF-8 input is already in the stored format, so copy it through
+    if encoding == 'utf-8':
+        text = _clean_utf8_text(file_bytes)
+        if text is not None:
+            try:
+                return text.decode('utf-8')
+            except UnicodeDecodeError:
+                encoding = None
+    
+    # Otherwise parse once; later encodings are only tried if the sniffed one fails past the prefix
+    candidates = CSV_ENCODINGS[CSV_ENCODINGS.index(encoding):] if encoding else CSV_ENCODINGS[1:]
+    df = None
+    for candidate in candidates:
+        try:
+            df = pd.read_csv(io.BytesIO(file_bytes), encoding=candidate)
+            break
+        except UnicodeDecodeError:
+            continue
+    if df is None:
+        raise ValueError("Cannot identify CSV encoding")
+    
+    # Join columns with vectorized string concatenation instead of a per-row loop
+    text_df = df.astype(str)
+    rows = text_df.iloc[:, 0]
+    for i in range(1, text_df.shape[1]):
+        rows = rows + ',' + text_df.iloc[:, i]
+    
+    return '\n'.join([",".join(df.columns.astype(str))] + rows.tolist())
+
+def _copy_clean_utf8(src, dst, batch_size: int = 50000) -> bool:
+    # Streaming version of _clean_utf8_text: copy batches of lines while the file stays clean
+    columns = None
+    blank = False
+    while True:
+        lines = list(itertools.islice(src, batch_size))
+        if not lines:
+            break
+        lines = [line[:-1] if line.endswith(b'\n') else line for line in lines]
+        lines = [line[:-1] if line.endswith(b'\r') else line for line in lines]
+        # Blank lines are only allowed at the end of the file
+        if blank and any(lines):
+            return False
+        while lines and not lines[-1]:
+            lines.pop()
+            blank = True
+        if not lines:
+            continue
+        joined = b'\n'.join(lines)
+        if b'"' in joined or b'\r' in joined:
+            return False
+        try:
+            joined.decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+        if columns is None:
+            header, _, body = joined.partition(b'\n')
+            columns = _CleanColumns(header)
+            clean = columns.accept(body)
+        else:
+            clean = columns.accept(joined)
+            joined = b'\n' + joined
+        if not clean:
+            return False
+        dst.write(joined)
+    return columns is not None
+
+def _copy_with_pandas(src_path: str, dst, encoding: str, chunksize: int):
+    # Settle the dtypes over the whole file first, so every chunk formats its cells the way
+    # a single read_csv of the whole file would
+    names, kinds, _ = scan_csv_dtypes(src_path, chunksize, encoding=encoding)
+    dtypes = {name: str if kind == "category" else dtype for name, (kind, dtype) in kinds.items()}
+    reader = pd.read_csv(src_path, encoding=encoding, dtype=dtypes, chunksize=chunksize)
+    for i, chunk in enumerate(reader):
+        if i == 0:
+            dst.write(",".join(chunk.columns.astype(str)).encode('utf-8'))
+        if len(chunk) == 0:
+            continue
+        text_df = chunk.astype(str)
+        rows = text_df.iloc[:, 0]
+        for j in range(1, text_df.shape[1]):
+            rows = rows + ',' + text_df.iloc[:, j]
+        dst.write(('\n' + '\n'.join(rows.tolist())).encode('utf-8'))
+
+def csv_file_to_text_file(src_path: str, dst_path: str, chunksize: int = 50000):
+    # Same conversion as csv_bytes_to_text, from file to file with memory bounded by chunksize
+    with open(src_path, 'rb') as f:
+        prefix = f.read(65536 + len(codecs.BOM_UTF8))
+        final = f.read(1) == b''
+    bom = len(codecs.BOM_UTF8) if prefix.startswith(codecs.BOM_UTF8) else 0
+    prefix = prefix[bom:]
+    
+    encoding = sniff_encoding(prefix, final=final)
+    if encoding is None:
+        raise ValueError("Cannot identify CSV encoding")
+    
+    if encoding == 'utf-8':
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            src.seek(bom)
+            if _copy_clean_utf8(src, dst, chunksize):
+                return
+    
+    candidates = CSV_ENCODINGS[CSV_ENCODINGS.index(encoding):]
+    for candidate in candidates:
+        try:
+            with open(dst_path, 'wb') as dst:
+                _copy_with_pandas(src_path, dst, candidate, chunksize)
+            return
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Cannot identify CSV encoding")
+
+def _sync_retrieval(search_index, vector_index, indexing_pipeline,
+                    event: str, doc_id: str, doc: Optional[Dict[str, Any]]):
+    # DocumentIndex listener, run in every process for changes made by any of them. The
+    # process that made the change has already written the shared indexes on disk; the
+    # others only reload them here
+    if event == DELETED or not search_index.has_document(doc_id):
+        search_index.reload_document(doc_id)
+    if vector_index is None:
+        return
+    if event == DELETED:
+        if indexing_pipeline is not None:
+            indexing_pipeline.cancel(doc_id)
+        # Only writes when this process's pipeline added it after the deleting process ran
+        vector_index.remove_document(doc_id)
+    else:
+        # Embedded in the background by the uploading process; searches refresh again later
+        vector_index.refresh()
+    # Cached chat answers built from this document are no longer valid
+    get_response_cache().invalidate_document(doc_id)
 
 class DocumentStore:
-    def __init__(self, storage_dir: str = "QA_files"):
-        # Initialize document store with unique session state key based on storage directory
+    def __init__(self, storage_dir: str = "QA_files", vector_index: Optional[VectorIndex] = None,
+                 columnar: Optional[bool] = None, indexing_pipeline: Optional[IndexingPipeline] = None):
+        # The document list and file cache are shared by every session using storage_dir;
+        # a session only holds references to them
         self.storage_dir = storage_dir
         self._create_storage_dir()
+        self.document_index = get_document_index(storage_dir)
+        self.document_cache = get_document_cache(storage_dir)
         
-        # Use storage_dir as part of the session state key to avoid conflicts
-        self.session_key = f"doc_index_{storage_dir}"
+        # QA documents feed the chat retrieval index
+        if vector_index is None and storage_dir == "QA_files":
+            vector_index = get_vector_index(storage_dir)
+        self.vector_index = vector_index
         
-        if self.session_key not in st.session_state:
-            st.session_state[self.session_key] = self._load_document_index()
+        # New documents are embedded in the background so uploads return right away
+        if indexing_pipeline is None and vector_index is not None:
+            indexing_pipeline = get_indexing_pipeline(vector_index)
+        self.indexing_pipeline = indexing_pipeline
+        
+        # Model data is also kept column by column for partial, memory-mapped loads
+        self.columnar = storage_dir == "Data_files" if columnar is None else columnar
+        
+        # Row-level keyword search over every stored document; model data is searched by
+        # its words only, since indexing every distinct number dwarfs the file itself
+        self.search_index = get_search_index(storage_dir, numbers=not self.columnar)
+        
+        # Reload changes from any session or process as they appear in the document list;
+        # re-subscribing replaces the previous session's listener with an identical one
+        self.document_index.subscribe("retrieval", partial(
+            _sync_retrieval, self.search_index, self.vector_index, self.indexing_pipeline
+        ))
+        self.document_index.start_watching()
     
     def _create_storage_dir(self):
         # Create storage directory if needed
@@ -28,53 +314,12 @@ class DocumentStore:
             with open(index_file, 'w', encoding='utf-8') as f:
                 json.dump([], f)
     
-    def _load_document_index(self) -> List[Dict[str, Any]]:
-        # Load document index
-        index_file = Path(self.storage_dir) / "document_index.json"
-        try:
-            with open(index_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return []
-    
-    def _save_document_index(self):
-        # Save document index
-        index_file = Path(self.storage_dir) / "document_index.json"
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(st.session_state[self.session_key], f, ensure_ascii=False)
-    
     def read_csv(self, file_bytes) -> Optional[str]:
         try:
-            csv_file = io.BytesIO(file_bytes)
-            
-            # Try different encodings
-            encodings = ['utf-8', 'big5', 'gb18030']
-            df = None
-            
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(csv_file, encoding=encoding)
-                    csv_file.seek(0)
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    st.error(f"CSV read error: {str(e)}")
-                    return None
-            
-            if df is None:
-                st.error("Cannot identify CSV encoding")
-                return None
-                
-            # Convert to text format
-            text_content = []
-            text_content.append(",".join(df.columns.astype(str)))
-            
-            for _, row in df.iterrows():
-                text_content.append(",".join(row.astype(str)))
-            
-            return '\n'.join(text_content)
-            
+            return csv_bytes_to_text(file_bytes)
+        except ValueError as e:
+            st.error(str(e))
+            return None
         except Exception as e:
             st.error(f"CSV processing error: {str(e)}")
             return None
@@ -90,44 +335,242 @@ class DocumentStore:
         with open(content_path, 'w', encoding='utf-8') as f:
             f.write(file_content)
         
-        # Add to index
+        self._register_document(doc_id, file_name, round(len(file_content) / 1024, 2))
+        return doc_id
+    
+    def add_document_file(self, file_name: str, upload, chunksize: int = 50000) -> Optional[str]:
+        # Streaming ingest: the upload is spooled to a temp file and converted chunksize rows
+        # at a time, so memory does not grow with the file size
+        doc_id = str(uuid.uuid4())
+        content_path = Path(self.storage_dir) / f"{doc_id}.txt"
+        upload_path = Path(self.storage_dir) / f"{doc_id}.upload.tmp"
+        text_path = Path(self.storage_dir) / f"{doc_id}.txt.tmp"
+        try:
+            if hasattr(upload, 'seek'):
+                upload.seek(0)
+            with open(upload_path, 'wb') as f:
+                shutil.copyfileobj(upload, f, 1 << 20)
+            csv_file_to_text_file(upload_path, text_path, chunksize)
+            os.replace(text_path, content_path)
+        except ValueError as e:
+            st.error(str(e))
+            return None
+        except Exception as e:
+            st.error(f"CSV processing error: {str(e)}")
+            return None
+        finally:
+            for path in (upload_path, text_path):
+                if path.exists():
+                    os.remove(path)
+        
+        self._register_document(doc_id, file_name, round(content_path.stat().st_size / 1024, 2))
+        return doc_id
+    
+    def _register_document(self, doc_id: str, file_name: str, size_kb: float):
+        # Index a stored <doc_id>.txt and add it to the document list
         doc_info = {
             "id": doc_id,
             "name": file_name,
             "type": "csv",
             "added_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "size_kb": round(len(file_content) / 1024, 2)
+            "size_kb": size_kb
         }
         
-        st.session_state[self.session_key].append(doc_info)
-        self._save_document_index()
+        self._build_line_offsets(doc_id)
         
-        return doc_id
+        # This process writes the shared indexes before listing the document; listing it
+        # tells the other processes to reload them
+        self._index_document(doc_id, file_name)
+        self.document_index.add(doc_info)
+        
+        if self.columnar:
+            try:
+                self._write_columns(doc_id)
+            except Exception as e:
+                st.warning(f"Columnar storage failed: {str(e)}")
+    
+    def _index_document(self, doc_id: str, file_name: str):
+        try:
+            # Streamed from disk, so large model data is never read whole
+            self.search_index.add_document_file(doc_id, Path(self.storage_dir) / f"{doc_id}.txt")
+        except Exception:
+            logger.exception("Search index update failed for %s", doc_id)
+        if self.vector_index is None:
+            return
+        
+        # Embed only the new document, in the background; existing vectors are kept
+        content = self.document_cache.get_content(doc_id)
+        if self.indexing_pipeline is not None:
+            self.indexing_pipeline.submit(doc_id, content, file_name)
+        else:
+            try:
+                self.vector_index.add_document(doc_id, content, file_name)
+            except Exception:
+                logger.exception("Vector index update failed for %s", doc_id)
+    
+    def _offsets_path(self, doc_id: str) -> Path:
+        return Path(self.storage_dir) / f"{doc_id}.offsets.npy"
+    
+    def _build_line_offsets(self, doc_id: str):
+        # Byte offset of every line start, with the file size appended as the end of the last line
+        content_path = Path(self.storage_dir) / f"{doc_id}.txt"
+        starts = [np.zeros(1, dtype=np.int64)]
+        position = 0
+        with open(content_path, 'rb') as f:
+            while True:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+                starts.append(newlines.astype(np.int64) + position + 1)
+                position += len(block)
+        offsets = np.concatenate(starts)
+        if offsets[-1] != position:
+            offsets = np.append(offsets, position)
+        
+        offsets_path = self._offsets_path(doc_id)
+        tmp_path = offsets_path.with_name(offsets_path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, offsets)
+        os.replace(tmp_path, offsets_path)
+    
+    def _line_offsets(self, doc_id: str) -> Optional[np.ndarray]:
+        try:
+            return self.document_cache.get_offsets(doc_id, self._build_line_offsets)
+        except Exception as e:
+            st.error(f"File read error: {str(e)}")
+            return None
+    
+    def get_row_count(self, doc_id: str) -> int:
+        # Number of lines after the header
+        offsets = self._line_offsets(doc_id)
+        return max(len(offsets) - 2, 0) if offsets is not None else 0
+    
+    def get_document_page(self, doc_id: str, page: int, page_size: int = 50) -> Optional[Dict[str, Any]]:
+        # Read only the header and the lines of one page, seeking by byte offset
+        offsets = self._line_offsets(doc_id)
+        if offsets is None or len(offsets) < 2:
+            return None
+        
+        line_count = len(offsets) - 1
+        first = min(1 + page * page_size, line_count)
+        last = min(first + page_size, line_count)
+        content_path = Path(self.storage_dir) / f"{doc_id}.txt"
+        with open(content_path, 'rb') as f:
+            header = f.read(int(offsets[1] - offsets[0])).decode('utf-8').rstrip('\r\n')
+            f.seek(int(offsets[first]))
+            data = f.read(int(offsets[last] - offsets[first])).decode('utf-8')
+        
+        return {
+            "header": header,
+            "lines": [line.rstrip('\r') for line in data.split('\n')[:last - first]],
+            "page": page,
+            "total_rows": line_count - 1,
+            "total_pages": max((line_count - 2) // page_size + 1, 1)
+        }
+    
+    def get_lines(self, doc_id: str, rows: List[int]) -> List[str]:
+        # Read individual rows (0 = first line after the header) by byte offset
+        offsets = self._line_offsets(doc_id)
+        if offsets is None:
+            return []
+        lines = []
+        content_path = Path(self.storage_dir) / f"{doc_id}.txt"
+        with open(content_path, 'rb') as f:
+            for row in rows:
+                if row + 2 >= len(offsets):
+                    lines.append("")
+                    continue
+                f.seek(int(offsets[row + 1]))
+                lines.append(f.read(int(offsets[row + 2] - offsets[row + 1])).decode('utf-8').rstrip('\r\n'))
+        return lines
+    
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        # Ranked matching rows from the inverted index, without scanning the files
+        names = {doc["id"]: doc["name"] for doc in self.get_all_documents()}
+        hits = [hit for hit in self.search_index.search(query, limit=limit) if hit[0] in names]
+        
+        by_doc = {}
+        for doc_id, row, score in hits:
+            by_doc.setdefault(doc_id, []).append(row)
+        lines = {doc_id: dict(zip(rows, self.get_lines(doc_id, rows))) for doc_id, rows in by_doc.items()}
+        
+        return [
+            {"id": doc_id, "name": names[doc_id], "row": row, "score": score, "line": lines[doc_id][row]}
+            for doc_id, row, score in hits
+        ]
+    
+    def _column_dir(self, doc_id: str) -> Path:
+        return Path(self.storage_dir) / f"{doc_id}_columns"
+    
+    def _write_columns(self, doc_id: str):
+        # Parsed from the stored text in chunks rather than as one frame
+        write_columns_from_csv(Path(self.storage_dir) / f"{doc_id}.txt", self._column_dir(doc_id))
+    
+    def ensure_columns(self, doc_id: str) -> bool:
+        # Build the columnar copy of documents stored before it existed
+        if read_schema(self._column_dir(doc_id)) is not None:
+            return True
+        if not (Path(self.storage_dir) / f"{doc_id}.txt").exists():
+            return False
+        try:
+            self._write_columns(doc_id)
+            return True
+        except Exception as e:
+            st.warning(f"Columnar storage failed: {str(e)}")
+            return False
+    
+    def get_columns(self, doc_id: str) -> List[str]:
+        if not self.ensure_columns(doc_id):
+            return []
+        return [column["name"] for column in read_schema(self._column_dir(doc_id))["columns"]]
+    
+    def load_columns(self, doc_id: str, columns: Optional[List[str]] = None,
+                     start: int = 0, stop: Optional[int] = None) -> Optional[pd.DataFrame]:
+        # Load only the requested columns and rows from the columnar copy
+        if not self.ensure_columns(doc_id):
+            return None
+        return read_columns(self._column_dir(doc_id), columns=columns, start=start, stop=stop)
+    
+    def get_storage_size_kb(self, doc_id: str) -> float:
+        return round(columns_size(self._column_dir(doc_id)) / 1024, 2)
+    
+    def get_index_status(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        # Embedding progress of a document, or None when this store has no vector index
+        if self.indexing_pipeline is None:
+            return None
+        return self.indexing_pipeline.get_status(doc_id)
     
     def get_all_documents(self) -> List[Dict[str, Any]]:
-        return st.session_state[self.session_key]
+        return self.document_index.documents()
     
     def get_document_content(self, doc_id: str) -> Optional[str]:
-        content_path = Path(self.storage_dir) / f"{doc_id}.txt"
         try:
-            with open(content_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return self.document_cache.get_content(doc_id)
         except Exception as e:
             st.error(f"File read error: {str(e)}")
             return None
     
     def delete_document(self, doc_id: str) -> bool:
         try:
+            # Drop it from the shared indexes; other processes reload them once it is unlisted
+            self.search_index.remove_document(doc_id)
+            if self.indexing_pipeline is not None:
+                self.indexing_pipeline.cancel(doc_id)
+            if self.vector_index is not None:
+                self.vector_index.remove_document(doc_id)
+            
             # Delete file content
             content_path = Path(self.storage_dir) / f"{doc_id}.txt"
             if content_path.exists():
                 os.remove(content_path)
+            delete_columns(self._column_dir(doc_id))
+            offsets_path = self._offsets_path(doc_id)
+            if offsets_path.exists():
+                os.remove(offsets_path)
             
-            # Remove from index
-            st.session_state[self.session_key] = [
-                doc for doc in st.session_state[self.session_key] if doc["id"] != doc_id
-            ]
-            self._save_document_index()
+            # Remove from index; the listeners drop it from memory and caches
+            self.document_index.remove(doc_id)
             
             return True
         except Exception as e:
@@ -137,7 +580,7 @@ class DocumentStore:
     def get_all_document_contents(self) -> str:
         all_contents = []
         
-        for doc in st.session_state[self.session_key]:
+        for doc in self.get_all_documents():
             content = self.get_document_content(doc["id"])
             if content:
                 all_contents.append(f"--- File: {doc['name']} ---\n{content}")
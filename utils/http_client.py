@@ -0,0 +1,70 @@
+import threading
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HttpClient:
+    """Shared requests session with per-host keep-alive connection pools.
+
+    Reusing connections avoids a new TCP and TLS handshake to the IAM and watsonx hosts on
+    every call. Failed connects are retried with exponential backoff for every method, since
+    nothing reached the server. Read timeouts and 429/5xx responses are only retried for GET:
+    POST callers (token refresh, scoring, generation) apply their own retry policy.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20,
+                 max_retries: int = 3, backoff_factor: float = 0.5,
+                 timeout: Union[float, Tuple[float, float]] = (5, 60)):
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        # pool_connections is the number of hosts kept, pool_maxsize the connections per host
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    # Process-wide client shared by TokenManager, Agent and LoanPredictor
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def configure_http_client(**options) -> HttpClient:
+    # Replace the shared client, e.g. to change pool size, timeouts or retry policy
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HttpClient(**options)
+        return _client
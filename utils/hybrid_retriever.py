@@ -0,0 +1,120 @@
+import re
+import threading
+import weakref
+from typing import Optional, List, Dict, Any, Tuple
+
+from utils.document_index import ADDED
+from utils.search_index import SearchIndex, tokenize
+from utils.vector_index import VectorIndex
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _chunk_key(chunk: Dict[str, Any]) -> Tuple[str, int]:
+    return chunk["doc_id"], chunk["metadata"].get("start", 0)
+
+
+class ChunkSearchIndex:
+    """BM25 over the chunks of a ``VectorIndex``, one ``SearchIndex`` document per indexed document.
+
+    It subscribes to the vector index, so adding or removing a document only tokenizes or drops
+    that document's chunks.
+    """
+
+    def __init__(self, vector_index: VectorIndex):
+        self.index = SearchIndex(None)
+        self.chunks: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+        # Subscribe and read the current documents under the index lock, so no change is missed
+        with vector_index.lock:
+            vector_index.subscribe("chunk_search", self.on_change)
+            for doc_id, (start, end) in vector_index.documents.items():
+                self.on_change(ADDED, doc_id, vector_index.chunks[start:end])
+
+    def on_change(self, event: str, doc_id: str, chunks: Optional[List[Dict[str, Any]]]):
+        # Postings and chunks change together, so search never maps a row to another version
+        with self.lock:
+            if event == ADDED:
+                self.index.add_document(doc_id, [chunk["text"] for chunk in chunks])
+                self.chunks[doc_id] = chunks
+            else:
+                self.index.remove_document(doc_id)
+                self.chunks.pop(doc_id, None)
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, Dict[str, Any]]]:
+        with self.lock:
+            return [(score, self.chunks[doc_id][row]) for doc_id, row, score in self.index.search(query, limit)]
+
+
+_chunk_indexes: "weakref.WeakKeyDictionary[VectorIndex, ChunkSearchIndex]" = weakref.WeakKeyDictionary()
+_chunk_indexes_lock = threading.Lock()
+
+
+def get_chunk_search_index(vector_index: VectorIndex) -> ChunkSearchIndex:
+    # One per vector index, shared by every session's retriever
+    with _chunk_indexes_lock:
+        if vector_index not in _chunk_indexes:
+            _chunk_indexes[vector_index] = ChunkSearchIndex(vector_index)
+        return _chunk_indexes[vector_index]
+
+
+class HybridRetriever:
+    """Combines BM25 over the indexed chunks with dense similarity from a ``VectorIndex``.
+
+    Both rankings are merged with weighted reciprocal-rank fusion, then reranked by how many
+    of the query's numbers and terms appear verbatim in each chunk, so questions about exact
+    amounts or product names are not lost to the embedder.
+    """
+
+    def __init__(self, vector_index: VectorIndex, candidates: int = 20, rrf_k: int = 60,
+                 dense_weight: float = 1.0, lexical_weight: float = 1.0, rerank_weight: float = 0.5):
+        self.vector_index = vector_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.dense_weight = dense_weight
+        self.lexical_weight = lexical_weight
+        self.rerank_weight = rerank_weight
+        self.lexical = get_chunk_search_index(vector_index)
+
+    def dense_search(self, query: str, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        return self.vector_index.search(query, top_k=top_k)
+
+    def lexical_search(self, query: str, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        return self.lexical.search(query, top_k)
+
+    def _rerank_score(self, query_terms: set, query_numbers: set, text: str) -> float:
+        # Fraction of the query's terms (and numbers, when it has any) found in the chunk
+        text_terms = set(tokenize(text))
+        term_overlap = len(query_terms & text_terms) / len(query_terms) if query_terms else 0.0
+        if not query_numbers:
+            return term_overlap
+        number_overlap = len(query_numbers & set(_NUMBER_PATTERN.findall(text))) / len(query_numbers)
+        return (term_overlap + number_overlap) / 2
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[float, Dict[str, Any]]]:
+        if not query.strip():
+            return []
+
+        fused: Dict[Tuple[str, int], float] = {}
+        chunks: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for weight, results in (
+            (self.dense_weight, self.dense_search(query, self.candidates)),
+            (self.lexical_weight, self.lexical_search(query, self.candidates)),
+        ):
+            for rank, (_, chunk) in enumerate(results):
+                key = _chunk_key(chunk)
+                chunks[key] = chunk
+                fused[key] = fused.get(key, 0.0) + weight / (self.rrf_k + rank + 1)
+        if not fused:
+            return []
+
+        best = max(fused.values())
+        query_terms = set(tokenize(query))
+        query_numbers = set(_NUMBER_PATTERN.findall(query))
+        scored = [
+            (score / best + self.rerank_weight * self._rerank_score(query_terms, query_numbers, chunks[key]["text"]),
+             chunks[key])
+            for key, score in fused.items()
+        ]
+        scored.sort(key=lambda item: -item[0])
+        return scored[:top_k]
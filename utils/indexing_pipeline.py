@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from utils.vector_index import VectorIndex
+
+QUEUED = "queued"
+INDEXING = "indexing"
+READY = "ready"
+FAILED = "failed"
+
+
+def _embed_batch(embedder, texts: List[str]) -> np.ndarray:
+    # Runs in a worker process; the embedder is pickled along with the batch
+    return embedder.embed(texts).astype(np.float32)
+
+
+class IndexingPipeline:
+    """Embeds uploaded documents in the background and adds them to a ``VectorIndex``.
+
+    Documents are chunked in a coordinator thread, their chunks embedded in batches of
+    ``batch_size`` across a process pool of ``max_workers``, and the document becomes
+    searchable in one step once every batch is done. Small documents skip the process pool.
+    """
+
+    def __init__(self, vector_index: VectorIndex, max_workers: Optional[int] = None,
+                 batch_size: int = 256):
+        self.vector_index = vector_index
+        self.max_workers = max_workers or max(os.cpu_count() or 1, 1)
+        self.batch_size = batch_size
+
+        self.lock = threading.Lock()
+        # doc_id -> {"state", "done", "total", "error", "started_at", "finished_at"}
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self.cancelled = set()
+
+        # One coordinator keeps index writes in upload order; embedding fans out to processes
+        self._coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexing")
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _get_processes(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            # spawn avoids forking a process that is running Streamlit's threads
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    def _update(self, doc_id: str, **fields):
+        with self.lock:
+            self.status.setdefault(doc_id, {}).update(fields)
+
+    def submit(self, doc_id: str, text: str, name: Optional[str] = None) -> Future:
+        with self.lock:
+            self.cancelled.discard(doc_id)
+            self.status[doc_id] = {"state": QUEUED, "done": 0, "total": 0, "error": None,
+                                   "started_at": None, "finished_at": None}
+        return self._coordinator.submit(self._index, doc_id, text, name)
+
+    def cancel(self, doc_id: str):
+        # A document deleted while queued or indexing is never left in the index;
+        # finished documents are removed by the caller
+        with self.lock:
+            status = self.status.pop(doc_id, None)
+            if status is not None and status["state"] in (QUEUED, INDEXING):
+                self.cancelled.add(doc_id)
+
+    def _take_cancelled(self, doc_id: str) -> bool:
+        with self.lock:
+            if doc_id not in self.cancelled:
+                return False
+            self.cancelled.discard(doc_id)
+            return True
+
+    def _index(self, doc_id: str, text: str, name: Optional[str]) -> int:
+        if self._take_cancelled(doc_id):
+            return 0
+        try:
+            chunks = self.vector_index.chunker(text)
+            self._update(doc_id, state=INDEXING, total=len(chunks), started_at=time.time())
+
+            texts = [chunk["text"] for chunk in chunks]
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            embedder = self.vector_index.embedder
+            if len(batches) <= 1:
+                vectors = [_embed_batch(embedder, batch) for batch in batches]
+            else:
+                futures = [self._get_processes().submit(_embed_batch, embedder, batch) for batch in batches]
+                vectors = []
+                for future in futures:
+                    vectors.append(future.result())
+                    self._update(doc_id, done=min(len(vectors) * self.batch_size, len(chunks)))
+            vectors = np.concatenate(vectors) if vectors else np.zeros((0, embedder.dim), dtype=np.float32)
+
+            if self._take_cancelled(doc_id):
+                return 0
+            self.vector_index.add_embedded(doc_id, chunks, vectors, name)
+            with self.lock:
+                cancelled = doc_id in self.cancelled
+                self.cancelled.discard(doc_id)
+                if not cancelled:
+                    self.status.setdefault(doc_id, {}).update(state=READY, done=len(chunks),
+                                                              finished_at=time.time())
+            if cancelled:
+                # Deleted during the add, possibly after the caller's own removal ran
+                self.vector_index.remove_document(doc_id)
+                return 0
+            return len(chunks)
+        except Exception as e:
+            if not self._take_cancelled(doc_id):
+                self._update(doc_id, state=FAILED, error=str(e), finished_at=time.time())
+            raise
+
+    def has_document(self, doc_id: str) -> bool:
+        # Submitted to this pipeline, or indexed before it started
+        with self.lock:
+            if doc_id in self.status:
+                return True
+        return self.vector_index.has_document(doc_id)
+
+    def get_status(self, doc_id: str) -> Dict[str, Any]:
+        with self.lock:
+            status = self.status.get(doc_id)
+            if status is not None:
+                return dict(status)
+        # Documents indexed before this process started
+        if self.vector_index.has_document(doc_id):
+            return {"state": READY, "done": None, "total": None, "error": None}
+        return {"state": QUEUED, "done": 0, "total": 0, "error": None}
+
+    def wait(self, timeout: Optional[float] = None):
+        # Block until everything submitted so far is indexed
+        self._coordinator.submit(lambda: None).result(timeout=timeout)
+
+    def shutdown(self):
+        self._coordinator.shutdown(wait=True)
+        if self._processes is not None:
+            self._processes.shutdown()
+
+
+_pipelines: Dict[int, IndexingPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_indexing_pipeline(vector_index: VectorIndex, **options) -> IndexingPipeline:
+    # One pipeline per vector index per process
+    with _pipelines_lock:
+        pipeline = _pipelines.get(id(vector_index))
+        if pipeline is None or pipeline.vector_index is not vector_index:
+            pipeline = IndexingPipeline(vector_index, **options)
+            _pipelines[id(vector_index)] = pipeline
+        return pipeline
@@ -1,12 +1,183 @@
 import pandas as pd
-import requests
 import streamlit as st
 import os
-from typing import List, Dict, Any
+import json
+import time
+import asyncio
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from dotenv import load_dotenv
+from utils.prediction_cache import PredictionCache
+from utils.http_client import HttpClient, get_http_client
+from utils.async_client import get_async_client, submit_async
+from utils.surrogate_model import SurrogateModel, get_surrogate_model, DEFAULT_MODEL_PATH
+from utils.reload_cache import load_if_changed
+
+# Optional faster JSON encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+REQUIRED_FIELDS = [
+    "Gender", "Age", "Income (USD)", "Income Stability", 
+    "Profession", "Type of Employment", "Location", 
+    "Loan Amount Request (USD)", "Current Loan Expenses (USD)", 
+    "Expense Type 1", "Expense Type 2", "Dependents", 
+    "Credit Score", "No. of Defaults", "Has Active Credit Card", 
+    "Property ID", "Property Age", "Property Type", 
+    "Property Location", "Co-Applicant", "Property Price"
+]
+
+# remote: watsonx deployment only; local: surrogate model only;
+# local_first: surrogate model right away, then confirmed by the deployment
+PREDICTION_MODES = ("remote", "local", "local_first")
+
+DEFAULT_SCHEMA_PATH = "models/feature_schema.json"
+
+# Row identifiers: passed to the deployment but never range- or category-checked
+IDENTIFIER_FIELDS = ["Property ID"]
+
+def dumps_payload(payload: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+def build_values(df: pd.DataFrame) -> List[List[Any]]:
+    # Reindex once to the API fields; missing columns and NaN cells become None
+    frame = df.reindex(columns=REQUIRED_FIELDS).astype(object)
+    return frame.where(frame.notna(), None).to_numpy().tolist()
+
+class FeatureSchema:
+    """Expected type, range and categories of every API field, compiled from training data.
+
+    ``validate`` coerces and checks a whole DataFrame with column-wise operations. Rows
+    whose numbers do not parse, are not finite or are fractional where the training data was
+    whole are rejected. Numbers outside the training range widened by ``range_margin`` of its
+    span and categories the training data did not contain are only warned about, since one
+    training file does not cover everything the deployment accepts. Categories are matched
+    ignoring case and surrounding spaces and rewritten to the training spelling. Missing
+    cells and columns pass through as before (the deployment receives them as None), and
+    identifier fields are not checked.
+    """
+    
+    def __init__(self, fields: List[Dict[str, Any]], sources: Optional[List[str]] = None):
+        self.fields = fields
+        # Ids of the stored documents the schema was compiled from
+        self.sources = sources or []
+        # Precompiled normalized spelling -> training spelling, per categorical field
+        self._lookups = {
+            field["name"]: {value.strip().casefold(): value for value in field["vocabulary"]}
+            for field in fields if field["kind"] == "category"
+        }
+    
+    @classmethod
+    def compile(cls, df: pd.DataFrame, fields: List[str] = REQUIRED_FIELDS, range_margin: float = 0.5,
+                sources: Optional[List[str]] = None) -> "FeatureSchema":
+        compiled = []
+        for name in fields:
+            if name not in df.columns or name in IDENTIFIER_FIELDS:
+                continue
+            series = df[name]
+            field = {"name": name}
+            values = pd.to_numeric(series, errors="coerce")
+            if series.notna().any() and values.notna().sum() == series.notna().sum():
+                low, high = float(values.min()), float(values.max())
+                margin = (high - low) * range_margin
+                field.update({
+                    "kind": "numeric",
+                    "integer": bool((values.dropna() % 1 == 0).all()),
+                    # Never let the margin admit negative values the training data did not have
+                    "min": max(low - margin, 0.0) if low >= 0 else low - margin,
+                    "max": high + margin,
+                })
+            else:
+                vocabulary = series.dropna().astype(str).str.strip().unique().tolist()
+                field.update({"kind": "category", "vocabulary": sorted(vocabulary)})
+            compiled.append(field)
+        return cls(compiled, sources)
+    
+    def validate(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray, pd.DataFrame]:
+        # Returns the coerced frame, a per-row valid mask and one issue row per problem found;
+        # only "error" issues clear the valid mask, "warning" rows are still scored
+        clean_df = df.copy()
+        valid = np.ones(len(df), dtype=bool)
+        issues = []
+        
+        def report(mask: np.ndarray, raw: pd.Series, name: str, reason: str, level: str = "error"):
+            positions = np.flatnonzero(mask)
+            if len(positions):
+                if level == "error":
+                    valid[positions] = False
+                issues.append(pd.DataFrame({
+                    "row": df.index[positions], "column": name,
+                    "value": raw.iloc[positions].to_numpy(), "level": level, "reason": reason,
+                }))
+        
+        for field in self.fields:
+            name = field["name"]
+            # Absent columns are left to the missing-field warning of the remote path
+            if name not in df.columns or name in IDENTIFIER_FIELDS:
+                continue
+            raw = df[name]
+            missing = raw.isna().to_numpy()
+            
+            if field["kind"] == "numeric":
+                values = pd.to_numeric(raw, errors="coerce")
+                numbers = values.to_numpy(dtype=np.float64)
+                parsed = ~np.isnan(numbers)
+                report(~missing & ~parsed, raw, name, "不是數字")
+                finite = np.isfinite(numbers)
+                report(parsed & ~finite, raw, name, "不是有限數值")
+                parsed &= finite
+                report(parsed & ((numbers < field["min"]) | (numbers > field["max"])), raw, name,
+                       f"超出訓練範圍 [{field['min']:g}, {field['max']:g}]", level="warning")
+                if field["integer"]:
+                    report(parsed & (numbers % 1 != 0), raw, name, "應為整數")
+                clean_df[name] = values
+            else:
+                # Normalize each distinct value once, then spread the result by code
+                codes, uniques = pd.factorize(raw)
+                lookup = self._lookups[name]
+                mapped = np.array([lookup.get(str(value).strip().casefold()) for value in uniques] + [None], dtype=object)
+                canonical = pd.Series(mapped[codes], index=df.index, dtype=object)
+                unseen = ~missing & canonical.isna().to_numpy()
+                report(unseen, raw, name, "訓練資料沒有的類別", level="warning")
+                # Unseen categories are sent as uploaded, without surrounding spaces
+                canonical[unseen] = raw[unseen].astype(str).str.strip()
+                clean_df[name] = canonical
+        
+        issues_df = (pd.concat(issues, ignore_index=True) if issues
+                     else pd.DataFrame(columns=["row", "column", "value", "level", "reason"]))
+        return clean_df, valid, issues_df
+    
+    def save(self, path: str = DEFAULT_SCHEMA_PATH):
+        os.makedirs(Path(path).parent, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fields": self.fields, "sources": self.sources}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str = DEFAULT_SCHEMA_PATH) -> "FeatureSchema":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["fields"], data.get("sources"))
+
+def get_feature_schema(path: str = DEFAULT_SCHEMA_PATH) -> Optional[FeatureSchema]:
+    # Loaded once per process and reloaded when recompiled; None if never compiled
+    return load_if_changed(path, FeatureSchema.load)
 
 class LoanPredictor:
-    def __init__(self, token_manager=None):
+    def __init__(self, token_manager=None, chunk_size: int = 500, max_workers: int = 4,
+                 max_retries: int = 2, retry_backoff: float = 1.0, timeout: int = 60,
+                 cache: Optional[PredictionCache] = None, use_cache: bool = True,
+                 http_client: Optional[HttpClient] = None, use_async: Optional[bool] = None,
+                 mode: str = "remote", model_path: str = DEFAULT_MODEL_PATH,
+                 local_model: Optional[SurrogateModel] = None,
+                 schema: Optional[FeatureSchema] = None, schema_path: str = DEFAULT_SCHEMA_PATH):
 
         load_dotenv()
         
@@ -25,6 +196,36 @@ class LoanPredictor:
 
         self.token_manager = token_manager
         
+        # Batch scoring settings
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.http = http_client or get_http_client()
+        # Score chunks as coroutines on the shared event loop instead of a thread pool;
+        # PREDICTION_ASYNC=true turns it on for the prediction page
+        if use_async is None:
+            use_async = os.getenv("PREDICTION_ASYNC", "false").lower() in ("1", "true")
+        self.use_async = use_async
+        
+        # Local cache of earlier predictions, keyed by row hash and deployment
+        self.cache = (cache or PredictionCache()) if use_cache else None
+        self.last_cache_stats = {"hits": 0, "misses": 0}
+        
+        # Local surrogate model, trained from the stored model data
+        if mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode: {mode}")
+        self.mode = mode
+        self.model_path = model_path
+        self.local_model = local_model
+        self.last_local_stats = None
+        
+        # Rows are checked against the compiled schema before anything is scored
+        self.schema = schema
+        self.schema_path = schema_path
+        self.last_issues = None
+        
 
         try:
 
@@ -45,8 +246,197 @@ class LoanPredictor:
                 st.error(f"回應內容: {e.response.text}")
             raise
     
-    def predict(self, df: pd.DataFrame, target_column: str) -> pd.DataFrame:
+    def _auth_headers(self, refresh: bool = False) -> Dict[str, str]:
+        # Build request headers with the newest token
+        token = self.token_manager.refresh_token() if refresh else self.token_manager.get_token()
+        if not token:
+            raise Exception("無法獲取有效的API令牌")
+        return {**self.headers, 'Authorization': f'Bearer {token}'}
+    
+    def _payload(self, values: List[List[Any]]) -> bytes:
+        return dumps_payload({
+            "input_data": [{
+                "fields": REQUIRED_FIELDS,
+                "values": values
+            }]
+        })
+    
+    def _parse_predictions(self, response, row_count: int) -> List[Any]:
+        if response.status_code != 200:
+            raise Exception(f"API request fail: {response.status_code}, Response: {response.text}")
+        
+        predictions = response.json()
+        if 'predictions' not in predictions or len(predictions['predictions']) == 0:
+            raise Exception(f"Prediction Error: {predictions}")
+        
+        prediction_values = predictions['predictions'][0]['values']
+        if len(prediction_values) != row_count:
+            raise Exception(f"Prediction Error: expected {row_count} rows, got {len(prediction_values)}")
+        
+        return [
+            row[0] if row and len(row) > 0 else None 
+            for row in prediction_values
+        ]
+    
+    def _score_chunk(self, values: List[List[Any]]) -> List[Any]:
+        # Send one chunk to the deployment, refreshing the token once on 401
+        payload = self._payload(values)
+        
+        response = self.http.post(self.base_url, data=payload, headers=self._auth_headers(), timeout=self.timeout)
+        if response.status_code == 401:
+            response = self.http.post(self.base_url, data=payload, headers=self._auth_headers(refresh=True), timeout=self.timeout)
+        
+        return self._parse_predictions(response, len(values))
+    
+    def _score_chunk_with_retry(self, values: List[List[Any]]) -> List[Any]:
+        # Retry a failed chunk on its own with exponential backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._score_chunk(values)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt))
+    
+    async def _score_chunk_async(self, values: List[List[Any]], semaphore: asyncio.Semaphore) -> List[Any]:
+        # Async counterpart of _score_chunk_with_retry; the semaphore bounds requests in flight
+        client = get_async_client()
+        payload = self._payload(values)
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    # TokenManager is thread based, keep its calls off the event loop
+                    headers = await asyncio.to_thread(self._auth_headers)
+                    response = await client.predict(self.base_url, payload, headers)
+                    if response.status_code == 401:
+                        headers = await asyncio.to_thread(self._auth_headers, True)
+                        response = await client.predict(self.base_url, payload, headers)
+                    return self._parse_predictions(response, len(values))
+                except Exception:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+    
+    def _collect_chunks(self, futures, chunk_results, failed_chunks, progress_callback):
+        # Gather chunk results as they finish, reporting progress from the calling thread
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                chunk_results[i] = future.result()
+            except Exception as e:
+                failed_chunks.append((i, str(e)))
+            if progress_callback:
+                progress_callback(done, len(futures))
+    
+    def get_local_model(self) -> Optional[SurrogateModel]:
+        return self.local_model or get_surrogate_model(self.model_path)
+    
+    def train_local_model(self, df: pd.DataFrame, target_column: str, **options) -> SurrogateModel:
+        # Fit on the API fields only, so local and remote see the same inputs
+        model = SurrogateModel(**options).fit(df, target_column, features=REQUIRED_FIELDS)
+        model.save(self.model_path)
+        self.local_model = model
+        return model
+    
+    def predict_local(self, df: pd.DataFrame, target_column: str) -> pd.DataFrame:
+        model = self.get_local_model()
+        if model is None:
+            raise Exception("尚未訓練本地模型，請先以模型資料訓練")
+        if model.target_column != target_column:
+            raise Exception(f"本地模型是以「{model.target_column}」訓練，請以「{target_column}」重新訓練本地模型")
+        result_df = df.copy()
+        result_df[f"Predicted_{target_column}"] = model.predict(df)
+        return result_df
+    
+    def get_schema(self) -> Optional[FeatureSchema]:
+        return self.schema or get_feature_schema(self.schema_path)
+    
+    def compile_schema(self, df: pd.DataFrame, sources: Optional[List[str]] = None) -> FeatureSchema:
+        schema = FeatureSchema.compile(df, REQUIRED_FIELDS, sources=sources)
+        schema.save(self.schema_path)
+        self.schema = schema
+        return schema
+    
+    def predict(self, df: pd.DataFrame, target_column: str,
+                progress_callback: Optional[Callable[[int, int], None]] = None,
+                local_callback: Optional[Callable[[pd.DataFrame], None]] = None) -> pd.DataFrame:
         """預測貸款核准金額"""
+        schema = self.get_schema()
+        if schema is None:
+            self.last_issues = None
+            return self._predict_rows(df, target_column, progress_callback, local_callback)
+        
+        # Validate every row up front; invalid rows are reported now and never sent
+        clean_df, valid, issues = schema.validate(df)
+        self.last_issues = issues
+        if not valid.any():
+            first = issues[issues["level"] == "error"].iloc[0]
+            raise Exception(f"全部 {len(df)} 筆資料未通過檢查，未送出預測: {first['column']} {first['reason']}")
+        if not valid.all():
+            st.warning(f"{int((~valid).sum())} 筆資料未通過檢查，未送出預測")
+        warned = issues.loc[issues["level"] == "warning", "row"].nunique()
+        if warned:
+            st.info(f"{warned} 筆資料含訓練資料範圍外的數值或類別，仍送出預測")
+        if local_callback:
+            callback = local_callback
+            local_callback = lambda local_df: callback(self._expand(df, local_df, valid, target_column))
+        
+        # Scored on the coerced values, returned next to the rows as uploaded
+        scored_df = self._predict_rows(clean_df[valid], target_column, progress_callback, local_callback)
+        return self._expand(df, scored_df, valid, target_column)
+    
+    @staticmethod
+    def _expand(df: pd.DataFrame, scored_df: pd.DataFrame, valid: np.ndarray,
+                target_column: str) -> pd.DataFrame:
+        # Original rows with the prediction columns of the valid ones; invalid rows stay empty.
+        # Prediction columns already in the upload (a re-scored result file) are replaced
+        outputs = {f"Predicted_{target_column}", f"Local_Predicted_{target_column}"}
+        result_df = df.copy()
+        for column in scored_df.columns:
+            if column in df.columns and column not in outputs:
+                continue
+            values = np.full(len(df), None, dtype=object)
+            values[valid] = scored_df[column].to_numpy()
+            result_df[column] = pd.Series(values, index=df.index).infer_objects()
+        return result_df
+    
+    def _predict_rows(self, df: pd.DataFrame, target_column: str,
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      local_callback: Optional[Callable[[pd.DataFrame], None]] = None) -> pd.DataFrame:
+        if self.mode == "local":
+            result_df = self.predict_local(df, target_column)
+            st.success("本地模型預測結果如下")
+            return result_df
+        if self.mode == "remote":
+            return self._predict_remote(df, target_column, progress_callback)
+        
+        # local_first: show the local estimate while the deployment confirms it
+        local_df = self.predict_local(df, target_column)
+        if local_callback:
+            local_callback(local_df)
+        try:
+            result_df = self._predict_remote(df, target_column, progress_callback)
+        except Exception as e:
+            st.warning(f"遠端確認失敗，以下為本地模型結果: {str(e)}")
+            self.last_local_stats = {"rows": len(df), "confirmed": 0, "mae": None}
+            return local_df
+        
+        column = f"Predicted_{target_column}"
+        local = local_df[column]
+        remote = pd.to_numeric(result_df[column], errors="coerce")
+        confirmed = remote.notna()
+        # Rows the deployment did not answer keep the local estimate
+        result_df[column] = remote.where(confirmed, local)
+        result_df[f"Local_{column}"] = local
+        self.last_local_stats = {
+            "rows": len(df),
+            "confirmed": int(confirmed.sum()),
+            "mae": float((remote[confirmed] - local[confirmed]).abs().mean()) if confirmed.any() else None,
+        }
+        return result_df
+    
+    def _predict_remote(self, df: pd.DataFrame, target_column: str,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
         if not self.token_manager:
             raise Exception("令牌管理器未初始化，無法進行預測")
         
@@ -54,91 +444,71 @@ class LoanPredictor:
         
 
         try:
-            # Get Newest Token
-            token = self.token_manager.get_token()
-            if not token:
+            # Get Newest Token before starting the workers
+            if not self.token_manager.get_token():
                 raise Exception("無法獲取有效的API令牌")
             
-
-            self.headers['Authorization'] = f'Bearer {token}'
-            
-
-            required_fields = [
-                "Gender", "Age", "Income (USD)", "Income Stability", 
-                "Profession", "Type of Employment", "Location", 
-                "Loan Amount Request (USD)", "Current Loan Expenses (USD)", 
-                "Expense Type 1", "Expense Type 2", "Dependents", 
-                "Credit Score", "No. of Defaults", "Has Active Credit Card", 
-                "Property ID", "Property Age", "Property Type", 
-                "Property Location", "Co-Applicant", "Property Price"
-            ]
-            
             # Check Required Fields
-            missing_fields = [field for field in required_fields if field not in df.columns]
+            missing_fields = [field for field in REQUIRED_FIELDS if field not in df.columns]
             if missing_fields:
                 st.warning(f"注意：上傳數據缺少以下API需要的欄位: {', '.join(missing_fields)}")
                 st.info("將嘗試使用可用欄位進行預測")
             
-
-            values = []
-            for _, row in df.iterrows():
-                row_values = [
-                    row[field] if field in df.columns and pd.notna(row[field]) else None 
-                    for field in required_fields
-                ]
-                values.append(row_values)
-            
-            
-            payload = {
-                "input_data": [{
-                    "fields": required_fields,
-                    "values": values
-                }]
-            }
+            values = build_values(df)
             
+            # Look up rows scored before; only unique cache misses go to the API
+            keys = PredictionCache.row_keys(values, self.deployment_id)
+            cached = self.cache.get_many(keys) if self.cache else {}
+            pending = {}
+            for key, row in zip(keys, values):
+                if key not in cached and key not in pending:
+                    pending[key] = row
+            hits = sum(1 for key in keys if key in cached)
+            self.last_cache_stats = {"hits": hits, "misses": len(keys) - hits}
             
-            with st.spinner("預測中"):
-                response = requests.post(
-                    self.base_url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=60
-                )
+            # Split rows into chunks and score them concurrently, at most max_workers in flight
+            miss_keys = list(pending)
+            miss_values = list(pending.values())
+            chunks = [miss_values[i:i + self.chunk_size] for i in range(0, len(miss_values), self.chunk_size)]
+            chunk_results: List[Optional[List[Any]]] = [None] * len(chunks)
+            failed_chunks = []
             
-
-            if response.status_code == 401:
-                st.warning("Token過期，正在嘗試重新獲取...")
-                token = self.token_manager.refresh_token()
-                if not token:
-                    raise Exception("Cannot refresh token")
-                
-                self.headers['Authorization'] = f'Bearer {token}'
-                with st.spinner("Use new token resent request..."):
-                    response = requests.post(
-                        self.base_url,
-                        json=payload,
-                        headers=self.headers,
-                        timeout=60
-                    )
+            if self.use_async:
+                semaphore = asyncio.Semaphore(self.max_workers)
+                futures = {
+                    submit_async(self._score_chunk_async(chunk, semaphore)): i
+                    for i, chunk in enumerate(chunks)
+                }
+                self._collect_chunks(futures, chunk_results, failed_chunks, progress_callback)
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {
+                        executor.submit(self._score_chunk_with_retry, chunk): i
+                        for i, chunk in enumerate(chunks)
+                    }
+                    self._collect_chunks(futures, chunk_results, failed_chunks, progress_callback)
             
+            if chunks and len(failed_chunks) == len(chunks):
+                raise Exception(f"All prediction chunks failed: {failed_chunks[0][1]}")
             
-            if response.status_code != 200:
-                raise Exception(f"API request fail: {response.status_code}, Response: {response.text}")
+            scored = {}
+            for i, result in enumerate(chunk_results):
+                if result is not None:
+                    scored.update(zip(miss_keys[i * self.chunk_size:(i + 1) * self.chunk_size], result))
+            if self.cache:
+                self.cache.set_many({key: value for key, value in scored.items() if value is not None})
+            scored.update(cached)
             
-            # Prediction Scuccess
-            predictions = response.json()
+            # Reassemble in the original row order; rows of failed chunks stay empty
+            result_df[f"Predicted_{target_column}"] = [scored.get(key) for key in keys]
             
-            if 'predictions' in predictions and len(predictions['predictions']) > 0:
-                prediction_values = predictions['predictions'][0]['values']
-                result_df[f"Predicted_{target_column}"] = [
-                    row[0] if row and len(row) > 0 else None 
-                    for row in prediction_values
-                ]
-                st.success("預測結果如下")
-                return result_df
+            if failed_chunks:
+                failed_rows = sum(1 for key in keys if key not in scored)
+                st.warning(f"{len(failed_chunks)} 個批次預測失敗，共 {failed_rows} 筆資料無預測結果: {failed_chunks[0][1]}")
             else:
-                raise Exception(f"Prediction Error: {predictions}")
+                st.success("預測結果如下")
+            return result_df
                     
         except Exception as e:
             st.error(f"API Error: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+
+class PredictionCache:
+    """SQLite cache of deployment predictions keyed by a hash of the input row.
+
+    Entries expire after ``ttl_seconds``; beyond ``max_entries`` the least recently used
+    rows are evicted.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _BATCH = 500
+
+    def __init__(self, db_path: str = "cache/prediction_cache.sqlite",
+                 max_entries: int = 200000, ttl_seconds: int = 7 * 24 * 3600):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps the cache usable from worker threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def row_keys(values: List[List[Any]], deployment_id: Optional[str]) -> List[str]:
+        prefix = f"{deployment_id}\x1f".encode("utf-8")
+        return [
+            hashlib.sha256(prefix + json.dumps(row, separators=(",", ":")).encode("utf-8")).hexdigest()
+            for row in values
+        ]
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        now = time.time()
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(unique_keys), self._BATCH):
+                batch = unique_keys[start:start + self._BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM predictions WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*batch, now - self.ttl_seconds),
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+                conn.execute(
+                    f"UPDATE predictions SET accessed_at = ? WHERE key IN ({placeholders})",
+                    (now, *batch),
+                )
+        return found
+
+    def set_many(self, items: Dict[str, Any]):
+        if not items:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), now, now) for key, value in items.items()],
+            )
+        self.evict()
+
+    def evict(self):
+        # Drop expired rows, then the least recently used ones above the size limit
+        with self._connect() as conn:
+            conn.execute("DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            count = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM predictions")
@@ -0,0 +1,187 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _top_k(scores: np.ndarray, top_k: int, deleted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    top_k = min(top_k, len(scores))
+    if deleted is not None and len(deleted):
+        scores[deleted] = -np.inf
+        top_k = min(top_k, len(scores) - len(deleted))
+    if top_k == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top])]
+    return scores[top], top
+
+
+class ScalarQuantizer:
+    """int8 codes with a per-dimension offset and scale (4x smaller than float32).
+
+    Inner products are computed asymmetrically: the query stays float32 and is folded into
+    the scale, so ``q . x ~= (q * scale) . codes + q . offset``.
+    """
+
+    kind = "int8"
+    code_dtype = np.int8
+    # Candidates per result read back as float32 for exact scores; int8 codes rank well already
+    default_rescore = 4
+
+    def __init__(self, block_size: int = 4096):
+        self.block_size = block_size
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.trained_size = 0
+
+    def train(self, vectors: np.ndarray):
+        low = np.asarray(vectors).min(axis=0).astype(np.float32)
+        high = np.asarray(vectors).max(axis=0).astype(np.float32)
+        # Map [low, high] onto [-127, 127]
+        self.scale = np.maximum((high - low) / 254.0, 1e-12).astype(np.float32)
+        self.offset = (low + 127.0 * self.scale).astype(np.float32)
+        self.trained_size = len(vectors)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(np.shape(vectors), dtype=np.int8)
+        for start in range(0, len(vectors), self.block_size):
+            block = np.asarray(vectors[start:start + self.block_size], dtype=np.float32)
+            codes[start:start + self.block_size] = np.clip(
+                np.rint((block - self.offset) / self.scale), -127, 127
+            )
+        return codes
+
+    def code_width(self, dim: int) -> int:
+        return dim
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Scan in blocks so only one block is ever widened to float32
+        folded = (query * self.scale).astype(np.float32)
+        bias = float(query @ self.offset)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            scores[start:start + self.block_size] = np.asarray(
+                codes[start:start + self.block_size], dtype=np.float32
+            ) @ folded
+        return scores + bias
+
+    def search(self, codes: np.ndarray, query: np.ndarray, top_k: int,
+               deleted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        return _top_k(self.scores(codes, query), top_k, deleted)
+
+    def state(self) -> dict:
+        return {"offset": self.offset, "scale": self.scale, "trained_size": np.array(self.trained_size)}
+
+    def load_state(self, state):
+        self.offset = state["offset"]
+        self.scale = state["scale"]
+        self.trained_size = int(state["trained_size"])
+
+
+class ProductQuantizer:
+    """Product quantization: each vector is cut into ``subspaces`` parts and each part stored
+    as the uint8 id of its nearest of 256 k-means centroids.
+
+    Search builds a (subspaces x 256) table of query/centroid inner products once and sums
+    table lookups per row (asymmetric distance computation).
+    """
+
+    kind = "pq"
+    code_dtype = np.uint8
+    # PQ ranks coarsely: at 8 dimensions per subspace, recall@5 needs ~40 candidates per result
+    default_rescore = 40
+
+    def __init__(self, subspaces: int = 48, centroids: int = 256, train_iterations: int = 10,
+                 train_sample: int = 10000, seed: int = 0, block_size: int = 4096):
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.train_iterations = train_iterations
+        self.train_sample = train_sample
+        self.seed = seed
+        self.block_size = block_size
+        self.codebooks: Optional[np.ndarray] = None  # (subspaces, centroids, sub_dim)
+        self.trained_size = 0
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        # (n, dim) -> (subspaces, n, sub_dim)
+        n, dim = vectors.shape
+        if dim % self.subspaces:
+            raise ValueError(f"dimension {dim} is not divisible by {self.subspaces} subspaces")
+        return vectors.reshape(n, self.subspaces, dim // self.subspaces).transpose(1, 0, 2)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin of squared L2 distance, without the constant |p|^2 term
+        return np.argmin((centroids ** 2).sum(axis=1) - 2 * points @ centroids.T, axis=1)
+
+    def train(self, vectors: np.ndarray):
+        n = len(vectors)
+        rng = np.random.default_rng(self.seed)
+        sample = np.asarray(vectors[rng.choice(n, min(n, self.train_sample), replace=False)], dtype=np.float32)
+        parts = self._split(sample)
+        k = min(self.centroids, len(sample))
+
+        codebooks = np.zeros((self.subspaces, self.centroids, parts.shape[2]), dtype=np.float32)
+        for j in range(self.subspaces):
+            points = np.ascontiguousarray(parts[j])
+            centroids = points[rng.choice(len(points), k, replace=False)].copy()
+            for _ in range(self.train_iterations):
+                labels = self._nearest(points, centroids)
+                sums = np.stack([np.bincount(labels, weights=points[:, d], minlength=k)
+                                 for d in range(points.shape[1])], axis=1)
+                counts = np.bincount(labels, minlength=k)[:, None]
+                # Keep the previous centroid for clusters that lost all their points
+                centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            codebooks[j, :k] = centroids
+            # Unused code slots (tiny corpora) repeat the first centroid
+            codebooks[j, k:] = centroids[0]
+
+        self.codebooks = codebooks
+        self.trained_size = n
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), self.block_size):
+            parts = self._split(np.asarray(vectors[start:start + self.block_size], dtype=np.float32))
+            for j, points in enumerate(parts):
+                codes[start:start + len(points), j] = self._nearest(points, self.codebooks[j])
+        return codes
+
+    def code_width(self, dim: int) -> int:
+        return self.subspaces
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        query_parts = query.reshape(self.subspaces, -1)
+        table = np.einsum("md,mkd->mk", query_parts, self.codebooks).astype(np.float32)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            block = np.asarray(codes[start:start + self.block_size])
+            block_scores = scores[start:start + len(block)]
+            for j in range(self.subspaces):
+                block_scores += table[j][block[:, j]]
+        return scores
+
+    def search(self, codes: np.ndarray, query: np.ndarray, top_k: int,
+               deleted: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        return _top_k(self.scores(codes, query), top_k, deleted)
+
+    def state(self) -> dict:
+        return {"codebooks": self.codebooks, "trained_size": np.array(self.trained_size)}
+
+    def load_state(self, state):
+        self.codebooks = state["codebooks"]
+        self.trained_size = int(state["trained_size"])
+
+
+def make_quantizer(kind: str, **options):
+    if kind == "int8":
+        return ScalarQuantizer(**options)
+    if kind == "pq":
+        return ProductQuantizer(**options)
+    raise ValueError(f"Unknown quantization: {kind}")
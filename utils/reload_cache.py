@@ -0,0 +1,23 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_loaded: Dict[Tuple[Callable, str], Tuple[int, Any]] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_if_changed(path: str, load: Callable[[str], T]) -> Optional[T]:
+    # Process-wide cache of load(path), reloaded when the file's mtime changes; None if it does not exist
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = (load, path)
+    with _loaded_lock:
+        cached = _loaded.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load(path))
+            _loaded[key] = cached
+        return cached[1]
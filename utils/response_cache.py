@@ -0,0 +1,133 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Iterable
+
+import numpy as np
+
+from utils.vector_index import HashingEmbedder
+
+
+def context_fingerprint(context: str, history: str = "") -> str:
+    return hashlib.sha256(f"{context}\x1f{history}".encode("utf-8")).hexdigest()
+
+
+def _normalize(question: str) -> str:
+    return re.sub(r"[\s\W_]+", "", question.lower())
+
+
+class ResponseCache:
+    """Semantic cache of generated answers.
+
+    An answer is reused when a new question is asked with the same context and chat history
+    (same fingerprint) and its embedding is at least ``threshold`` similar to a cached question.
+    Entries expire after ``ttl_seconds`` and the least recently used are dropped beyond
+    ``max_entries``.
+    """
+
+    def __init__(self, embedder=None, threshold: float = 0.9, max_entries: int = 1000,
+                 ttl_seconds: float = 24 * 3600):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+
+        # key -> {"fingerprint", "vector", "answer", "doc_ids", "latency", "created_at"}
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.by_fingerprint: Dict[str, List[str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key)
+        keys = self.by_fingerprint[entry["fingerprint"]]
+        keys.remove(key)
+        if not keys:
+            del self.by_fingerprint[entry["fingerprint"]]
+
+    def lookup(self, question: str, context: str, history: str = "") -> Optional[str]:
+        fingerprint = context_fingerprint(context, history)
+        vector = None
+        now = time.time()
+        with self.lock:
+            best_key, best_score = None, self.threshold
+            for key in list(self.by_fingerprint.get(fingerprint, [])):
+                entry = self.entries[key]
+                if now - entry["created_at"] > self.ttl_seconds:
+                    self._drop(key)
+                    continue
+                if vector is None:
+                    vector = self.embedder.embed([question])[0]
+                score = float(np.dot(entry["vector"], vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best_key)
+            entry = self.entries[best_key]
+            self.hits += 1
+            self.latency_saved += entry["latency"]
+            return entry["answer"]
+
+    def store(self, question: str, context: str, answer: str, history: str = "",
+              doc_ids: Iterable[str] = (), latency: float = 0.0):
+        fingerprint = context_fingerprint(context, history)
+        key = f"{fingerprint}:{_normalize(question)}"
+        vector = self.embedder.embed([question])[0]
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = {
+                "fingerprint": fingerprint,
+                "vector": vector,
+                "answer": answer,
+                "doc_ids": set(doc_ids),
+                "latency": latency,
+                "created_at": time.time(),
+            }
+            self.by_fingerprint.setdefault(fingerprint, []).append(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate_document(self, doc_id: str) -> int:
+        # Forget answers generated from a document that changed or was deleted
+        with self.lock:
+            stale = [key for key, entry in self.entries.items() if doc_id in entry["doc_ids"]]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_fingerprint.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved": self.latency_saved,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    # One answer cache per process, shared by all chat sessions
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
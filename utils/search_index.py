@@ -0,0 +1,246 @@
+import itertools
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple, Iterable
+
+import numpy as np
+
+from utils.document_index import load_documents
+from utils.text_patterns import CJK_CHAR, CJK_RANGES
+
+_TOKEN_PATTERN = re.compile(rf"[{CJK_RANGES}]+|[a-z0-9]+(?:\.[0-9]+)?")
+_NUMBER = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str, numbers: bool = True) -> List[str]:
+    # Latin words and numbers as whole tokens; CJK runs as character unigrams and bigrams.
+    # numbers=False leaves out tokens that are only a number
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        run = match.group()
+        if CJK_CHAR.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif numbers or not _NUMBER.fullmatch(run):
+            tokens.append(run)
+    return tokens
+
+
+class SearchIndex:
+    """Inverted index from tokens to (document, row) postings, ranked with BM25.
+
+    Each document's postings are stored as flat arrays in ``<doc_id>.npz`` under
+    ``index_dir``, so adding or deleting a document only touches that document. With
+    ``index_dir=None`` the index lives in memory only. Processes sharing ``index_dir`` each
+    write the documents they add and ``reload_document`` the others. Rows are read and tokenized
+    ``chunk_rows`` at a time, so a document is never held whole. ``numbers=False`` leaves
+    numeric tokens out of the postings, for model data whose numbers are not searched by.
+    """
+
+    def __init__(self, index_dir: Optional[str], k1: float = 1.2, b: float = 0.75,
+                 numbers: bool = True, chunk_rows: int = 50000):
+        self.index_dir = Path(index_dir) if index_dir is not None else None
+        self.k1 = k1
+        self.b = b
+        self.numbers = numbers
+        self.chunk_rows = chunk_rows
+        self.lock = threading.RLock()
+        # doc_id -> {"rows": int, "lengths": np.ndarray, "postings": {token: (rows, tfs)}}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+        if self.index_dir is not None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._load()
+
+    def _load(self):
+        for path in self.index_dir.glob("*.npz"):
+            try:
+                self.documents[path.stem] = self._read(path)
+            except (OSError, ValueError, KeyError):
+                continue
+        # Postings used to be stored as JSON; sync() rebuilds them from the stored text
+        for path in self.index_dir.glob("*.json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Any]:
+        with np.load(path) as data:
+            tokens = bytes(data["tokens"]).decode("utf-8").split("\n") if len(data["offsets"]) > 1 else []
+            offsets = data["offsets"]
+            rows, tfs = data["posting_rows"], data["posting_tfs"]
+            return {
+                "rows": int(data["rows"]),
+                "lengths": data["lengths"],
+                "postings": {
+                    token: (rows[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]])
+                    for i, token in enumerate(tokens)
+                },
+            }
+
+    def _write(self, doc_id: str, document: Dict[str, Any]):
+        tokens = list(document["postings"])
+        postings = [document["postings"][token] for token in tokens]
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum([len(rows) for rows, _ in postings], out=offsets[1:])
+        # Per-process temp name, in case two processes build the same document at startup
+        tmp_path = self.index_dir / f"{doc_id}.npz.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f, rows=np.int64(document["rows"]), lengths=document["lengths"],
+                # Tokens never contain whitespace, so one newline-joined buffer holds them all
+                tokens=np.frombuffer("\n".join(tokens).encode("utf-8"), dtype=np.uint8),
+                offsets=offsets,
+                posting_rows=np.concatenate([rows for rows, _ in postings]) if tokens else np.zeros(0, np.int32),
+                posting_tfs=np.concatenate([tfs for _, tfs in postings]) if tokens else np.zeros(0, np.float32),
+            )
+        os.replace(tmp_path, self.index_dir / f"{doc_id}.npz")
+
+    def _build(self, lines: Iterable[str]) -> Dict[str, Any]:
+        # Postings of each chunk become arrays before the next chunk is read
+        chunks = defaultdict(list)
+        lengths = []
+        start = 0
+        lines = iter(lines)
+        while True:
+            chunk = list(itertools.islice(lines, self.chunk_rows))
+            if not chunk:
+                break
+            postings = defaultdict(lambda: ([], []))
+            chunk_lengths = np.zeros(len(chunk), dtype=np.float32)
+            for offset, line in enumerate(chunk):
+                counts = Counter(tokenize(line, self.numbers))
+                chunk_lengths[offset] = sum(counts.values())
+                for token, tf in counts.items():
+                    rows, tfs = postings[token]
+                    rows.append(start + offset)
+                    tfs.append(tf)
+            for token, (rows, tfs) in postings.items():
+                chunks[token].append((np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32)))
+            lengths.append(chunk_lengths)
+            start += len(chunk)
+        return {
+            "rows": start,
+            "lengths": np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.float32),
+            "postings": {
+                token: parts[0] if len(parts) == 1 else
+                (np.concatenate([rows for rows, _ in parts]), np.concatenate([tfs for _, tfs in parts]))
+                for token, parts in chunks.items()
+            },
+        }
+
+    def add_document(self, doc_id: str, lines: Iterable[str]):
+        # Index one document's rows; the header line is not passed in
+        document = self._build(lines)
+        if self.index_dir is not None:
+            self._write(doc_id, document)
+        with self.lock:
+            self.documents[doc_id] = document
+
+    def add_document_file(self, doc_id: str, path: str):
+        # Index a stored <doc_id>.txt streamed from disk, skipping its header line
+        with open(path, "r", encoding="utf-8") as f:
+            next(f, None)
+            self.add_document(doc_id, f)
+
+    def remove_document(self, doc_id: str):
+        with self.lock:
+            self.documents.pop(doc_id, None)
+        if self.index_dir is None:
+            return
+        try:
+            os.remove(self.index_dir / f"{doc_id}.npz")
+        except OSError:
+            pass
+
+    def reload_document(self, doc_id: str):
+        # Pick up a document another process indexed or removed
+        if self.index_dir is None:
+            return
+        path = self.index_dir / f"{doc_id}.npz"
+        try:
+            document = self._read(path)
+        except (OSError, ValueError, KeyError):
+            if not path.exists():
+                with self.lock:
+                    self.documents.pop(doc_id, None)
+            return
+        with self.lock:
+            self.documents[doc_id] = document
+
+    def has_document(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[str, int, float]]:
+        # Returns (doc_id, row, score), best first
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        with self.lock:
+            documents = dict(self.documents)
+        if not query_tokens or not documents:
+            return []
+
+        total_rows = sum(document["rows"] for document in documents.values())
+        total_length = sum(float(document["lengths"].sum()) for document in documents.values())
+        avg_length = total_length / max(total_rows, 1)
+        doc_freq = {
+            token: sum(len(document["postings"][token][0]) for document in documents.values()
+                       if token in document["postings"])
+            for token in query_tokens
+        }
+
+        results = []
+        for doc_id, document in documents.items():
+            matched = [token for token in query_tokens if token in document["postings"]]
+            if not matched:
+                continue
+            scores = np.zeros(document["rows"], dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * document["lengths"] / max(avg_length, 1e-6))
+            for token in matched:
+                rows, tfs = document["postings"][token]
+                idf = math.log(1 + (total_rows - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+            hit_rows = np.flatnonzero(scores)
+            top = hit_rows[np.argsort(-scores[hit_rows])[:limit]]
+            results.extend((doc_id, int(row), float(scores[row])) for row in top)
+
+        results.sort(key=lambda result: -result[2])
+        return results[:limit]
+
+    def sync(self, storage_dir: str):
+        # Index stored documents that are missing and drop ones that were deleted
+        if not (Path(storage_dir) / "document_index.json").exists():
+            return
+        stored = {doc["id"] for doc in load_documents(storage_dir)}
+        for doc_id in [doc_id for doc_id in self.documents if doc_id not in stored]:
+            self.remove_document(doc_id)
+        for doc_id in stored:
+            if doc_id in self.documents:
+                continue
+            # Indexed by another process since we loaded
+            self.reload_document(doc_id)
+            if doc_id in self.documents:
+                continue
+            try:
+                self.add_document_file(doc_id, Path(storage_dir) / f"{doc_id}.txt")
+            except OSError:
+                continue
+
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(storage_dir: str, numbers: bool = True) -> SearchIndex:
+    # One search index per storage directory per process; numbers is fixed by the first caller
+    with _indexes_lock:
+        if storage_dir not in _indexes:
+            index = SearchIndex(Path(storage_dir) / "search_index", numbers=numbers)
+            index.sync(storage_dir)
+            _indexes[storage_dir] = index
+        return _indexes[storage_dir]
@@ -0,0 +1,192 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from utils.reload_cache import load_if_changed
+
+DEFAULT_MODEL_PATH = "models/loan_surrogate.npz"
+
+
+class SurrogateModel:
+    """Gradient-boosted regression trees in NumPy, for scoring loans without the deployment.
+
+    Features are bucketed into at most ``max_bins`` bins (quantiles for numbers, categories
+    ordered by their mean target; bin 0 holds missing and unseen values). Trees are oblivious:
+    every node on a level uses the same split, so a tree is ``depth`` (feature, bin) pairs
+    plus ``2 ** depth`` leaf values, and a batch is scored across all trees in a few array
+    operations.
+    """
+
+    def __init__(self, n_trees: int = 200, depth: int = 6, learning_rate: float = 0.1,
+                 max_bins: int = 64, l2: float = 1.0):
+        if not 2 < max_bins <= 256:
+            raise ValueError("max_bins must be between 3 and 256")
+        self.n_trees = n_trees
+        self.depth = depth
+        self.learning_rate = learning_rate
+        self.max_bins = max_bins
+        self.l2 = l2
+
+        self.features: List[Dict[str, Any]] = []
+        self.target_column: Optional[str] = None
+        self.base = 0.0
+        self.split_features: Optional[np.ndarray] = None  # (trees, depth)
+        self.split_bins: Optional[np.ndarray] = None  # (trees, depth)
+        self.leaf_values: Optional[np.ndarray] = None  # (trees, 2 ** depth)
+        self.info: Dict[str, Any] = {}
+        self._edges: List[np.ndarray] = []
+        self._lookups: List[Dict[str, int]] = []
+
+    def _fit_features(self, df: pd.DataFrame, y: np.ndarray, columns: List[str]):
+        self.features = []
+        for name in columns:
+            series = df[name]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                values = series.to_numpy(dtype=np.float64)
+                values = values[~np.isnan(values)]
+                quantiles = np.linspace(0, 1, self.max_bins)[1:-1]
+                edges = np.unique(np.quantile(values, quantiles)) if len(values) else np.zeros(0)
+                self.features.append({"name": name, "kind": "numeric", "edges": edges.tolist()})
+            else:
+                # Most frequent categories, ordered by mean target so splits group similar ones
+                text = series.astype(object).where(series.notna(), None)
+                frame = pd.DataFrame({"value": text, "y": y}).dropna(subset=["value"])
+                frame["value"] = frame["value"].astype(str)
+                stats = frame.groupby("value")["y"].agg(["mean", "size"])
+                stats = stats.nlargest(self.max_bins - 1, "size").sort_values("mean")
+                self.features.append({"name": name, "kind": "category", "vocabulary": stats.index.tolist()})
+
+    def _prepare(self):
+        # Per-feature arrays and lookups, built once rather than on every encode
+        self._edges = [np.asarray(f.get("edges", []), dtype=np.float64) for f in self.features]
+        self._lookups = [{value: i + 1 for i, value in enumerate(f.get("vocabulary", []))} for f in self.features]
+
+    def encode(self, df: pd.DataFrame) -> np.ndarray:
+        # (rows, features) bin indices; missing columns and cells fall into bin 0.
+        # Works on the raw column arrays, so one applicant stays well under a millisecond
+        bins = np.zeros((len(df), len(self.features)), dtype=np.uint8)
+        for j, feature in enumerate(self.features):
+            if feature["name"] not in df.columns:
+                continue
+            raw = df[feature["name"]].to_numpy()
+            if feature["kind"] == "numeric":
+                try:
+                    values = raw.astype(np.float64)
+                except (TypeError, ValueError):
+                    values = pd.to_numeric(pd.Series(raw), errors="coerce").to_numpy(dtype=np.float64)
+                column = np.searchsorted(self._edges[j], values, side="right") + 1
+                column[np.isnan(values)] = 0
+            else:
+                lookup = self._lookups[j]
+                column = [lookup.get(value if isinstance(value, str) else str(value), 0) for value in raw]
+            bins[:, j] = column
+        return bins
+
+    def fit(self, df: pd.DataFrame, target_column: str, features: Optional[List[str]] = None) -> "SurrogateModel":
+        started = time.perf_counter()
+        y = pd.to_numeric(df[target_column], errors="coerce").to_numpy(dtype=np.float64)
+        df, y = df[~np.isnan(y)], y[~np.isnan(y)]
+        columns = [name for name in (features or df.columns) if name in df.columns and name != target_column]
+        if not len(y):
+            raise ValueError(f"No rows with a value for {target_column}")
+
+        self.target_column = target_column
+        self._fit_features(df, y, columns)
+        self._prepare()
+        X = self.encode(df).astype(np.int64)
+        n, n_features = X.shape
+        bins = self.max_bins
+        # Flat histogram slot of every (row, feature) before adding the row's leaf offset
+        slots = np.arange(n_features) * bins + X
+
+        self.base = float(y.mean())
+        prediction = np.full(n, self.base)
+        split_features = np.zeros((self.n_trees, self.depth), dtype=np.int32)
+        split_bins = np.zeros((self.n_trees, self.depth), dtype=np.int32)
+        leaf_values = np.zeros((self.n_trees, 2 ** self.depth))
+
+        for t in range(self.n_trees):
+            residual = y - prediction
+            weights = np.broadcast_to(residual[:, None], X.shape).ravel()
+            leaf = np.zeros(n, dtype=np.int64)
+            for level in range(self.depth):
+                size = (2 ** level) * n_features * bins
+                index = (leaf[:, None] * n_features * bins + slots).ravel()
+                shape = (2 ** level, n_features, bins)
+                gradient = np.bincount(index, weights=weights, minlength=size).reshape(shape)
+                count = np.bincount(index, minlength=size).reshape(shape)
+
+                # Squared-error gain of splitting every leaf at "bin <= b", summed over leaves
+                left_g, left_n = np.cumsum(gradient, axis=2), np.cumsum(count, axis=2)
+                right_g, right_n = left_g[..., -1:] - left_g, left_n[..., -1:] - left_n
+                gain = (left_g ** 2 / (left_n + self.l2) + right_g ** 2 / (right_n + self.l2)).sum(axis=0)
+                gain[:, -1] = -np.inf
+                feature, threshold = np.unravel_index(np.argmax(gain), gain.shape)
+
+                split_features[t, level] = feature
+                split_bins[t, level] = threshold
+                leaf = leaf * 2 + (X[:, feature] > threshold)
+
+            sums = np.bincount(leaf, weights=residual, minlength=2 ** self.depth)
+            counts = np.bincount(leaf, minlength=2 ** self.depth)
+            leaf_values[t] = self.learning_rate * sums / (counts + self.l2)
+            prediction += leaf_values[t][leaf]
+
+        self.split_features = split_features
+        self.split_bins = split_bins
+        self.leaf_values = leaf_values
+        self.info = {
+            "rows": int(n),
+            "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "train_seconds": round(time.perf_counter() - started, 2),
+            "train_mae": float(np.abs(prediction - y).mean()),
+        }
+        return self
+
+    def predict_bins(self, bins: np.ndarray) -> np.ndarray:
+        # (rows, trees, depth) split outcomes read as the binary leaf number of every tree
+        bits = bins[:, self.split_features] > self.split_bins
+        leaves = bits @ (1 << np.arange(self.depth - 1, -1, -1))
+        return self.base + self.leaf_values[np.arange(len(self.leaf_values)), leaves].sum(axis=1)
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        if self.leaf_values is None:
+            raise ValueError("Model is not trained")
+        return self.predict_bins(self.encode(df))
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        os.makedirs(Path(path).parent, exist_ok=True)
+        meta = {
+            "target_column": self.target_column, "features": self.features, "base": self.base,
+            "learning_rate": self.learning_rate, "max_bins": self.max_bins, "l2": self.l2, "info": self.info,
+        }
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, split_features=self.split_features, split_bins=self.split_bins,
+                 leaf_values=self.leaf_values, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "SurrogateModel":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(n_trees=len(data["leaf_values"]), depth=data["split_features"].shape[1],
+                        learning_rate=meta["learning_rate"], max_bins=meta["max_bins"], l2=meta["l2"])
+            model.split_features = data["split_features"]
+            model.split_bins = data["split_bins"]
+            model.leaf_values = data["leaf_values"]
+        model.target_column = meta["target_column"]
+        model.features = meta["features"]
+        model.base = meta["base"]
+        model.info = meta["info"]
+        model._prepare()
+        return model
+
+
+def get_surrogate_model(path: str = DEFAULT_MODEL_PATH) -> Optional[SurrogateModel]:
+    # Loaded once per process and reloaded when the file is retrained; None if never trained
+    return load_if_changed(path, SurrogateModel.load)
@@ -0,0 +1,8 @@
+import re
+
+# CJK ideographs (incl. extension A and compatibility forms) and Japanese kana, for use inside [...]
+CJK_RANGES = "぀-ヿ㐀-䶿一-鿿豈-﫿"
+# A single CJK character
+CJK_CHAR = re.compile(rf"[{CJK_RANGES}]")
+# Zero-width split point after sentence-ending punctuation or a newline
+SENTENCE_END = re.compile(r"(?<=[。！？!?；;\n])")
@@ -1,98 +1,231 @@
-import requests
 import datetime
+import logging
 import time
 import os
 import dotenv
 import streamlit as st
 import threading
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Tuple
+from utils.http_client import get_http_client
 
 dotenv.load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+IAM_URL = 'https://iam.cloud.ibm.com/identity/token'
+
 class TokenManager:
-    def __init__(self):
-        # initialize token manager
-        try:
-            self.api_key = st.secrets["WATSONX_API_KEY"]
-        except:
-            self.api_key = os.getenv("WATSONX_API_KEY")
+    def __init__(self, api_key: Optional[str] = None, iam_url: Optional[str] = None,
+                 refresh_margin: int = 300, min_refresh_interval: float = 5.0,
+                 retry_interval: float = 10.0, refresh_timeout: float = 60.0):
+        # initialize token manager; the first IAM call happens lazily on get_token
+        if api_key is None:
+            try:
+                api_key = st.secrets["WATSONX_API_KEY"]
+            except:
+                api_key = os.getenv("WATSONX_API_KEY")
+        self.api_key = api_key
+        self.iam_url = iam_url or os.getenv("WATSONX_IAM_URL", IAM_URL)
         self.token = None
         self.token_expiry = None
+        self._refresh_at = None
+        self._issued_at = None
+
+        # seconds before expiry to refresh in the background, capped at a fifth of the token lifetime
+        self.refresh_margin = refresh_margin
+        # forced refreshes within this window reuse the token that was just issued
+        self.min_refresh_interval = min_refresh_interval
+        self.retry_interval = retry_interval
+        self.refresh_timeout = refresh_timeout
+
+        # token_lock only guards fields and is never held during the IAM call
         self.token_lock = threading.Lock()
-        self.refresh_token()
-        
-        # start token refresh thread
-        self._start_token_refresh_thread()
-    
-    def refresh_token(self):
+        self._inflight: Optional[Future] = None
+
+        # refresh metrics
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.last_refresh_latency = None
+        self.total_refresh_latency = 0.0
+        self.last_error = None
+
+        self._refresh_thread = None
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+    def _fetch_token(self) -> Tuple[str, datetime.datetime, datetime.datetime]:
+        # request new token; expiry comes from the IAM response
+        requested_at = datetime.datetime.now()
+        token_response = get_http_client().post(
+            self.iam_url,
+            data={
+                "apikey": self.api_key,
+                "grant_type": 'urn:ibm:params:oauth:grant-type:apikey'
+            }
+        )
+
+        if token_response.status_code != 200:
+            raise Exception(f"Token refresh failed: {token_response.status_code} - {token_response.text}")
+
+        token_data = token_response.json()
+        if "expires_in" in token_data:
+            lifetime = float(token_data["expires_in"])
+        elif "expiration" in token_data:
+            lifetime = token_data["expiration"] - time.time()
+        else:
+            lifetime = 3600
+        expiry = requested_at + datetime.timedelta(seconds=lifetime)
+        refresh_at = expiry - datetime.timedelta(seconds=min(self.refresh_margin, lifetime / 5))
+        return token_data["access_token"], expiry, refresh_at
+
+    def _run_refresh(self, future: Future):
+        start = time.perf_counter()
         try:
+            token, expiry, refresh_at = self._fetch_token()
             with self.token_lock:
-                    
-                # request new token
-                token_response = requests.post(
-                    'https://iam.cloud.ibm.com/identity/token',
-                    data={
-                        "apikey": self.api_key,
-                        "grant_type": 'urn:ibm:params:oauth:grant-type:apikey'
-                    }
-                )
-                
-                if token_response.status_code == 200:
-                    token_data = token_response.json()
-                    self.token = token_data["access_token"]
-                    # set token expiry to 55 minutes
-                    self.token_expiry = datetime.datetime.now() + datetime.timedelta(minutes=55)
-                    return self.token
-                else:
-                    st.error(f"Token refresh failed: {token_response.status_code} - {token_response.text}")
-                    return None
+                self.token = token
+                self.token_expiry = expiry
+                self._refresh_at = refresh_at
+                self._issued_at = time.monotonic()
+                self.refresh_count += 1
+                self.last_error = None
+            result = token
         except Exception as e:
-            st.error(f"Error during refresh Token: {str(e)}")
+            with self.token_lock:
+                self.refresh_failures += 1
+                self.last_error = str(e)
+            logger.warning("Refresh Token Failed: %s", e)
+            result = None
+        finally:
+            with self.token_lock:
+                self.last_refresh_latency = time.perf_counter() - start
+                self.total_refresh_latency += self.last_refresh_latency
+                self._inflight = None
+
+        future.set_result(result)
+        # Let the background thread reschedule around the new expiry
+        self._wakeup.set()
+
+    def _refresh(self) -> Optional[str]:
+        # Single flight: the first caller fetches, everyone else waits on the same future
+        with self.token_lock:
+            future = self._inflight
+            leader = future is None
+            if leader:
+                future = self._inflight = Future()
+
+        if leader:
+            self._run_refresh(future)
+        try:
+            return future.result(timeout=self.refresh_timeout)
+        except Exception:
             return None
-    
+
+    def refresh_token(self):
+        # Forced refresh, e.g. after a 401; collapses bursts into a single IAM call
+        with self.token_lock:
+            recent = (
+                self._inflight is None and self.token is not None and self._issued_at is not None
+                and time.monotonic() - self._issued_at < self.min_refresh_interval
+            )
+            token = self.token
+        if recent:
+            return token
+        return self._refresh()
+
     def get_token(self):
+        self._start_token_refresh_thread()
+
+        now = datetime.datetime.now()
         with self.token_lock:
-            current_time = datetime.datetime.now()
-            
-            # refresh token if it is not available or expired
-            if not self.token or not self.token_expiry or \
-               (self.token_expiry - current_time).total_seconds() < 300:
-                return self.refresh_token()
-                
-            return self.token
-    
+            token = self.token
+            expiry = self.token_expiry
+            refresh_at = self._refresh_at
+
+        if token and now < refresh_at:
+            return token
+
+        if token and now < expiry:
+            # still valid: keep using it while the background thread refreshes
+            self._wakeup.set()
+            return token
+
+        # no token or expired: wait for a refresh
+        return self._refresh()
+
     def get_token_status(self):
         with self.token_lock:
             current_time = datetime.datetime.now()
-            
+
             if not self.token or not self.token_expiry:
                 return {
                     "is_valid": False,
                     "remaining_time": 0
                 }
-            
+
             remaining_seconds = (self.token_expiry - current_time).total_seconds()
-            
+
             return {
                 "is_valid": remaining_seconds > 0,
                 "remaining_time": round(remaining_seconds / 60, 1)  # 分鐘
             }
-    
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self.token_lock:
+            return {
+                "refresh_count": self.refresh_count,
+                "refresh_failures": self.refresh_failures,
+                "last_refresh_latency": self.last_refresh_latency,
+                "avg_refresh_latency": self.total_refresh_latency / max(self.refresh_count + self.refresh_failures, 1),
+                "last_error": self.last_error
+            }
+
+    def _seconds_until_refresh(self) -> Optional[float]:
+        with self.token_lock:
+            if self.token is None or self._refresh_at is None:
+                return None
+            return (self._refresh_at - datetime.datetime.now()).total_seconds()
+
+    def _auto_refresh(self):
+        # Sleep until the refresh point of the current token, then refresh proactively
+        while not self._stop.is_set():
+            delay = self._seconds_until_refresh()
+            if delay is None or delay > 0:
+                self._wakeup.wait(timeout=delay)
+                self._wakeup.clear()
+                continue
+            if self._refresh() is None:
+                # back off before retrying; the old token stays in use until it expires
+                self._stop.wait(self.retry_interval)
+
     def _start_token_refresh_thread(self):
-        def auto_refresh():
-            while True:
-                try:
-                    status = self.get_token_status()
-                    
-                    # Refresh token if it is about to expire
-                    if status["is_valid"] and status["remaining_time"] < 5:
-                        self.refresh_token()
-                    
-                    # Check every 60 seconds
-                    time.sleep(60)
-                except Exception as e:
-                    print(f"Refresh Token Failed: {str(e)}")
-                    time.sleep(60)
-        
-        # Start token refresh thread
-        refresh_thread = threading.Thread(target=auto_refresh, daemon=True)
-        refresh_thread.start()
\ No newline at end of file
+        # Start the single refresh thread of this manager on first use
+        with self._thread_lock:
+            if self._refresh_thread is not None:
+                return
+            self._refresh_thread = threading.Thread(target=self._auto_refresh, daemon=True)
+            self._refresh_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+_managers: Dict[Optional[str], TokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(api_key: Optional[str] = None) -> TokenManager:
+    # One TokenManager per API key per process, shared by every Streamlit session
+    if api_key is None:
+        try:
+            api_key = st.secrets["WATSONX_API_KEY"]
+        except:
+            api_key = os.getenv("WATSONX_API_KEY")
+
+    with _managers_lock:
+        if api_key not in _managers:
+            _managers[api_key] = TokenManager(api_key)
+        return _managers[api_key]
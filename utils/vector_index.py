@@ -0,0 +1,647 @@
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple, Callable
+
+import numpy as np
+
+from utils.ann_index import IVFIndex, exact_search
+from utils.quantization import make_quantizer
+from utils.document_index import ADDED, DELETED, file_lock, load_documents
+from utils.text_patterns import SENTENCE_END
+
+logger = logging.getLogger(__name__)
+
+# (event, doc_id, chunks) with chunks None for deletions
+ChunkListener = Callable[[str, str, Optional[List[Dict[str, Any]]]], None]
+
+
+class HashingEmbedder:
+    """Offline embedder based on hashed character n-grams.
+
+    Any object with ``name``, ``dim`` and ``embed(texts) -> np.ndarray`` can be plugged in instead.
+    """
+
+    def __init__(self, dim: int = 384, ngram_range: Tuple[int, int] = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-ngram-{dim}-{ngram_range[0]}-{ngram_range[1]}"
+
+    def _features(self, text: str) -> List[str]:
+        # Character n-grams work for Chinese text without a word segmenter
+        text = re.sub(r"\s+", " ", text.lower()).strip()
+        features = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(text[i:i + n] for i in range(len(text) - n + 1))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 is stable across processes, unlike the built-in hash()
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[Dict[str, Any]]:
+    # Fixed-size character chunks with overlap, cut at line breaks when possible
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            cut = text.rfind("\n", start + overlap + 1, end)
+            if cut != -1:
+                end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append({"text": chunk, "metadata": {"start": start, "end": end}})
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+_QUESTION_LINE = re.compile(r"^(?P<question>[^,\n]{1,200}[?？])\s*,")
+
+
+def _split_sentences(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    # Greedily pack whole sentences into spans of at most max_chars (longer sentences stay whole)
+    spans = []
+    start = end = 0
+    for piece in SENTENCE_END.split(text):
+        if end > start and end - start + len(piece) > max_chars:
+            spans.append((start, end))
+            start = end
+        end += len(piece)
+    if end > start:
+        spans.append((start, end))
+    return spans
+
+
+def chunk_qa_text(text: str, max_chars: int = 500) -> List[Dict[str, Any]]:
+    """One chunk per question/answer row of a stored QA CSV.
+
+    A row starts at a line whose first field ends in a question mark, so multi-line answers
+    stay with their question. Answers longer than ``max_chars`` are split on sentence
+    boundaries and each part repeats the question. Text without such rows falls back to
+    ``chunk_text``.
+    """
+    lines = text.split("\n")
+    row_starts = []
+    offset = 0
+    for i, line in enumerate(lines):
+        # Line 0 is the CSV header
+        match = _QUESTION_LINE.match(line) if i > 0 else None
+        if match:
+            row_starts.append((offset, match.group("question").strip(), offset + match.end()))
+        offset += len(line) + 1
+    if not row_starts:
+        return chunk_text(text)
+
+    chunks = []
+    preamble_start = len(lines[0]) + 1
+    preamble = text[preamble_start:row_starts[0][0]]
+    for chunk in chunk_text(preamble):
+        chunk["metadata"]["start"] += preamble_start
+        chunk["metadata"]["end"] += preamble_start
+        chunks.append(chunk)
+
+    for i, (start, question, answer_start) in enumerate(row_starts):
+        end = row_starts[i + 1][0] if i + 1 < len(row_starts) else len(text)
+        answer = text[answer_start:end].rstrip()
+        spans = _split_sentences(answer, max_chars - len(question)) if len(answer) + len(question) > max_chars else [(0, len(answer))]
+        for part, (span_start, span_end) in enumerate(spans):
+            part_text = answer[span_start:span_end].strip()
+            if not part_text and part > 0:
+                continue
+            chunks.append({
+                "text": f"{question},{part_text}",
+                "metadata": {
+                    "start": start if part == 0 else answer_start + span_start,
+                    "end": answer_start + span_end,
+                    "question": question,
+                    "part": part,
+                },
+            })
+    return chunks
+
+
+class VectorIndex:
+    """Persistent chunk embeddings for the QA documents.
+
+    ``vectors.f32`` holds the float32 rows back to back and is memory-mapped on load,
+    ``chunks.jsonl`` holds one chunk per row and ``manifest.json`` maps document ids to row
+    ranges and records how many rows (and bytes of chunks) are committed. Adding a document
+    appends its rows to both files; removing one only marks its rows deleted, and the files
+    are compacted once deleted rows reach ``compact_ratio`` of the total.
+
+    Several processes may share ``index_dir``. Writes hold an exclusive file lock and first
+    re-read the manifest, so each starts from what the others committed; ``refresh`` picks up
+    their changes between writes. Files are only ever appended to or replaced, never truncated
+    under another process's memory map.
+
+    ``search_mode`` is "exact", "ivf" or "auto"; auto switches to the IVF index once the
+    corpus reaches ``ann_threshold`` chunks.
+
+    ``quantization`` ("int8" or "pq") replaces the float32 scan, of every row or of the IVF
+    candidates, with a scan of compact codes appended to ``codes.bin`` alongside the vectors.
+    The float vectors then stay on disk and are only read to rescore the best
+    ``rescore * top_k`` candidates; ``rescore`` defaults to what the quantizer needs for
+    near-exact recall (4 for int8, 40 for pq).
+    """
+
+    def __init__(self, index_dir: str, embedder=None,
+                 chunker: Callable[[str], List[Dict[str, Any]]] = chunk_qa_text,
+                 search_mode: str = "auto", ann_threshold: int = 10000,
+                 nlist: Optional[int] = None, nprobe: int = 8,
+                 quantization: str = "none", quantizer_options: Optional[Dict[str, Any]] = None,
+                 rescore: Optional[int] = None, compact_ratio: float = 0.25):
+        self.index_dir = Path(index_dir)
+        self.embedder = embedder or HashingEmbedder()
+        self.chunker = chunker
+        self.lock = threading.RLock()
+
+        self.search_mode = search_mode
+        self.ann_threshold = ann_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._ann: Optional[IVFIndex] = None
+
+        self.quantization = quantization
+        self.quantizer = (
+            make_quantizer(quantization, **(quantizer_options or {})) if quantization != "none" else None
+        )
+        self.rescore = rescore if rescore is not None else (self.quantizer.default_rescore if self.quantizer else 0)
+        self.codes: Optional[np.ndarray] = None
+
+        self.compact_ratio = compact_ratio
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        # Row-aligned with vectors; rows of removed documents are None until compaction
+        self.chunks: List[Optional[Dict[str, Any]]] = []
+        self.documents: Dict[str, List[int]] = {}
+        self.deleted: List[List[int]] = []
+        self._deleted_rows = np.zeros(0, dtype=np.int64)
+        self._chunks_bytes = 0
+        self._listeners: Dict[str, ChunkListener] = {}
+        # Bumped by every compaction; rows of the same epoch are only ever appended
+        self._epoch = 0
+        self._manifest_key = None
+        self._locked = False
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Loads the committed index, if there is one
+        self.refresh()
+
+    @property
+    def _chunker_name(self) -> str:
+        # Chunks built by a different chunker are re-embedded on load
+        return getattr(self.chunker, "__name__", type(self.chunker).__name__)
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.index_dir / "vectors.f32"
+
+    @property
+    def _chunks_file(self) -> Path:
+        return self.index_dir / "chunks.jsonl"
+
+    @property
+    def _manifest_file(self) -> Path:
+        return self.index_dir / "manifest.json"
+
+    @property
+    def _lock_file(self) -> Path:
+        return self.index_dir / "index.lock"
+
+    @property
+    def _codes_file(self) -> Path:
+        return self.index_dir / "codes.bin"
+
+    @property
+    def _quantizer_file(self) -> Path:
+        return self.index_dir / "quantizer.npz"
+
+    @property
+    def size(self) -> int:
+        # Rows of documents still in the index
+        return len(self.chunks) - len(self._deleted_rows)
+
+    def _map_vectors(self, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(rows, self.embedder.dim))
+
+    def _set_deleted(self, deleted: List[List[int]]):
+        self.deleted = deleted
+        self._deleted_rows = (
+            np.concatenate([np.arange(start, end) for start, end in deleted]) if deleted
+            else np.zeros(0, dtype=np.int64)
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        # Exclusive across threads and processes, holding what other processes committed;
+        # re-entrant, so writes may nest (an add that triggers a compaction)
+        with self.lock:
+            if self._locked:
+                yield
+                return
+            with file_lock(self._lock_file):
+                self._locked = True
+                try:
+                    self._refresh_locked()
+                    yield
+                finally:
+                    self._locked = False
+
+    def _stat_manifest(self):
+        try:
+            stat = self._manifest_file.stat()
+            return stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        # None when missing, unreadable, or written for another embedder or chunker
+        try:
+            with open(self._manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (manifest.get("embedder") != self.embedder.name or manifest.get("dim") != self.embedder.dim
+                or manifest.get("chunker") != self._chunker_name or "rows" not in manifest):
+            return None
+        return manifest
+
+    def refresh(self):
+        # Pick up documents other processes added or removed; costs a stat() when nothing changed
+        if self._stat_manifest() != self._manifest_key:
+            with self._file_lock():
+                pass
+
+    def _refresh_locked(self):
+        # Load the committed manifest: only the new rows when other writers just appended,
+        # every row after a compaction. Listeners hear about the documents that changed
+        manifest_key = self._stat_manifest()
+        if manifest_key == self._manifest_key:
+            return
+        self._manifest_key = manifest_key
+        manifest = self._read_manifest()
+        if manifest is None:
+            return
+        try:
+            rows, chunks_bytes = manifest["rows"], manifest["chunks_bytes"]
+            appended = manifest.get("epoch", 0) == self._epoch and rows >= len(self.chunks)
+            old_rows, start_bytes = (len(self.chunks), self._chunks_bytes) if appended else (0, 0)
+            # Bytes past the committed rows are a write that did not finish; the next append overwrites them
+            if os.path.getsize(self._vectors_file) < rows * self.embedder.dim * 4:
+                return
+            with open(self._chunks_file, "rb") as f:
+                f.seek(start_bytes)
+                data = f.read(chunks_bytes - start_bytes)
+            new_chunks = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+            if len(new_chunks) != rows - old_rows or len(data) != chunks_bytes - start_bytes:
+                return
+        except (OSError, ValueError, KeyError):
+            return
+
+        old_chunks, old_documents, old_deleted = self.chunks, self.documents, self.deleted
+        chunks = (old_chunks if appended else []) + new_chunks
+        self._set_deleted(manifest.get("deleted", []))
+        for start, end in self.deleted:
+            chunks[start:end] = [None] * (end - start)
+        self.vectors = self._map_vectors(rows)
+        self.chunks = chunks
+        self._chunks_bytes = chunks_bytes
+        self._epoch = manifest.get("epoch", 0)
+        self.documents = manifest.get("documents", {})
+
+        if self.quantizer is not None:
+            self._load_codes(manifest.get("quantization"))
+        if self._ann is not None and appended and rows <= 4 * self._ann.trained_size:
+            self._ann.add(np.asarray(self.vectors[old_rows:]))
+            for start, end in self.deleted:
+                if [start, end] not in old_deleted:
+                    self._ann.remove(start, end)
+        else:
+            self._ann = None
+
+        for doc_id in old_documents:
+            if doc_id not in self.documents:
+                self._notify(DELETED, doc_id, None)
+        for doc_id, (start, end) in self.documents.items():
+            old_range = old_documents.get(doc_id)
+            if old_range is None or (old_range != [start, end] if appended
+                                     else old_chunks[old_range[0]:old_range[1]] != chunks[start:end]):
+                self._notify(ADDED, doc_id, chunks[start:end])
+
+    def _map_codes(self, rows: int) -> Optional[np.ndarray]:
+        if rows == 0:
+            return None
+        width = self.quantizer.code_width(self.embedder.dim)
+        return np.memmap(self._codes_file, dtype=self.quantizer.code_dtype, mode="r", shape=(rows, width))
+
+    @property
+    def _code_row_bytes(self) -> int:
+        return self.quantizer.code_width(self.embedder.dim) * np.dtype(self.quantizer.code_dtype).itemsize
+
+    def _load_codes(self, stored_kind: Optional[str]):
+        # Reuse stored codes when they match; otherwise encode the float vectors again
+        try:
+            if stored_kind == self.quantization:
+                with np.load(self._quantizer_file) as state:
+                    self.quantizer.load_state(state)
+                if os.path.getsize(self._codes_file) >= len(self.chunks) * self._code_row_bytes:
+                    self.codes = self._map_codes(len(self.chunks))
+                    return
+        except (OSError, ValueError, KeyError):
+            pass
+        self._encode_all(np.asarray(self.vectors), retrain=True)
+        self._write_manifest()
+
+    def _encode_all(self, vectors: np.ndarray, retrain: bool = False):
+        # Rewrite codes.bin for every row, training the quantizer first if asked or untrained
+        self.codes = None
+        if len(vectors) == 0:
+            return
+        if retrain or self.quantizer.trained_size == 0:
+            self.quantizer.train(vectors)
+            self._write_atomic(self._quantizer_file, lambda f: np.savez(f, **self.quantizer.state()), mode="wb")
+        codes = self.quantizer.encode(vectors)
+        self._write_codes(codes)
+
+    def _write_codes(self, codes: np.ndarray):
+        self.codes = None
+        self._write_atomic(self._codes_file, lambda f: f.write(codes.tobytes()), mode="wb")
+        self.codes = self._map_codes(len(codes))
+
+    def _append_codes(self, rows: int, new_vectors: np.ndarray):
+        # Encode only the new rows; retrain (and re-encode) once the corpus has grown well past
+        # the training set, as for the IVF index
+        total = rows + len(new_vectors)
+        if self.quantizer.trained_size == 0 or total > 4 * self.quantizer.trained_size:
+            self._encode_all(np.asarray(self.vectors), retrain=True)
+            return
+        self.codes = None
+        self._write_at(self._codes_file, rows * self._code_row_bytes, self.quantizer.encode(new_vectors).tobytes())
+        self.codes = self._map_codes(total)
+
+    def _write_manifest(self):
+        manifest = {
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "chunker": self._chunker_name,
+            "quantization": self.quantization,
+            "rows": len(self.chunks),
+            "chunks_bytes": self._chunks_bytes,
+            "epoch": self._epoch,
+            "documents": self.documents,
+            "deleted": self.deleted,
+        }
+        self._write_atomic(self._manifest_file, lambda f: json.dump(manifest, f, ensure_ascii=False))
+        # Our own commit is already in memory; refresh only reloads what others write after it
+        self._manifest_key = self._stat_manifest()
+
+    def _write_atomic(self, path: Path, writer: Callable[[Any], None], mode: str = "w"):
+        tmp_path = path.with_name(path.name + ".tmp")
+        if "b" in mode:
+            with open(tmp_path, mode) as f:
+                writer(f)
+        else:
+            with open(tmp_path, mode, encoding="utf-8") as f:
+                writer(f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_at(path: Path, offset: int, data: bytes) -> int:
+        # Write after the committed bytes, over anything an interrupted write left behind.
+        # Never truncates: other processes may have the file memory-mapped
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            return f.tell()
+
+    def _append(self, new_vectors: np.ndarray, chunks: List[Dict[str, Any]]):
+        # Only the new rows are written; the manifest commits them last
+        rows = len(self.chunks)
+        # Release the old memory map before writing to the file underneath it
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._write_at(self._vectors_file, rows * self.embedder.dim * 4, new_vectors.tobytes())
+        lines = "".join(json.dumps(chunk, ensure_ascii=False) + "\n" for chunk in chunks)
+        self._chunks_bytes = self._write_at(self._chunks_file, self._chunks_bytes, lines.encode("utf-8"))
+        self.chunks = self.chunks + chunks
+        self.vectors = self._map_vectors(len(self.chunks))
+        if self.quantizer is not None:
+            self._append_codes(rows, new_vectors)
+        self._write_manifest()
+
+    def compact(self):
+        # Write new files without deleted rows and renumber the documents; they replace the
+        # old files, so maps of those held by other processes stay valid until they refresh
+        with self._file_lock():
+            if not self.deleted:
+                return
+            live = np.ones(len(self.chunks), dtype=bool)
+            live[self._deleted_rows] = False
+            vectors = np.asarray(self.vectors)[live]
+            chunks = [chunk for chunk in self.chunks if chunk is not None]
+            # Live rows before each old row index = its new index
+            before = np.concatenate([[0], np.cumsum(live)])
+            self.documents = {doc_id: [int(before[start]), int(before[end])]
+                              for doc_id, (start, end) in self.documents.items()}
+
+            self.vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+            self._write_atomic(self._vectors_file, lambda f: f.write(vectors.tobytes()), mode="wb")
+            lines = "".join(json.dumps(chunk, ensure_ascii=False) + "\n" for chunk in chunks).encode("utf-8")
+            self._write_atomic(self._chunks_file, lambda f: f.write(lines), mode="wb")
+            self._chunks_bytes = len(lines)
+            self.chunks = chunks
+            self._set_deleted([])
+            self._epoch += 1
+            self.vectors = self._map_vectors(len(chunks))
+            if self.quantizer is not None and self.codes is not None:
+                self._write_codes(np.asarray(self.codes)[live])
+            if self._ann is not None:
+                self._ann.keep(live)
+            self._write_manifest()
+
+    def subscribe(self, key: str, listener: ChunkListener):
+        # Told of each document added or removed, with its chunks; subscribing again under
+        # the same key replaces the listener
+        with self.lock:
+            self._listeners[key] = listener
+
+    def unsubscribe(self, key: str):
+        with self.lock:
+            self._listeners.pop(key, None)
+
+    def _notify(self, event: str, doc_id: str, chunks: Optional[List[Dict[str, Any]]]):
+        # Called under self.lock, so listeners see changes in the order they were made
+        for listener in list(self._listeners.values()):
+            try:
+                listener(event, doc_id, chunks)
+            except Exception:
+                logger.exception("Vector index listener failed on %s %s", event, doc_id)
+
+    def has_document(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def add_document(self, doc_id: str, text: str, name: Optional[str] = None) -> int:
+        # Chunk and embed one document, then append its rows to the matrix
+        chunks = self.chunker(text)
+        new_vectors = (
+            self.embedder.embed([chunk["text"] for chunk in chunks])
+            if chunks else np.zeros((0, self.embedder.dim), dtype=np.float32)
+        )
+        return self.add_embedded(doc_id, chunks, new_vectors, name)
+
+    def add_embedded(self, doc_id: str, chunks: List[Dict[str, Any]], new_vectors: np.ndarray,
+                     name: Optional[str] = None) -> int:
+        # Append chunks whose vectors were computed elsewhere, e.g. by the indexing pipeline
+        for chunk in chunks:
+            chunk["doc_id"] = doc_id
+            chunk["metadata"]["name"] = name
+        new_vectors = np.asarray(new_vectors, dtype=np.float32).reshape(len(chunks), self.embedder.dim)
+
+        with self._file_lock():
+            if doc_id in self.documents:
+                self._remove_rows(doc_id)
+            start = len(self.chunks)
+            self.documents[doc_id] = [start, start + len(chunks)]
+            self._append(new_vectors, chunks)
+            self._notify(ADDED, doc_id, chunks)
+
+            if self._ann is not None:
+                # Retrain the clusters once the corpus has grown well past the training set
+                if len(self.chunks) > 4 * self._ann.trained_size:
+                    self._ann = None
+                else:
+                    self._ann.add(new_vectors)
+            self._maybe_compact()
+        return len(chunks)
+
+    def _remove_rows(self, doc_id: str):
+        # Mark the document's rows deleted; they stay in the files until compaction
+        start, end = self.documents.pop(doc_id)
+        if end > start:
+            self.chunks = self.chunks[:start] + [None] * (end - start) + self.chunks[end:]
+            self._set_deleted(self.deleted + [[start, end]])
+            if self._ann is not None:
+                self._ann.remove(start, end)
+
+    def _maybe_compact(self):
+        if len(self._deleted_rows) > self.compact_ratio * len(self.chunks):
+            self.compact()
+
+    def remove_document(self, doc_id: str) -> bool:
+        # A no-op when another process removed it first
+        with self._file_lock():
+            if doc_id not in self.documents:
+                return False
+            self._remove_rows(doc_id)
+            self._write_manifest()
+            self._notify(DELETED, doc_id, None)
+            self._maybe_compact()
+            return True
+
+    def sync(self, storage_dir: str):
+        # Embed documents missing from the index and drop ones no longer stored
+        if not (Path(storage_dir) / "document_index.json").exists():
+            return
+        stored = {doc["id"]: doc for doc in load_documents(storage_dir)}
+
+        self.refresh()
+        for doc_id in [doc_id for doc_id in self.documents if doc_id not in stored]:
+            self.remove_document(doc_id)
+
+        for doc_id, doc in stored.items():
+            # Another process starting at the same time may have embedded it meanwhile
+            self.refresh()
+            if doc_id in self.documents:
+                continue
+            content_path = Path(storage_dir) / f"{doc_id}.txt"
+            try:
+                with open(content_path, "r", encoding="utf-8") as f:
+                    self.add_document(doc_id, f.read(), doc.get("name"))
+            except OSError:
+                continue
+
+    def _use_ann(self, size: int) -> bool:
+        if self.search_mode == "ivf":
+            return size > 0
+        return self.search_mode == "auto" and size >= self.ann_threshold
+
+    def _get_ann(self) -> IVFIndex:
+        if self._ann is None:
+            ann = IVFIndex(nlist=self.nlist, nprobe=self.nprobe)
+            ann.build(self.vectors)
+            for start, end in self.deleted:
+                ann.remove(start, end)
+            self._ann = ann
+        return self._ann
+
+    def search(self, query: str, top_k: int = 3,
+               nprobe: Optional[int] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        self.refresh()
+        with self.lock:
+            vectors = self.vectors
+            chunks = self.chunks
+            codes = self.codes
+            deleted = self._deleted_rows
+            ann = self._get_ann() if self._use_ann(self.size) else None
+        if len(chunks) == len(deleted) or not query.strip():
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        # IVF narrows the scan to the rows of the closest clusters; deleted rows are in none of them
+        candidates = ann.candidates(query_vector, nprobe) if ann is not None else None
+        if codes is not None:
+            depth = top_k * max(self.rescore, 1)
+            if candidates is None:
+                scores, ids = self.quantizer.search(codes, query_vector, depth, deleted)
+            else:
+                scores, top = self.quantizer.search(np.asarray(codes[candidates]), query_vector, depth)
+                ids = candidates[top]
+            if self.rescore:
+                # Exact scores for the few candidates, read from the memory-mapped float vectors
+                order = np.sort(ids)
+                exact_scores, top = exact_search(np.asarray(vectors[order]), query_vector, top_k)
+                scores, ids = exact_scores, order[top]
+        elif candidates is not None:
+            scores, top = exact_search(np.asarray(vectors[candidates]), query_vector, top_k)
+            ids = candidates[top]
+        else:
+            scores, ids = exact_search(vectors, query_vector, top_k, deleted)
+        return [(float(score), chunks[i]) for score, i in zip(scores, ids)]
+
+
+_indexes: Dict[str, VectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(storage_dir: str = "QA_files", embedder=None, **options) -> VectorIndex:
+    # One index per storage directory per process, shared by all sessions
+    # VECTOR_QUANTIZATION=int8 or pq keeps compact codes for the scan instead of float32;
+    # VECTOR_RESCORE overrides how many candidates per result are rescored from float32
+    options.setdefault("quantization", os.getenv("VECTOR_QUANTIZATION", "none"))
+    if os.getenv("VECTOR_RESCORE"):
+        options.setdefault("rescore", int(os.getenv("VECTOR_RESCORE")))
+    with _indexes_lock:
+        index = _indexes.get(storage_dir)
+        if index is None or (embedder is not None and index.embedder.name != embedder.name):
+            index = VectorIndex(Path(storage_dir) / "vector_index", embedder=embedder, **options)
+            index.sync(storage_dir)
+            _indexes[storage_dir] = index
+        return index